@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import F
+from django.db.models.functions import Lower
+
+
+def normalizar_email(email):
+    return email.strip().lower()
+
+
+def usuarios_por_email(email):
+    """Usuarios con ese correo sin distinguir mayúsculas (usa el índice sobre LOWER(email))"""
+    return get_user_model()._default_manager.alias(
+        email_minusculas=Lower('email')
+    ).filter(email_minusculas=normalizar_email(email))
+
+
+class EmailBackend(ModelBackend):
+    """
+    Autentica con correo y contraseña en una sola consulta y calculando a lo
+    sumo un hash de contraseña por intento.
+
+    Si varias cuentas comparten el correo se prueba solo la usada más
+    recientemente. En ``request.cuentas_con_email`` queda cuántas cuentas se
+    encontraron (0, 1 o 2 para "varias") para que la vista explique el fallo.
+    """
+
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+
+        candidatos = list(usuarios_por_email(email).order_by(
+            F('last_login').desc(nulls_last=True), 'id'
+        )[:2])
+        if request is not None:
+            request.cuentas_con_email = len(candidatos)
+
+        if not candidatos:
+            # Mismo costo que con un usuario existente, para no revelar qué
+            # correos están registrados por el tiempo de respuesta
+            get_user_model()().set_password(password)
+            return None
+
+        usuario = candidatos[0]
+        if usuario.check_password(password) and self.user_can_authenticate(usuario):
+            return usuario
+        return None
@@ -0,0 +1,110 @@
+import random
+import statistics
+import time as reloj
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+from Booking.management.commands.benchmark_vistas import percentil
+
+CLAVE = 'clave-de-prueba'
+
+
+def login_anterior(email, password):
+    """La lógica de handle_login antes del backend por correo, para comparar"""
+    users = User.objects.filter(email__iexact=email)
+    if not users.exists():
+        return None
+    for user in users:
+        user_auth = authenticate(None, username=user.username, password=password)
+        if user_auth is not None:
+            return user_auth
+    users.count()
+    return None
+
+
+def login_actual(email, password):
+    return authenticate(None, email=email, password=password)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el inicio de sesión por correo anterior (email__iexact y un authenticate por '
+        'cuenta) con EmailBackend sobre muchos usuarios, en una base temporal'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1_000_000)
+        parser.add_argument('--intentos', type=int, default=20, help='Intentos por escenario')
+        parser.add_argument('--lote', type=int, default=10_000, help='Filas por bulk_create')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        # Base de datos desechable: nunca se tocan los datos reales
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._crear_usuarios(options['usuarios'], options['lote'])
+            azar = random.Random(options['semilla'])
+            emails = [
+                f'Usuario{azar.randrange(options["usuarios"])}@Ejemplo.com'
+                for _ in range(options['intentos'])
+            ]
+            escenarios = {
+                'correcto': [(email, CLAVE) for email in emails],
+                'clave mala': [(email, 'otra-clave') for email in emails],
+                'no existe': [(f'nadie{n}@ejemplo.com', CLAVE) for n in range(len(emails))],
+            }
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{"":<26}{"login/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"SQL":>6}{"SQL ms":>9}{"hashes":>8}'
+            ))
+            for escenario, intentos in escenarios.items():
+                for nombre, funcion in (('anterior', login_anterior), ('EmailBackend', login_actual)):
+                    self._medir(f'{escenario} / {nombre}', funcion, intentos)
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _crear_usuarios(self, total, lote):
+        inicio = reloj.perf_counter()
+        # Un único hash para todos: generarlo por usuario llevaría horas
+        clave = make_password(CLAVE)
+        for desde in range(0, total, lote):
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(username=f'usuario{n}', email=f'usuario{n}@ejemplo.com', password=clave)
+                    for n in range(desde, min(total, desde + lote))
+                ])
+        self.stdout.write(f'✓ {total:,} usuarios en {reloj.perf_counter() - inicio:.1f}s')
+
+    def _medir(self, nombre, funcion, intentos):
+        hasher = get_hasher()
+        original = type(hasher).encode
+        hashes = [0]
+
+        def contar(*args, **kwargs):
+            hashes[0] += 1
+            return original(*args, **kwargs)
+
+        latencias = []
+        # El registro de consultas tiene un tope: que no lo llenen las de otros escenarios
+        connection.queries_log.clear()
+        with mock.patch.object(type(hasher), 'encode', contar), CaptureQueriesContext(connection) as consultas:
+            for email, password in intentos:
+                inicio = reloj.perf_counter()
+                funcion(email, password)
+                latencias.append((reloj.perf_counter() - inicio) * 1000)
+
+        # Tiempo en la base de datos, aparte del costo del hash
+        tiempo_sql = sum(float(consulta['time']) for consulta in consultas.captured_queries) * 1000
+        self.stdout.write(
+            f'{nombre:<26}{1000 / statistics.mean(latencias):>9.1f}'
+            f'{percentil(latencias, 50):>9.1f}{percentil(latencias, 99):>9.1f}'
+            f'{len(consultas) / len(intentos):>6.1f}{tiempo_sql / len(intentos):>9.2f}'
+            f'{hashes[0] / len(intentos):>8.1f}'
+        )
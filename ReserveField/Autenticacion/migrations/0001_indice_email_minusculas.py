@@ -0,0 +1,24 @@
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+# auth.User pertenece a Django: el índice se crea desde esta app
+INDICE = models.Index(Lower('email'), name='auth_user_email_lower_idx')
+
+
+def crear_indice(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('auth', 'User'), INDICE)
+
+
+def borrar_indice(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('auth', 'User'), INDICE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -1,3 +1,76 @@
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .backends import usuarios_por_email
+
+
+class EmailBackendTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'Ana@Test.com', 'clave-segura')
+
+    def contar_hashes(self):
+        hasher = type(get_hasher())
+        return mock.patch.object(hasher, 'encode', autospec=True, side_effect=hasher.encode)
+
+    def test_correo_sin_distinguir_mayusculas(self):
+        self.assertEqual(authenticate(None, email=' ana@TEST.com ', password='clave-segura'), self.usuario)
+        self.assertIsNone(authenticate(None, email='ana@test.com', password='otra-clave'))
+
+    def test_una_consulta_y_un_hash_por_intento(self):
+        for email, password in (
+            ('ana@test.com', 'clave-segura'),
+            ('ana@test.com', 'otra-clave'),
+            ('nadie@test.com', 'clave-segura'),
+        ):
+            with self.subTest(email=email, password=password):
+                with self.contar_hashes() as encode, self.assertNumQueries(1):
+                    authenticate(None, email=email, password=password)
+                self.assertEqual(encode.call_count, 1)
+
+    def test_varias_cuentas_prueba_la_usada_mas_recientemente(self):
+        otra = User.objects.create_user('ana2', 'ana@test.com', 'otra-clave')
+        otra.last_login = timezone.now()
+        otra.save()
+
+        with self.contar_hashes() as encode:
+            self.assertEqual(authenticate(None, email='ana@test.com', password='otra-clave'), otra)
+            self.assertIsNone(authenticate(None, email='ana@test.com', password='clave-segura'))
+        self.assertEqual(encode.call_count, 2)
+
+    def test_la_busqueda_usa_el_indice_de_lower_email(self):
+        sql, parametros = usuarios_por_email('ana@test.com').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)
+            plan = ' '.join(str(fila) for fila in cursor.fetchall())
+
+        self.assertIn('auth_user_email_lower_idx', plan)
+
+    def test_vista_de_login(self):
+        url = reverse('autenticacion')
+
+        respuesta = self.client.post(url, {'action': 'login', 'email': 'ANA@test.com', 'password': 'clave-segura'})
+        self.assertRedirects(respuesta, reverse('booking_home'), fetch_redirect_response=False)
+
+        self.client.logout()
+        for email, password, mensaje in (
+            ('ana@test.com', 'otra-clave', 'Contraseña incorrecta'),
+            ('nadie@test.com', 'clave-segura', 'El usuario no existe'),
+        ):
+            respuesta = self.client.post(url, {'action': 'login', 'email': email, 'password': password})
+            self.assertContains(respuesta, mensaje)
+
+    def test_registro_rechaza_el_correo_con_otras_mayusculas(self):
+        respuesta = self.client.post(reverse('autenticacion'), {
+            'action': 'register', 'email': 'ANA@test.com',
+            'password': 'clave-segura', 'password_confirm': 'clave-segura',
+        })
 
-# Create your tests here.
+        self.assertContains(respuesta, 'El correo ya está registrado')
+        self.assertEqual(User.objects.count(), 1)
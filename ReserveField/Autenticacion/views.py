@@ -3,7 +3,11 @@ from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from Booking.limites import limitar_tasa
+from .backends import normalizar_email, usuarios_por_email
 
+# Cada intento de login cuesta un hash: se limita por IP y por correo antes de calcularlo
+@limitar_tasa('login', metodos=('POST',), clave=lambda request: normalizar_email(request.POST.get('email', '')))
 def Autentificacion(request):
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -16,24 +20,18 @@ def Autentificacion(request):
     return render(request, 'Auth/registro.html')
 
 def handle_login(request):
-    email = request.POST.get('email')
-    password = request.POST.get('password')
-    # Buscar todos los usuarios con ese email (el campo email no es único por defecto)
-    users = User.objects.filter(email__iexact=email)
+    email = request.POST.get('email', '')
+    password = request.POST.get('password', '')
+    # Una consulta por el índice de LOWER(email) y a lo sumo un hash (ver backends.py)
+    user = authenticate(request, email=email, password=password)
+    if user is not None:
+        login(request, user)
+        return redirect('booking_home')
 
-    if not users.exists():
+    cuentas = getattr(request, 'cuentas_con_email', 0)
+    if cuentas == 0:
         messages.error(request, 'El usuario no existe')
-        return render(request, 'Auth/registro.html')
-
-    # Intentar autenticar probando cada username asociado al email
-    for user in users:
-        user_auth = authenticate(request, username=user.username, password=password)
-        if user_auth is not None:
-            login(request, user_auth)
-            return redirect('booking_home')
-
-    # Si llega aquí, no se pudo autenticar con ninguna cuenta asociada al email
-    if users.count() > 1:
+    elif cuentas > 1:
         messages.error(request, 'No fue posible iniciar sesión: existen varias cuentas con ese correo. Intenta iniciar sesión con tu nombre de usuario.')
     else:
         messages.error(request, 'Contraseña incorrecta')
@@ -50,7 +48,7 @@ def handle_register(request):
         messages.error(request, 'Las contraseñas no coinciden')
         return render(request, 'Auth/registro.html')
     
-    if User.objects.filter(email=email).exists():
+    if usuarios_por_email(email).exists():
         messages.error(request, 'El correo ya está registrado')
         return render(request, 'Auth/registro.html')
     
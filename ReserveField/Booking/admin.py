@@ -1,12 +1,25 @@
 from django.contrib import admin
-from .models import Cancha, Horario, Reserva, Resena
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from . import exportacion
+from .models import Cancha, Correo, Horario, Reserva, ReservaArchivada, Resena, SerieReserva, Tarifa
+
+
+class TarifaInline(admin.TabularInline):
+    model = Tarifa
+    extra = 0
+    fields = ('nombre', 'dia_semana', 'hora_inicio', 'hora_fin', 'precio_por_hora')
 
 @admin.register(Cancha)
 class CanchaAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'tipo', 'ubicacion', 'precio_por_hora', 'calificacion', 'disponible')
     list_filter = ('tipo', 'disponible', 'creado')
     search_fields = ('nombre', 'ubicacion', 'descripcion')
-    readonly_fields = ('creado', 'actualizado', 'calificacion', 'total_resenas')
+    readonly_fields = (
+        'creado', 'actualizado', 'calificacion', 'total_resenas', 'suma_calificaciones',
+        'estrellas_5', 'estrellas_4', 'estrellas_3', 'estrellas_2', 'estrellas_1',
+    )
+    inlines = [TarifaInline]
     fieldsets = (
         ('Información Básica', {
             'fields': ('nombre', 'descripcion', 'tipo', 'imagen')
@@ -17,6 +30,13 @@ class CanchaAdmin(admin.ModelAdmin):
         ('Estado', {
             'fields': ('disponible', 'calificacion', 'total_resenas')
         }),
+        ('Reseñas', {
+            'fields': (
+                'suma_calificaciones',
+                'estrellas_5', 'estrellas_4', 'estrellas_3', 'estrellas_2', 'estrellas_1',
+            ),
+            'classes': ('collapse',)
+        }),
         ('Fechas', {
             'fields': ('creado', 'actualizado'),
             'classes': ('collapse',)
@@ -27,16 +47,58 @@ class CanchaAdmin(admin.ModelAdmin):
 @admin.register(Horario)
 class HorarioAdmin(admin.ModelAdmin):
     list_display = ('cancha', 'get_dia_semana_display', 'hora_apertura', 'hora_cierre')
+    list_select_related = ('cancha',)
     list_filter = ('cancha', 'dia_semana')
     search_fields = ('cancha__nombre',)
 
 
+def _descarga(lineas, content_type, nombre, extension):
+    respuesta = StreamingHttpResponse(lineas, content_type=content_type)
+    respuesta['Content-Disposition'] = (
+        f'attachment; filename="{nombre}-{timezone.localdate():%Y%m%d}.{extension}"'
+    )
+    return respuesta
+
+
+def _accion_exportar(formato):
+    lineas, content_type, extension = exportacion.FORMATOS[formato]
+
+    @admin.action(description=f'Exportar seleccionadas ({extension.upper()})')
+    def exportar(modeladmin, request, queryset):
+        return _descarga(lineas(queryset), content_type, 'reservas', extension)
+
+    exportar.__name__ = f'exportar_{formato}'
+    return exportar
+
+
+def _accion_resumen(agrupar):
+    @admin.action(description=f'Resumen de ingresos por {agrupar} (CSV)')
+    def resumen(modeladmin, request, queryset):
+        filas = exportacion.resumen_ingresos(queryset, agrupar).iterator()
+        return _descarga(
+            exportacion.lineas_resumen_csv(agrupar, filas), 'text/csv', f'ingresos-{agrupar}', 'csv'
+        )
+
+    resumen.__name__ = f'resumen_por_{agrupar}'
+    return resumen
+
+
+# Acciones de ReservaAdmin y ReservaArchivadaAdmin; sirven con "seleccionar
+# todas" sobre un filtro porque la descarga se genera fila a fila
+ACCIONES_EXPORTACION = [
+    *(_accion_exportar(formato) for formato in exportacion.FORMATOS),
+    *(_accion_resumen(agrupar) for agrupar in exportacion.AGRUPACIONES),
+]
+
+
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'cancha', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'total')
+    list_select_related = ('usuario', 'cancha')
     list_filter = ('estado', 'fecha', 'cancha')
     search_fields = ('usuario__username', 'cancha__nombre')
     readonly_fields = ('creado', 'actualizado', 'total')
+    actions = ACCIONES_EXPORTACION
     fieldsets = (
         ('Detalles', {
             'fields': ('usuario', 'cancha', 'fecha', 'hora_inicio', 'hora_fin')
@@ -51,9 +113,50 @@ class ReservaAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ReservaArchivada)
+class ReservaArchivadaAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'cancha', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'total', 'archivado')
+    list_select_related = ('usuario', 'cancha')
+    list_filter = ('estado', 'fecha')
+    search_fields = ('usuario__username', 'cancha__nombre')
+    actions = ACCIONES_EXPORTACION
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SerieReserva)
+class SerieReservaAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'cancha', 'dia_semana', 'hora_inicio', 'hora_fin', 'fecha_desde', 'fecha_hasta')
+    list_select_related = ('usuario', 'cancha')
+    list_filter = ('dia_semana', 'cancha')
+    search_fields = ('usuario__username', 'cancha__nombre')
+    readonly_fields = ('creado',)
+
+
 @admin.register(Resena)
 class ResenaAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'cancha', 'calificacion', 'creado')
+    list_select_related = ('usuario', 'cancha')
     list_filter = ('calificacion', 'creado', 'cancha')
     search_fields = ('usuario__username', 'cancha__nombre', 'comentario')
     readonly_fields = ('creado',)
+
+
+@admin.register(Correo)
+class CorreoAdmin(admin.ModelAdmin):
+    list_display = ('asunto', 'estado', 'intentos', 'proximo_intento', 'creado', 'enviado')
+    list_filter = ('estado', 'creado')
+    search_fields = ('asunto', 'remitente')
+    readonly_fields = ('creado', 'enviado', 'intentos', 'reclamado_por', 'ultimo_error')
+    actions = ['reintentar']
+
+    @admin.action(description='Reintentar correos seleccionados')
+    def reintentar(self, request, queryset):
+        actualizados = queryset.exclude(estado='enviado').update(
+            estado='pendiente', intentos=0, proximo_intento=timezone.now(), reclamado_por='',
+        )
+        self.message_user(request, f'{actualizados} correos vueltos a la cola')
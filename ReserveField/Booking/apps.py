@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class BookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Booking'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals
+
+        post_migrate.connect(signals.instalar_busqueda, sender=self)
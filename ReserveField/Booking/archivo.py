@@ -0,0 +1,69 @@
+"""
+Archivo de reservas históricas.
+
+Las reservas completadas o canceladas con más de ``RESERVAS_HORIZONTE_ARCHIVO``
+días se mueven a ``ReservaArchivada`` por lotes. Cada lote se copia y se borra
+de la tabla de reservas en la misma transacción, así que una reserva está
+siempre en una sola de las dos tablas. La tabla de reservas conserva solo las
+recientes y futuras, que son las que recorren la comprobación de conflictos y
+el índice de disponibilidad; el historial de ``mis_reservas`` lee de ambas.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Reserva, ReservaArchivada
+
+ESTADOS_FINALES = ('completada', 'cancelada')
+HORIZONTE = getattr(settings, 'RESERVAS_HORIZONTE_ARCHIVO', 365)
+CAMPOS = [
+    'id', 'usuario_id', 'cancha_id', 'fecha', 'hora_inicio', 'hora_fin',
+    'estado', 'total', 'serie_id', 'creado', 'actualizado',
+]
+
+
+def archivables(horizonte=None):
+    """Reservas en un estado final cuya fecha quedó fuera del horizonte"""
+    limite = timezone.localdate() - timedelta(days=HORIZONTE if horizonte is None else horizonte)
+    return Reserva.objects.filter(estado__in=ESTADOS_FINALES, fecha__lt=limite)
+
+
+def _borrar(ids):
+    """Borrar sin señales las reservas ``ids`` que siguen en un estado final; devuelve cuántas"""
+    # Repetir el filtro de estado descarta las que otro proceso reactivó desde la lectura
+    marcas = ', '.join(['%s'] * len(ids))
+    estados = ', '.join(['%s'] * len(ESTADOS_FINALES))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM "{Reserva._meta.db_table}" '
+            f'WHERE id IN ({marcas}) AND estado IN ({estados})',
+            [*ids, *ESTADOS_FINALES],
+        )
+        return cursor.rowcount
+
+
+def archivar(horizonte=None, lote=1000):
+    """Mover las reservas archivables de a ``lote``; genera cuántas movió cada lote"""
+    candidatas = archivables(horizonte)
+    while True:
+        # La lectura va fuera de la transacción: en SQLite una transacción que
+        # lee antes de escribir puede fallar con "database is locked"
+        filas = list(candidatas.order_by('fecha', 'id').values(*CAMPOS)[:lote])
+        if not filas:
+            return
+
+        ids = [fila['id'] for fila in filas]
+        with transaction.atomic():
+            ReservaArchivada.objects.bulk_create([ReservaArchivada(**fila) for fila in filas])
+            # Las reservas en un estado final no están en el índice de
+            # disponibilidad ni en la caché del catálogo: se borran sin señales
+            movidas = _borrar(ids)
+            if movidas < len(ids):
+                # Alguna cambió entre la lectura y el borrado: sigue siendo una
+                # reserva activa y su copia no debe quedar en el archivo
+                ReservaArchivada.objects.filter(
+                    id__in=Reserva.objects.filter(id__in=ids).values('id')
+                ).delete()
+        yield movidas
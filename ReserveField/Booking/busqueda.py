@@ -0,0 +1,187 @@
+"""
+Búsqueda de texto completo de canchas.
+
+En SQLite se usa una tabla virtual FTS5 con contenido externo sobre la tabla
+de canchas, mantenida por triggers y con el tokenizador ``unicode61`` sin
+diacríticos (así "padel" encuentra "Pádel"). En PostgreSQL el equivalente es
+un índice GIN sobre ``to_tsvector('spanish', f_unaccent(...))``. En otros
+motores, o si FTS5 no está disponible, se recurre a los ``icontains`` de
+siempre.
+"""
+import base64
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+from .models import Cancha
+from .paginacion import Pagina
+
+TABLA_FTS = 'booking_cancha_fts'
+
+_TABLA = Cancha._meta.db_table
+_DOCUMENTO_PG = (
+    "to_tsvector('spanish', f_unaccent("
+    "coalesce(nombre, '') || ' ' || coalesce(ubicacion, '') || ' ' || coalesce(descripcion, '')))"
+)
+
+SQL_SQLITE = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5(
+        nombre, ubicacion, descripcion,
+        content='{_TABLA}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON "{_TABLA}" BEGIN
+        INSERT INTO {TABLA_FTS}(rowid, nombre, ubicacion, descripcion)
+        VALUES (new.id, new.nombre, new.ubicacion, new.descripcion);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON "{_TABLA}" BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre, ubicacion, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.ubicacion, old.descripcion);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au
+        AFTER UPDATE OF nombre, ubicacion, descripcion ON "{_TABLA}" BEGIN
+        INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre, ubicacion, descripcion)
+        VALUES ('delete', old.id, old.nombre, old.ubicacion, old.descripcion);
+        INSERT INTO {TABLA_FTS}(rowid, nombre, ubicacion, descripcion)
+        VALUES (new.id, new.nombre, new.ubicacion, new.descripcion);
+    END""",
+]
+
+SQL_POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text AS
+        $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+    f'CREATE INDEX IF NOT EXISTS booking_cancha_tsv_idx ON "{_TABLA}" USING gin ({_DOCUMENTO_PG})',
+]
+
+
+def instalar(conexion=None):
+    """
+    Crear (si faltan) la tabla de búsqueda y sus triggers.
+
+    Es idempotente: se ejecuta tras cada ``migrate`` porque en SQLite las
+    migraciones que reconstruyen la tabla de canchas eliminan sus triggers.
+    """
+    conexion = conexion or connection
+    if conexion.vendor == 'sqlite':
+        sentencias = SQL_SQLITE
+    elif conexion.vendor == 'postgresql':
+        sentencias = SQL_POSTGRESQL
+    else:
+        return False
+
+    try:
+        with conexion.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+    except DatabaseError:
+        # SQLite compilado sin FTS5 o sin permisos para la extensión
+        return False
+    return True
+
+
+def reconstruir(conexion=None):
+    """Volver a indexar todas las canchas (reparación)"""
+    conexion = conexion or connection
+    if conexion.vendor == 'sqlite':
+        with conexion.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def _terminos(texto):
+    return re.findall(r'\w+', texto or '')
+
+
+def _consulta_fts5(terminos):
+    # Cada término entre comillas (sin operadores del usuario) y como prefijo,
+    # para que la búsqueda funcione mientras se escribe.
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+
+def codificar_cursor(relevancia, cancha_id):
+    """Cursor opaco con la relevancia y el id de la última cancha de una página"""
+    crudo = f'{relevancia!r}|{cancha_id}'
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (relevancia, id) del cursor o lanza ValueError si es inválido"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor.encode()).decode()
+        relevancia, cancha_id = crudo.split('|')
+        return float(relevancia), int(cancha_id)
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error) as error:
+        raise ValueError('Cursor inválido') from error
+
+
+def _coincidencias(terminos):
+    """SQL y parámetros de (id, relevancia) de las coincidencias; menor relevancia = mejor"""
+    if connection.vendor == 'sqlite':
+        return (
+            f'SELECT rowid AS id, bm25({TABLA_FTS}, 10.0, 5.0, 1.0) AS relevancia '
+            f'FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s',
+            [_consulta_fts5(terminos)],
+        )
+    if connection.vendor == 'postgresql':
+        consulta = ' & '.join(f'{termino}:*' for termino in terminos)
+        return (
+            f"SELECT id, -ts_rank({_DOCUMENTO_PG}, to_tsquery('spanish', f_unaccent(%s))) AS relevancia "
+            f'FROM "{_TABLA}" '
+            f"WHERE {_DOCUMENTO_PG} @@ to_tsquery('spanish', f_unaccent(%s))",
+            [consulta, consulta],
+        )
+    return None
+
+
+def buscar(texto, canchas, cursor=None, tamano=12):
+    """
+    ``Pagina`` de ``canchas`` que coinciden con ``texto``, de más a menos relevante.
+
+    Una sola consulta une el índice con ``canchas`` (ya filtradas por tipo,
+    ubicación...), así que los filtros se aplican antes del límite, y pagina
+    por (relevancia, id). Cada cancha trae su ``relevancia``. Devuelve None
+    si el motor no tiene índice de texto completo y lanza ValueError si el
+    cursor es inválido.
+    """
+    terminos = _terminos(texto)
+    if not terminos:
+        return Pagina([], None)
+    coincidencias = _coincidencias(terminos)
+    if coincidencias is None:
+        return None
+    sql_coincidencias, parametros = coincidencias
+
+    sql_canchas, parametros_canchas = canchas.order_by().query.sql_with_params()
+    sql = (
+        f'SELECT c.*, f.relevancia FROM ({sql_canchas}) c '
+        f'INNER JOIN ({sql_coincidencias}) f ON f.id = c.id'
+    )
+    parametros = [*parametros_canchas, *parametros]
+    if cursor:
+        relevancia, cancha_id = decodificar_cursor(cursor)
+        sql += ' WHERE f.relevancia > %s OR (f.relevancia = %s AND c.id > %s)'
+        parametros += [relevancia, relevancia, cancha_id]
+    sql += ' ORDER BY f.relevancia, c.id LIMIT %s'
+    parametros.append(tamano + 1)
+
+    try:
+        elementos = list(canchas.model.objects.raw(sql, parametros))
+    except DatabaseError:
+        return None
+
+    siguiente = None
+    if len(elementos) > tamano:
+        elementos = elementos[:tamano]
+        siguiente = codificar_cursor(elementos[-1].relevancia, elementos[-1].id)
+    return Pagina(elementos, siguiente)
+
+
+def filtro_icontains(texto):
+    """Filtro clásico por subcadena (sin índice)"""
+    return (
+        Q(nombre__icontains=texto) |
+        Q(descripcion__icontains=texto) |
+        Q(ubicacion__icontains=texto)
+    )
@@ -0,0 +1,204 @@
+"""
+Caché de páginas del catálogo.
+
+Usa el alias de caché ``catalogo`` (ver ``CACHES`` en settings.py), que
+envuelve al backend configurado (locmem, archivo o Redis) y cuenta aciertos
+y fallos por tipo de clave para poder ajustar tiempos y tamaños.
+
+- Las tarjetas de ``home`` se cachean como fragmentos con clave
+  ``(cancha.id, cancha.actualizado)``: cualquier cambio de la cancha, incluidos
+  sus agregados de reseñas, genera una clave nueva.
+- El bloque de reseñas y la respuesta JSON de disponibilidad usan una versión
+  por cancha y ámbito que las señales incrementan tras el commit (ver
+  ``signals.py``).
+"""
+import hashlib
+import threading
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+ALIAS = 'catalogo'
+
+_estadisticas = {}
+_candado = threading.Lock()
+
+
+def _categoria(clave):
+    # 'template.cache.tarjeta_cancha.<hash>' -> 'template.cache.tarjeta_cancha'
+    # 'version:resenas:12' -> 'version'
+    clave = str(clave)
+    if '.' in clave:
+        return clave.rsplit('.', 1)[0]
+    return clave.split(':', 1)[0]
+
+
+def _contar(clave, acierto):
+    with _candado:
+        contador = _estadisticas.setdefault(_categoria(clave), [0, 0])
+        contador[0 if acierto else 1] += 1
+
+
+def estadisticas():
+    """Aciertos, fallos y tasa de acierto por categoría en este proceso"""
+    with _candado:
+        copia = {categoria: tuple(valores) for categoria, valores in _estadisticas.items()}
+    return {
+        categoria: {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_acierto': round(aciertos / (aciertos + fallos), 3),
+        }
+        for categoria, (aciertos, fallos) in sorted(copia.items())
+    }
+
+
+def reiniciar_estadisticas():
+    with _candado:
+        _estadisticas.clear()
+
+
+class CacheConContadores(BaseCache):
+    """Backend que delega en otro (``OPTIONS['BACKEND']``) y cuenta las lecturas"""
+
+    def __init__(self, location, params):
+        params = dict(params)
+        opciones = dict(params.get('OPTIONS', {}))
+        backend = opciones.pop('BACKEND')
+        params['OPTIONS'] = opciones
+        super().__init__(params)
+        self._cache = import_string(backend)(location, params)
+
+    def get(self, key, default=None, version=None):
+        centinela = object()
+        valor = self._cache.get(key, centinela, version=version)
+        _contar(key, valor is not centinela)
+        return default if valor is centinela else valor
+
+    def get_many(self, keys, version=None):
+        valores = self._cache.get_many(keys, version=version)
+        for key in keys:
+            _contar(key, key in valores)
+        return valores
+
+    def add(self, key, value, timeout=BaseCache.get_backend_timeout, version=None):
+        if timeout is BaseCache.get_backend_timeout:
+            timeout = self.default_timeout
+        return self._cache.add(key, value, timeout, version=version)
+
+    def set(self, key, value, timeout=BaseCache.get_backend_timeout, version=None):
+        if timeout is BaseCache.get_backend_timeout:
+            timeout = self.default_timeout
+        return self._cache.set(key, value, timeout, version=version)
+
+    def set_many(self, data, timeout=BaseCache.get_backend_timeout, version=None):
+        if timeout is BaseCache.get_backend_timeout:
+            timeout = self.default_timeout
+        return self._cache.set_many(data, timeout, version=version)
+
+    def touch(self, key, timeout=BaseCache.get_backend_timeout, version=None):
+        if timeout is BaseCache.get_backend_timeout:
+            timeout = self.default_timeout
+        return self._cache.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        return self._cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        return self._cache.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self._cache.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self._cache.decr(key, delta, version=version)
+
+    def clear(self):
+        return self._cache.clear()
+
+    def close(self, **kwargs):
+        return self._cache.close(**kwargs)
+
+
+def _clave_version(cancha_id, ambito):
+    return f'version:{ambito}:{cancha_id}'
+
+
+def version(cancha_id, ambito):
+    """Versión actual de los datos cacheados de una cancha en un ámbito"""
+    return caches[ALIAS].get_or_set(_clave_version(cancha_id, ambito), 1, None)
+
+
+async def aversion(cancha_id, ambito):
+    """Versión asíncrona de ``version``"""
+    return await caches[ALIAS].aget_or_set(_clave_version(cancha_id, ambito), 1, None)
+
+
+def invalidar(cancha_id, *ambitos):
+    """Descartar lo cacheado de una cancha en los ámbitos indicados"""
+    cache = caches[ALIAS]
+    for ambito in ambitos:
+        clave = _clave_version(cancha_id, ambito)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # Sin versión los lectores la crean en 1; add() no pisa otro incremento
+            cache.add(clave, 2, None) or cache.incr(clave)
+
+
+def _clave_vista(vista, request, cancha_id, version_actual):
+    ruta = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'vista.{vista.__name__}.{cancha_id}:{version_actual}:{ruta}'
+
+
+def cachear_json(ambito, timeout=None):
+    """
+    Cachear la respuesta JSON de una vista ``(request, cancha_id)``.
+
+    La clave incluye la URL completa y la versión de la cancha en ``ambito``,
+    así que basta con invalidar ese ámbito para descartar todas sus variantes.
+    Solo se guardan respuestas 200; sin ``timeout`` se usa el del alias.
+    Sirve tanto para vistas síncronas como asíncronas.
+    """
+    opciones = {} if timeout is None else {'timeout': timeout}
+
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, cancha_id, *args, **kwargs):
+                cache = caches[ALIAS]
+                clave = _clave_vista(vista, request, cancha_id, await aversion(cancha_id, ambito))
+
+                contenido = await cache.aget(clave)
+                if contenido is not None:
+                    return HttpResponse(contenido, content_type='application/json')
+
+                respuesta = await vista(request, cancha_id, *args, **kwargs)
+                if respuesta.status_code == 200:
+                    await cache.aset(clave, respuesta.content, **opciones)
+                return respuesta
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, cancha_id, *args, **kwargs):
+            cache = caches[ALIAS]
+            clave = _clave_vista(vista, request, cancha_id, version(cancha_id, ambito))
+
+            contenido = cache.get(clave)
+            if contenido is not None:
+                return HttpResponse(contenido, content_type='application/json')
+
+            respuesta = vista(request, cancha_id, *args, **kwargs)
+            if respuesta.status_code == 200:
+                cache.set(clave, respuesta.content, **opciones)
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,75 @@
+"""
+Agregados de reseñas por cancha.
+
+``Cancha`` guarda la suma de calificaciones, el total de reseñas y un
+histograma por estrellas. Cada alta, edición o baja de una ``Resena`` los
+ajusta con un único UPDATE basado en expresiones F (sin leer las reseñas), y
+``recalcular_todas`` los reconstruye desde cero en una sola sentencia.
+"""
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Now, Round
+
+from .models import Cancha, Resena
+
+
+def aplicar_cambio(cancha_id, anterior=None, nueva=None):
+    """
+    Ajustar los agregados de una cancha cuando una reseña pasa de la
+    calificación ``anterior`` a ``nueva`` (None = no existía / ya no existe).
+    """
+    if anterior == nueva:
+        return
+
+    delta_total = (nueva is not None) - (anterior is not None)
+    delta_suma = (nueva or 0) - (anterior or 0)
+
+    cambios = {
+        'total_resenas': F('total_resenas') + delta_total,
+        'suma_calificaciones': F('suma_calificaciones') + delta_suma,
+        'actualizado': Now(),
+    }
+    if anterior is not None:
+        cambios[f'estrellas_{anterior}'] = F(f'estrellas_{anterior}') - 1
+    if nueva is not None:
+        cambios[f'estrellas_{nueva}'] = F(f'estrellas_{nueva}') + 1
+
+    # En un UPDATE las expresiones leen los valores previos de la fila, así
+    # que el promedio se calcula con los totales ya ajustados.
+    nuevo_total = F('total_resenas') + delta_total
+    nueva_suma = F('suma_calificaciones') + delta_suma
+    cambios['calificacion'] = Case(
+        When(Q(total_resenas__gt=-delta_total),
+             then=Round(Cast(nueva_suma, FloatField()) / nuevo_total, 1)),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+    Cancha.objects.filter(id=cancha_id).update(**cambios)
+
+
+def recalcular_todas(modelo_cancha=Cancha, modelo_resena=Resena):
+    """Reconstruir los agregados de todas las canchas en una sola sentencia UPDATE"""
+    resenas = modelo_resena.objects.filter(cancha=OuterRef('pk')).order_by().values('cancha')
+
+    def agregado(expresion):
+        return Coalesce(Subquery(resenas.annotate(valor=expresion).values('valor')), 0)
+
+    cambios = {
+        # Los agregados son parte de la cancha: su marca cambia como en aplicar_cambio
+        'actualizado': Now(),
+        'total_resenas': agregado(Count('id')),
+        'suma_calificaciones': agregado(Sum('calificacion')),
+        'calificacion': Coalesce(
+            Subquery(resenas.annotate(
+                valor=Round(Cast(Sum('calificacion'), FloatField()) / Count('id'), 1)
+            ).values('valor')),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    }
+    for estrellas in range(1, 6):
+        cambios[f'estrellas_{estrellas}'] = agregado(
+            Count('id', filter=Q(calificacion=estrellas))
+        )
+
+    return modelo_cancha.objects.update(**cambios)
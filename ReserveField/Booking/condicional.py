@@ -0,0 +1,97 @@
+"""
+GET condicional (ETag / Last-Modified) para las vistas del catálogo.
+
+``condicional(estado)`` decora una vista: antes de ejecutarla llama a
+``estado(request, *args, **kwargs)``, que con una consulta indexada devuelve
+las partes de las que depende la respuesta (marcas ``actualizado``, conteos,
+el usuario...) y la fecha de la última modificación. Si el cliente ya tiene
+esa versión (``If-None-Match`` / ``If-Modified-Since``) se responde 304 sin
+ejecutar la vista; si no, la respuesta sale con ``ETag`` y ``Last-Modified``.
+
+Las señales de ``Horario`` y ``Tarifa`` tocan ``Cancha.actualizado`` (ver
+signals.py) para que la marca de la cancha cubra todo lo que muestra.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.contrib.messages import get_messages
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def version_despliegue():
+    """Hash del manifest de estáticos: las páginas cambian al desplegar otra versión"""
+    return getattr(staticfiles_storage, 'manifest_hash', '')
+
+
+def partes_pagina(request):
+    """Lo que cambia una página HTML además de sus datos: usuario, token CSRF y despliegue"""
+    return request.user.pk, request.META.get('CSRF_COOKIE'), version_despliegue()
+
+
+def _validadores(resultado):
+    """(etag, timestamp de Last-Modified) a partir de lo que devolvió ``estado``"""
+    partes, modificado = resultado
+    huella = hashlib.md5(repr(partes).encode()).hexdigest()
+    return f'"{huella}"', int(modificado.timestamp()) if modificado else None
+
+
+def _omitir(request):
+    # Los mensajes pendientes se consumen al renderizar: un 304 los escondería
+    return request.method not in ('GET', 'HEAD') or len(get_messages(request))
+
+
+def _aomitir(request):
+    # Las vistas asíncronas son APIs JSON: no muestran mensajes
+    return request.method not in ('GET', 'HEAD')
+
+
+def _completar(respuesta, etag, modificado):
+    if respuesta.status_code == 200:
+        respuesta.headers.setdefault('ETag', etag)
+        if modificado:
+            respuesta.headers.setdefault('Last-Modified', http_date(modificado))
+    return respuesta
+
+
+def condicional(estado):
+    """
+    Responder 304 si no cambió lo que devuelve ``estado``.
+
+    ``estado`` recibe los mismos argumentos que la vista y devuelve ``(partes,
+    última modificación)`` o None si no se puede calcular (p. ej. la cancha no
+    existe), en cuyo caso la vista responde como siempre. Para vistas
+    asíncronas ``estado`` debe ser una corrutina.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                if _aomitir(request):
+                    return await vista(request, *args, **kwargs)
+                resultado = await estado(request, *args, **kwargs)
+                if resultado is None:
+                    return await vista(request, *args, **kwargs)
+                etag, modificado = _validadores(resultado)
+                respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+                if respuesta is None:
+                    respuesta = await vista(request, *args, **kwargs)
+                return _completar(respuesta, etag, modificado)
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if _omitir(request):
+                return vista(request, *args, **kwargs)
+            resultado = estado(request, *args, **kwargs)
+            if resultado is None:
+                return vista(request, *args, **kwargs)
+            etag, modificado = _validadores(resultado)
+            respuesta = get_conditional_response(request, etag=etag, last_modified=modificado)
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+            return _completar(respuesta, etag, modificado)
+        return envoltura
+    return decorador
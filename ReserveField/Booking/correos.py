@@ -0,0 +1,170 @@
+"""
+Cola de correos salientes.
+
+Las vistas no hablan con el servidor SMTP: ``encolar`` guarda el correo en la
+tabla ``Correo`` y el comando ``procesar_correos`` lo envía en segundo plano.
+
+- Cada worker reclama un lote marcándolo con un token y adelantando
+  ``proximo_intento`` (el plazo de envío), así que dos workers nunca toman el
+  mismo correo y uno que muere a medio lote lo libera al vencer el plazo.
+- Un lote se envía por una sola conexión SMTP.
+- Los fallos se reintentan con espera exponencial y, tras
+  ``CORREOS_MAX_INTENTOS``, el correo queda como ``fallido``.
+"""
+import random
+import smtplib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Correo
+
+MAX_INTENTOS = getattr(settings, 'CORREOS_MAX_INTENTOS', 5)
+ESPERA_BASE = getattr(settings, 'CORREOS_ESPERA_BASE', 30)
+ESPERA_MAXIMA = getattr(settings, 'CORREOS_ESPERA_MAXIMA', 3600)
+PLAZO_ENVIO = getattr(settings, 'CORREOS_PLAZO_ENVIO', 300)
+
+
+def encolar(asunto, mensaje, destinatarios, remitente=''):
+    """Guardar un correo para enviarlo en segundo plano; None si no hay destinatarios"""
+    destinatarios = [destinatario for destinatario in destinatarios if destinatario]
+    if not destinatarios:
+        return None
+    return Correo.objects.create(
+        asunto=asunto,
+        mensaje=mensaje,
+        remitente=remitente or '',
+        destinatarios=destinatarios,
+    )
+
+
+def _encolar_plantilla(asunto, plantilla, reserva):
+    mensaje = render_to_string(plantilla, {'reserva': reserva})
+    return encolar(asunto, mensaje, [reserva.usuario.email])
+
+
+def notificar_reserva(reserva):
+    """Encolar la confirmación de una reserva para su usuario"""
+    return _encolar_plantilla(
+        f'Reserva confirmada: {reserva.cancha.nombre}',
+        'booking/correos/reserva_confirmada.txt',
+        reserva,
+    )
+
+
+def notificar_cancelacion(reserva):
+    """Encolar el aviso de cancelación de una reserva para su usuario"""
+    return _encolar_plantilla(
+        f'Reserva cancelada: {reserva.cancha.nombre}',
+        'booking/correos/reserva_cancelada.txt',
+        reserva,
+    )
+
+
+def notificar_serie(serie, reservas):
+    """Encolar un único aviso con todas las fechas de una serie de reservas"""
+    mensaje = render_to_string('booking/correos/serie_confirmada.txt', {
+        'serie': serie,
+        'reservas': reservas,
+    })
+    return encolar(
+        f'Reservas semanales confirmadas: {serie.cancha.nombre}', mensaje, [serie.usuario.email]
+    )
+
+
+def espera(intentos):
+    """Segundos hasta el siguiente intento: exponencial, con tope y algo de azar"""
+    segundos = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** (intentos - 1))
+    return segundos * random.uniform(0.5, 1)
+
+
+def tomar_lote(tamano):
+    """Reclamar hasta ``tamano`` correos vencidos para este worker"""
+    ahora = timezone.now()
+    token = uuid.uuid4().hex
+    vencidos = Correo.objects.filter(estado='pendiente', proximo_intento__lte=ahora)
+    candidatos = vencidos.order_by('proximo_intento', 'id')
+    reclamo = {
+        'reclamado_por': token,
+        'proximo_intento': ahora + timedelta(seconds=PLAZO_ENVIO),
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                candidatos.select_for_update(skip_locked=True).values_list('id', flat=True)[:tamano]
+            )
+            vencidos.filter(id__in=ids).update(**reclamo)
+    else:
+        # Una sola sentencia: en SQLite leer y después escribir dentro de la
+        # misma transacción falla con "database is locked" entre workers.
+        # Repetir la condición evita pisar a otro worker que se adelantó.
+        vencidos.filter(id__in=candidatos.values('id')[:tamano]).update(**reclamo)
+    return list(Correo.objects.filter(reclamado_por=token).order_by('id'))
+
+
+def _mensaje(correo, conexion):
+    return EmailMessage(
+        subject=correo.asunto,
+        body=correo.mensaje,
+        from_email=correo.remitente or None,
+        to=correo.destinatarios,
+        connection=conexion,
+    )
+
+
+def _registrar_fallo(correo, error):
+    correo.intentos += 1
+    correo.ultimo_error = f'{type(error).__name__}: {error}'
+    correo.reclamado_por = ''
+    if correo.intentos >= MAX_INTENTOS:
+        correo.estado = 'fallido'
+    else:
+        correo.proximo_intento = timezone.now() + timedelta(seconds=espera(correo.intentos))
+    correo.save(update_fields=['intentos', 'ultimo_error', 'reclamado_por', 'estado', 'proximo_intento'])
+
+
+def enviar_lote(correos):
+    """Enviar los correos por una sola conexión SMTP; devuelve cuántos salieron"""
+    if not correos:
+        return 0
+
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except (smtplib.SMTPException, OSError) as error:
+        # Servidor inaccesible: todo el lote vuelve a la cola
+        for correo in correos:
+            _registrar_fallo(correo, error)
+        return 0
+
+    enviados = []
+    try:
+        for correo in correos:
+            try:
+                conexion.send_messages([_mensaje(correo, conexion)])
+            except Exception as error:
+                # Un correo malo (p. ej. BadHeaderError por un salto de línea en
+                # el asunto) no debe frenar al resto del lote
+                _registrar_fallo(correo, error)
+            else:
+                enviados.append(correo.id)
+    finally:
+        try:
+            conexion.close()
+        finally:
+            # Siempre, para no reenviar lo que ya salió cuando venza el plazo
+            Correo.objects.filter(id__in=enviados).update(
+                estado='enviado', enviado=timezone.now(), reclamado_por='', ultimo_error='',
+            )
+    return len(enviados)
+
+
+def procesar_lote(tamano=50):
+    """Reclamar y enviar un lote; devuelve (reclamados, enviados)"""
+    correos = tomar_lote(tamano)
+    return len(correos), enviar_lote(correos)
@@ -0,0 +1,195 @@
+"""
+Índice de disponibilidad por cancha y fecha.
+
+Cada entrada guarda el horario del día, las reservas activas y un mapa de
+bits con los bloques libres, y se construye desde la base de datos la
+primera vez que se pide; mientras nada cambie, la API de horarios responde
+desde caché sin ejecutar SQL.
+
+Las entradas no se modifican en el lugar: la clave lleva una versión por
+cancha y otra por (cancha, fecha), y las señales de ``Reserva`` y
+``Horario`` (ver ``signals.py``) las incrementan tras el commit de cada
+escritura. ``incr`` es atómico en la caché, así que dos reservas
+simultáneas no pisan una la actualización de la otra, y quien construye
+lee las versiones antes de consultar la base de datos: si una escritura se
+confirma en medio, su entrada queda guardada con una versión ya vieja y
+nunca se lee.
+"""
+from datetime import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Horario, Reserva
+
+MINUTOS_POR_BLOQUE = 30
+BLOQUES_POR_DIA = 24 * 60 // MINUTOS_POR_BLOQUE
+ESTADOS_ACTIVOS = Reserva.ESTADOS_ACTIVOS
+
+# Con una caché local por proceso (locmem) cada worker mantiene su propio
+# índice; el timeout acota cuánto puede quedar desfasado respecto a otros.
+TIMEOUT = getattr(settings, 'DISPONIBILIDAD_CACHE_TIMEOUT', 300)
+
+
+def a_minutos(hora):
+    """Convertir un ``time`` a minutos desde la medianoche"""
+    return hora.hour * 60 + hora.minute
+
+
+def a_hora(minutos):
+    """Convertir minutos desde la medianoche a ``time``"""
+    return time(minutos // 60, minutos % 60)
+
+
+def calcular_bloques(apertura, cierre, intervalos):
+    """Mapa de bits de bloques libres dentro de [apertura, cierre) en minutos"""
+    libres = 0
+    primero = -(-apertura // MINUTOS_POR_BLOQUE)
+    ultimo = cierre // MINUTOS_POR_BLOQUE
+    for bloque in range(primero, ultimo):
+        libres |= 1 << bloque
+
+    for inicio, fin in intervalos:
+        desde = inicio // MINUTOS_POR_BLOQUE
+        hasta = -(-fin // MINUTOS_POR_BLOQUE)
+        for bloque in range(desde, hasta):
+            libres &= ~(1 << bloque)
+    return libres
+
+
+def ventanas_libres(apertura, cierre, intervalos, duracion_minima=0):
+    """Restar intervalos ocupados a [apertura, cierre) y devolver las ventanas libres"""
+    ventanas = []
+    cursor = apertura
+    for inicio, fin in sorted(intervalos):
+        if inicio > cursor:
+            ventanas.append((cursor, min(inicio, cierre)))
+        cursor = max(cursor, fin)
+        if cursor >= cierre:
+            break
+    if cursor < cierre:
+        ventanas.append((cursor, cierre))
+    return [
+        (inicio, fin) for inicio, fin in ventanas
+        if fin - inicio >= max(duracion_minima, 1)
+    ]
+
+
+def bloques_libres(libres):
+    """Horas de inicio ('HH:MM') de cada bloque libre del mapa de bits"""
+    return [
+        a_hora(bloque * MINUTOS_POR_BLOQUE).strftime('%H:%M')
+        for bloque in range(BLOQUES_POR_DIA)
+        if libres >> bloque & 1
+    ]
+
+
+def _clave_version(cancha_id, fecha=None):
+    if fecha is None:
+        return f'disponibilidad:version:{cancha_id}'
+    return f'disponibilidad:version:{cancha_id}:{fecha.isoformat()}'
+
+
+def _clave(cancha_id, fecha):
+    version_cancha = cache.get_or_set(_clave_version(cancha_id), 1, None)
+    version_fecha = cache.get_or_set(_clave_version(cancha_id, fecha), 1, None)
+    return f'disponibilidad:{cancha_id}:{version_cancha}:{version_fecha}:{fecha.isoformat()}'
+
+
+async def _aclave(cancha_id, fecha):
+    version_cancha = await cache.aget_or_set(_clave_version(cancha_id), 1, None)
+    version_fecha = await cache.aget_or_set(_clave_version(cancha_id, fecha), 1, None)
+    return f'disponibilidad:{cancha_id}:{version_cancha}:{version_fecha}:{fecha.isoformat()}'
+
+
+def consultar(cancha_id, fecha):
+    """Entrada del índice en caché, o None si aún no se ha construido"""
+    return cache.get(_clave(cancha_id, fecha))
+
+
+async def aconsultar(cancha_id, fecha):
+    """Versión asíncrona de ``consultar``"""
+    return await cache.aget(await _aclave(cancha_id, fecha))
+
+
+def _reservas_activas(cancha_id, fecha):
+    return Reserva.objects.filter(
+        cancha_id=cancha_id,
+        fecha=fecha,
+        estado__in=ESTADOS_ACTIVOS,
+    ).order_by().values_list('id', 'hora_inicio', 'hora_fin')
+
+
+def _horario(cancha_id, fecha):
+    return Horario.objects.filter(
+        cancha_id=cancha_id, dia_semana=fecha.weekday()
+    ).values_list('hora_apertura', 'hora_cierre')
+
+
+def _entrada(horario, reservas):
+    if horario is None:
+        return {'abierto': False}
+    entrada = {
+        'abierto': True,
+        'apertura': a_minutos(horario[0]),
+        'cierre': a_minutos(horario[1]),
+        'reservas': {
+            reserva_id: (a_minutos(inicio), a_minutos(fin))
+            for reserva_id, inicio, fin in reservas
+        },
+    }
+    _recalcular(entrada)
+    return entrada
+
+
+def construir(cancha_id, fecha):
+    """Construir (y guardar) la entrada de una cancha y fecha desde la base de datos"""
+    # La clave se fija antes de leer: lo leído nunca es más viejo que su versión
+    clave = _clave(cancha_id, fecha)
+    horario = _horario(cancha_id, fecha).first()
+    reservas = _reservas_activas(cancha_id, fecha) if horario else []
+    entrada = _entrada(horario, reservas)
+    cache.set(clave, entrada, TIMEOUT)
+    return entrada
+
+
+async def aconstruir(cancha_id, fecha):
+    """Versión asíncrona de ``construir`` (ORM y caché asíncronos)"""
+    clave = await _aclave(cancha_id, fecha)
+    horario = await _horario(cancha_id, fecha).afirst()
+    reservas = [fila async for fila in _reservas_activas(cancha_id, fecha)] if horario else []
+    entrada = _entrada(horario, reservas)
+    await cache.aset(clave, entrada, TIMEOUT)
+    return entrada
+
+
+def obtener(cancha_id, fecha):
+    """Entrada del índice, construyéndola si no está en caché"""
+    entrada = consultar(cancha_id, fecha)
+    if entrada is None:
+        entrada = construir(cancha_id, fecha)
+    return entrada
+
+
+def _recalcular(entrada):
+    entrada['libres'] = calcular_bloques(
+        entrada['apertura'], entrada['cierre'], entrada['reservas'].values()
+    )
+
+
+def _incrementar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Sin versión guardada los lectores la crean en 1: pasar a 2 ya invalida
+        cache.add(clave, 2, None) or cache.incr(clave)
+
+
+def invalidar(cancha_id, fecha):
+    """Descartar la entrada de una cancha y fecha (llamar tras el commit)"""
+    _incrementar(_clave_version(cancha_id, fecha))
+
+
+def invalidar_cancha(cancha_id):
+    """Descartar todas las entradas de una cancha (p. ej. al cambiar sus horarios)"""
+    _incrementar(_clave_version(cancha_id))
@@ -0,0 +1,79 @@
+"""
+Transiciones automáticas del estado de las reservas.
+
+- Las reservas confirmadas cuyo horario ya terminó pasan a ``completada``.
+- Las ``pendiente`` que superan ``RESERVAS_PLAZO_PENDIENTE`` minutos, o cuyo
+  horario ya empezó, vencen y pasan a ``cancelada``.
+
+Cada cambio es un UPDATE por lotes de ``id`` acotados, así que ninguna
+sentencia retiene la tabla mucho tiempo. Como ``update()`` no dispara las
+señales de ``Reserva``, cada lote actualiza a mano, tras el commit, el
+índice de disponibilidad, la caché del catálogo y los eventos en vivo.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache_catalogo, disponibilidad, eventos
+from .models import Reserva
+
+PLAZO_PENDIENTE = getattr(settings, 'RESERVAS_PLAZO_PENDIENTE', 30)
+
+
+def _terminadas(ahora):
+    return Q(fecha__lt=ahora.date()) | Q(fecha=ahora.date(), hora_fin__lte=ahora.time())
+
+
+def _vencidas(ahora):
+    return (
+        Q(creado__lt=ahora - timedelta(minutes=PLAZO_PENDIENTE))
+        | Q(fecha__lt=ahora.date())
+        | Q(fecha=ahora.date(), hora_inicio__lte=ahora.time())
+    )
+
+
+def _por_lotes(candidatas, estado, lote):
+    """Pasar ``candidatas`` a ``estado`` de a ``lote`` filas; genera cuántas cambió cada lote"""
+    while True:
+        franjas = list(candidatas.order_by('fecha', 'id').values_list(
+            'id', 'cancha_id', 'fecha', 'hora_inicio', 'hora_fin'
+        )[:lote])
+        if not franjas:
+            return
+
+        ids = [franja[0] for franja in franjas]
+        # Repetir el filtro descarta las filas que otro proceso cambió
+        # entre la lectura y el UPDATE
+        cambiadas = candidatas.filter(id__in=ids).update(estado=estado, actualizado=timezone.now())
+        _liberar(franjas)
+        yield cambiadas
+
+
+def _liberar(franjas):
+    # Todo tras el commit, como en las señales: antes, otra conexión podría
+    # volver a cachear las reservas viejas
+    def liberar():
+        for cancha_id, fecha in {(franja[1], franja[2]) for franja in franjas}:
+            disponibilidad.invalidar(cancha_id, fecha)
+        for cancha_id in {franja[1] for franja in franjas}:
+            cache_catalogo.invalidar(cancha_id, 'disponibilidad')
+        for reserva_id, cancha_id, fecha, inicio, fin in franjas:
+            eventos.publicar_franja('liberado', reserva_id, (cancha_id, fecha, inicio, fin))
+    transaction.on_commit(liberar)
+
+
+def completar_terminadas(ahora=None, lote=500):
+    """Pasar a ``completada`` las reservas confirmadas que ya terminaron"""
+    ahora = timezone.localtime(ahora)
+    candidatas = Reserva.objects.filter(_terminadas(ahora), estado='confirmada')
+    return _por_lotes(candidatas, 'completada', lote)
+
+
+def vencer_pendientes(ahora=None, lote=500):
+    """Cancelar las reservas pendientes que superaron el plazo o cuyo horario ya empezó"""
+    ahora = timezone.localtime(ahora)
+    candidatas = Reserva.objects.filter(_vencidas(ahora), estado='pendiente')
+    return _por_lotes(candidatas, 'cancelada', lote)
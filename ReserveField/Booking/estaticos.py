@@ -0,0 +1,303 @@
+"""
+Archivos estáticos y media en producción.
+
+- ``AlmacenComprimido``: el storage de ``collectstatic`` agrega un hash del
+  contenido a cada nombre (``ManifestStaticFilesStorage``) y deja junto a cada
+  archivo de texto una copia ``.gz`` y, si está instalado ``brotli``, otra
+  ``.br``, comprimidas una sola vez al desplegar.
+- ``ServidorEstaticos``: envuelve la aplicación WSGI y responde ``STATIC_URL``
+  y ``MEDIA_URL`` sin pasar por Django. Los estáticos se indexan al arrancar,
+  así que cada petición es una búsqueda en un diccionario; los media se buscan
+  en disco porque se suben en caliente. Responde ``If-None-Match`` /
+  ``If-Modified-Since`` con 304, ``Range`` con 206 y entrega el archivo
+  abierto a ``wsgi.file_wrapper``, que en gunicorn usa ``sendfile()``.
+
+Los archivos con hash en el nombre (y las variantes de imágenes, ver
+``ESTATICOS_MEDIA_INMUTABLES``) se cachean un año como ``immutable``; el resto
+``ESTATICOS_MAX_AGE`` segundos.
+"""
+import gzip
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+EXTENSIONES_COMPRIMIBLES = (
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot',
+)
+# Solo se guarda la copia comprimida si ahorra al menos esta fracción
+AHORRO_MINIMO = 0.05
+
+UN_ANO = 365 * 24 * 3600
+TAMANO_BLOQUE = 64 * 1024
+
+# extensión de la copia: Content-Encoding, en orden de preferencia
+CODIFICACIONES = {'.br': 'br', '.gz': 'gzip'}
+
+
+def _comprimir(contenido):
+    """Copias comprimidas de ``contenido`` que valen la pena: {extensión: bytes}"""
+    copias = {'.gz': gzip.compress(contenido, 9, mtime=0)}
+    if brotli is not None:
+        copias['.br'] = brotli.compress(contenido, quality=11)
+    return {
+        extension: copia for extension, copia in copias.items()
+        if len(copia) <= len(contenido) * (1 - AHORRO_MINIMO)
+    }
+
+
+class AlmacenComprimido(ManifestStaticFilesStorage):
+    """Manifest con hashes más copias gzip/brotli precomprimidas"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Tanto los originales como sus versiones con hash se pueden pedir
+        nombres = set(paths) | set(self.hashed_files.values())
+        for nombre in sorted(nombres):
+            if not nombre.endswith(EXTENSIONES_COMPRIMIBLES) or not self.exists(nombre):
+                continue
+            with self.open(nombre) as archivo:
+                contenido = archivo.read()
+            for extension, copia in _comprimir(contenido).items():
+                if self.exists(nombre + extension):
+                    self.delete(nombre + extension)
+                self._save(nombre + extension, ContentFile(copia))
+                yield nombre, nombre + extension, True
+
+
+class _Archivo:
+    """Datos de un archivo servible y sus copias comprimidas"""
+
+    __slots__ = ('ruta', 'tamano', 'modificado', 'etag', 'tipo', 'cache_control', 'copias')
+
+    def __init__(self, ruta, estado, inmutable, copias=()):
+        self.ruta = ruta
+        self.tamano = estado.st_size
+        self.modificado = int(estado.st_mtime)
+        self.etag = f'"{estado.st_size:x}-{estado.st_mtime_ns:x}"'
+        tipo, _ = mimetypes.guess_type(ruta)
+        tipo = tipo or 'application/octet-stream'
+        if tipo.startswith('text/') or tipo in ('application/javascript', 'application/json', 'image/svg+xml'):
+            tipo += '; charset=utf-8'
+        self.tipo = tipo
+        self.cache_control = (
+            f'public, max-age={UN_ANO}, immutable' if inmutable
+            else f'public, max-age={getattr(settings, "ESTATICOS_MAX_AGE", 60)}'
+        )
+        # [(Content-Encoding, ruta, tamaño, etag)] en orden de preferencia
+        self.copias = list(copias)
+
+
+class _Tramo:
+    """
+    Archivo abierto que se lee solo hasta ``restantes`` bytes.
+
+    gunicorn lo envía con sendfile() desde la posición actual y la cantidad
+    de Content-Length; otros servidores lo leen con read().
+    """
+
+    def __init__(self, archivo, restantes):
+        self._archivo = archivo
+        self._restantes = restantes
+
+    def fileno(self):
+        return self._archivo.fileno()
+
+    def read(self, tamano=-1):
+        if tamano < 0 or tamano > self._restantes:
+            tamano = self._restantes
+        datos = self._archivo.read(tamano)
+        self._restantes -= len(datos)
+        return datos
+
+    def close(self):
+        self._archivo.close()
+
+
+def _acepta(accept_encoding):
+    """Codificaciones aceptadas por el cliente (sin las que tienen q=0)"""
+    aceptadas = set()
+    for parte in accept_encoding.split(','):
+        codificacion, _, parametros = parte.partition(';')
+        if re.fullmatch(r'\s*q\s*=\s*0(\.0*)?\s*', parametros):
+            continue
+        aceptadas.add(codificacion.strip().lower())
+    return aceptadas
+
+
+def _coincide_etag(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    # Comparación débil: W/"x" equivale a "x"
+    return etag in (valor.strip().removeprefix('W/') for valor in if_none_match.split(','))
+
+
+def _rango(cabecera, tamano):
+    """
+    (inicio, fin) inclusivo de un único rango ``bytes=``; None si la cabecera
+    no se puede usar (se responde el archivo completo) y False si el rango
+    queda fuera del archivo (416).
+    """
+    coincidencia = re.fullmatch(r'\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*', cabecera)
+    if not coincidencia or coincidencia.groups() == ('', ''):
+        return None
+    inicio, fin = coincidencia.groups()
+    if inicio == '':
+        # Sufijo: los últimos N bytes
+        largo = int(fin)
+        if largo == 0:
+            return False
+        return max(0, tamano - largo), tamano - 1
+    inicio = int(inicio)
+    fin = tamano - 1 if fin == '' else min(int(fin), tamano - 1)
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+class ServidorEstaticos:
+    """Aplicación WSGI que sirve estáticos y media y delega el resto en Django"""
+
+    def __init__(self, aplicacion):
+        self.aplicacion = aplicacion
+        self.prefijo_static = '/' + settings.STATIC_URL.lstrip('/')
+        self.prefijo_media = '/' + settings.MEDIA_URL.lstrip('/')
+        self.raiz_media = str(settings.MEDIA_ROOT)
+        self.media_inmutables = tuple(getattr(settings, 'ESTATICOS_MEDIA_INMUTABLES', ()))
+        self.estaticos = self._indexar(str(settings.STATIC_ROOT)) if settings.STATIC_ROOT else {}
+
+    def _indexar(self, raiz):
+        """{nombre relativo: _Archivo} de todo lo que dejó collectstatic"""
+        try:
+            hasheados = set(staticfiles_storage.hashed_files.values())
+        except AttributeError:
+            # Storage sin manifest: ningún nombre lleva hash
+            hasheados = set()
+
+        archivos = {}
+        for directorio, _, nombres in os.walk(raiz):
+            for nombre in nombres:
+                if nombre.endswith(tuple(CODIFICACIONES)):
+                    continue
+                ruta = os.path.join(directorio, nombre)
+                relativo = os.path.relpath(ruta, raiz).replace(os.sep, '/')
+                copias = []
+                for extension, codificacion in CODIFICACIONES.items():
+                    if os.path.isfile(ruta + extension):
+                        estado = os.stat(ruta + extension)
+                        etag = f'"{estado.st_size:x}-{estado.st_mtime_ns:x}-{extension[1:]}"'
+                        copias.append((codificacion, ruta + extension, estado.st_size, etag))
+                archivos[relativo] = _Archivo(ruta, os.stat(ruta), relativo in hasheados, copias)
+        return archivos
+
+    def _media(self, relativo):
+        try:
+            ruta = safe_join(self.raiz_media, relativo)
+            estado = os.stat(ruta)
+        except (SuspiciousFileOperation, OSError, ValueError):
+            return None
+        if not stat.S_ISREG(estado.st_mode):
+            return None
+        return _Archivo(ruta, estado, relativo.startswith(self.media_inmutables))
+
+    def _buscar(self, ruta):
+        if ruta.startswith(self.prefijo_static):
+            return self.estaticos.get(ruta[len(self.prefijo_static):])
+        if ruta.startswith(self.prefijo_media):
+            return self._media(ruta[len(self.prefijo_media):])
+        return None
+
+    def __call__(self, environ, start_response):
+        archivo = None
+        if environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+            archivo = self._buscar(environ.get('PATH_INFO', ''))
+        if archivo is None:
+            return self.aplicacion(environ, start_response)
+        return self.servir(archivo, environ, start_response)
+
+    def servir(self, archivo, environ, start_response):
+        rango_pedido = environ.get('HTTP_RANGE')
+        ruta, tamano, etag, codificacion = archivo.ruta, archivo.tamano, archivo.etag, None
+        if archivo.copias and not rango_pedido:
+            aceptadas = _acepta(environ.get('HTTP_ACCEPT_ENCODING', ''))
+            for copia in archivo.copias:
+                if copia[0] in aceptadas:
+                    codificacion, ruta, tamano, etag = copia
+                    break
+
+        cabeceras = [
+            ('Content-Type', archivo.tipo),
+            ('Cache-Control', archivo.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', http_date(archivo.modificado)),
+        ]
+        if archivo.copias:
+            cabeceras.append(('Vary', 'Accept-Encoding'))
+        if codificacion:
+            cabeceras.append(('Content-Encoding', codificacion))
+        else:
+            cabeceras.append(('Accept-Ranges', 'bytes'))
+
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            no_modificado = _coincide_etag(if_none_match, etag)
+        else:
+            desde = parse_http_date_safe(environ.get('HTTP_IF_MODIFIED_SINCE', ''))
+            no_modificado = desde is not None and archivo.modificado <= desde
+        if no_modificado:
+            start_response('304 Not Modified', [
+                cabecera for cabecera in cabeceras if cabecera[0] not in ('Content-Type', 'Content-Encoding')
+            ])
+            return []
+
+        inicio, fin, estado = 0, tamano - 1, '200 OK'
+        if_range = environ.get('HTTP_IF_RANGE')
+        if rango_pedido and (if_range is None or if_range.strip() == etag):
+            rango = _rango(rango_pedido, tamano)
+            if rango is False:
+                start_response('416 Range Not Satisfiable', cabeceras + [
+                    ('Content-Range', f'bytes */{tamano}'), ('Content-Length', '0'),
+                ])
+                return []
+            if rango is not None:
+                inicio, fin = rango
+                estado = '206 Partial Content'
+                cabeceras.append(('Content-Range', f'bytes {inicio}-{fin}/{tamano}'))
+        largo = fin - inicio + 1
+        cabeceras.append(('Content-Length', str(largo)))
+
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            start_response(estado, cabeceras)
+            return []
+
+        contenido = open(ruta, 'rb')
+        if inicio:
+            contenido.seek(inicio)
+        start_response(estado, cabeceras)
+        tramo = _Tramo(contenido, largo)
+        envolver = environ.get('wsgi.file_wrapper')
+        if envolver is not None:
+            return envolver(tramo, TAMANO_BLOQUE)
+        return _bloques(tramo)
+
+
+def _bloques(tramo):
+    try:
+        while bloque := tramo.read(TAMANO_BLOQUE):
+            yield bloque
+    finally:
+        tramo.close()
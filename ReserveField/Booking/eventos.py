@@ -0,0 +1,170 @@
+"""
+Eventos de disponibilidad en tiempo real.
+
+Las señales de ``Reserva`` publican, al confirmarse la transacción, un evento
+``ocupado`` o ``liberado`` en el canal de su cancha y fecha; la vista
+``eventos_disponibilidad`` los reenvía a los navegadores como Server-Sent
+Events.
+
+El broker se elige con ``EVENTOS_BROKER`` (ver settings.py):
+
+- ``BrokerLocal``: pub/sub en memoria. Solo entrega eventos dentro del mismo
+  proceso, así que sirve con un único worker ASGI.
+- ``BrokerRedis``: pub/sub de Redis, para varios workers o servidores.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Eventos que puede acumular un cliente lento antes de pedirle que se resincronice
+MAX_PENDIENTES = 100
+
+_broker = None
+_candado_broker = threading.Lock()
+
+
+def canal_disponibilidad(cancha_id, fecha):
+    return f'disponibilidad:{cancha_id}:{fecha}'
+
+
+def formatear_sse(tipo, datos):
+    """Serializar un evento en el formato de text/event-stream"""
+    return f'event: {tipo}\ndata: {json.dumps(datos)}\n\n'
+
+
+class SuscripcionLocal:
+    def __init__(self, broker, canal):
+        self._broker = broker
+        self._canal = canal
+        self._cola = asyncio.Queue(maxsize=MAX_PENDIENTES)
+
+    async def __aenter__(self):
+        self._loop = asyncio.get_running_loop()
+        self._broker._agregar(self._canal, self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._broker._quitar(self._canal, self)
+
+    def _entregar(self, evento):
+        # Se ejecuta en el loop del suscriptor (ver BrokerLocal.publicar)
+        if self._cola.full():
+            while not self._cola.empty():
+                self._cola.get_nowait()
+            evento = {'tipo': 'resincronizar'}
+        self._cola.put_nowait(evento)
+
+    async def recibir(self, timeout=None):
+        """Siguiente evento del canal, o None si pasan ``timeout`` segundos sin eventos"""
+        try:
+            return await asyncio.wait_for(self._cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BrokerLocal:
+    """Pub/sub en memoria del proceso; se puede publicar desde cualquier hilo"""
+
+    def __init__(self, location=None):
+        self._suscriptores = defaultdict(set)
+        self._candado = threading.Lock()
+
+    def _agregar(self, canal, suscripcion):
+        with self._candado:
+            self._suscriptores[canal].add(suscripcion)
+
+    def _quitar(self, canal, suscripcion):
+        with self._candado:
+            self._suscriptores[canal].discard(suscripcion)
+            if not self._suscriptores[canal]:
+                del self._suscriptores[canal]
+
+    def suscriptores(self, canal):
+        with self._candado:
+            return len(self._suscriptores.get(canal, ()))
+
+    def publicar(self, canal, evento):
+        with self._candado:
+            destinos = list(self._suscriptores.get(canal, ()))
+        for suscripcion in destinos:
+            # Las señales corren en el hilo de la vista síncrona, no en el loop
+            suscripcion._loop.call_soon_threadsafe(suscripcion._entregar, evento)
+
+    def suscribir(self, canal):
+        return SuscripcionLocal(self, canal)
+
+
+class SuscripcionRedis:
+    def __init__(self, location, canal):
+        self._location = location
+        self._canal = canal
+
+    async def __aenter__(self):
+        from redis import asyncio as redis_asyncio
+
+        self._cliente = redis_asyncio.Redis.from_url(self._location)
+        self._pubsub = self._cliente.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._canal)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._pubsub.unsubscribe(self._canal)
+        await self._pubsub.aclose()
+        await self._cliente.aclose()
+
+    async def recibir(self, timeout=None):
+        mensaje = await self._pubsub.get_message(timeout=timeout)
+        if mensaje is None:
+            return None
+        return json.loads(mensaje['data'])
+
+
+class BrokerRedis:
+    """Pub/sub de Redis (requiere el paquete ``redis``)"""
+
+    def __init__(self, location):
+        import redis
+
+        self._location = location
+        self._cliente = redis.Redis.from_url(location)
+
+    def publicar(self, canal, evento):
+        self._cliente.publish(canal, json.dumps(evento))
+
+    def suscribir(self, canal):
+        return SuscripcionRedis(self._location, canal)
+
+
+def obtener_broker():
+    """Broker configurado en ``EVENTOS_BROKER``, creado una sola vez por proceso"""
+    global _broker
+    with _candado_broker:
+        if _broker is None:
+            configuracion = settings.EVENTOS_BROKER
+            _broker = import_string(configuracion['BACKEND'])(configuracion.get('LOCATION'))
+        return _broker
+
+
+def suscribir(canal):
+    """Suscripción a un canal, para usar con ``async with``"""
+    return obtener_broker().suscribir(canal)
+
+
+def _hora(valor):
+    # Acepta time o la cadena 'HH:MM[:SS]' que aún no pasó por la base de datos
+    return str(valor)[:5]
+
+
+def publicar_franja(tipo, reserva_id, franja):
+    """Publicar que la franja (cancha_id, fecha, inicio, fin) se ocupó o se liberó"""
+    cancha_id, fecha, inicio, fin = franja
+    obtener_broker().publicar(canal_disponibilidad(cancha_id, fecha), {
+        'tipo': tipo,
+        'reserva': reserva_id,
+        'hora_inicio': _hora(inicio),
+        'hora_fin': _hora(fin),
+    })
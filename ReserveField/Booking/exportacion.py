@@ -0,0 +1,116 @@
+"""
+Exportación de reservas e ingresos.
+
+Las reservas se exportan como CSV o JSON Lines generando una línea por fila:
+la consulta se lee con ``.iterator(chunk_size=...)`` y cada línea se entrega a
+un ``StreamingHttpResponse`` o a un archivo apenas se produce, así que la
+memoria no depende de cuántas filas se exporten. Los resúmenes de ingresos se
+agrupan en la base de datos.
+"""
+import csv
+import json
+from decimal import Decimal
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Sum
+
+TAMANO_BLOQUE = 2000
+CENTAVO = Decimal('0.01')
+
+# Estados que cuentan como ingreso
+ESTADOS_COBRADOS = ('confirmada', 'completada')
+
+# (encabezado, campo) de cada columna exportada
+COLUMNAS = [
+    ('id', 'id'),
+    ('fecha', 'fecha'),
+    ('hora_inicio', 'hora_inicio'),
+    ('hora_fin', 'hora_fin'),
+    ('estado', 'estado'),
+    ('total', 'total'),
+    ('cancha_id', 'cancha_id'),
+    ('cancha', 'cancha__nombre'),
+    ('tipo', 'cancha__tipo'),
+    ('ubicacion', 'cancha__ubicacion'),
+    ('usuario_id', 'usuario_id'),
+    ('usuario', 'usuario__username'),
+    ('email', 'usuario__email'),
+    ('creado', 'creado'),
+]
+ENCABEZADOS = [encabezado for encabezado, _ in COLUMNAS]
+
+# Agrupaciones del resumen de ingresos: campos del GROUP BY
+AGRUPACIONES = {
+    'cancha': ('cancha_id', 'cancha__nombre', 'cancha__tipo'),
+    'dia': ('fecha',),
+    'tipo': ('cancha__tipo',),
+}
+
+
+def filas(*querysets):
+    """Tuplas de ``COLUMNAS`` de cada queryset, leídas por bloques"""
+    return chain.from_iterable(
+        queryset.order_by('id').values_list(*[campo for _, campo in COLUMNAS]).iterator(
+            chunk_size=TAMANO_BLOQUE
+        )
+        for queryset in querysets
+    )
+
+
+class _Eco:
+    """Pseudo-archivo que devuelve lo que se escribe, para csv.writer"""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(*querysets):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(ENCABEZADOS)
+    for fila in filas(*querysets):
+        yield escritor.writerow(fila)
+
+
+def lineas_jsonl(*querysets):
+    for fila in filas(*querysets):
+        yield json.dumps(dict(zip(ENCABEZADOS, fila)), cls=DjangoJSONEncoder) + '\n'
+
+
+# formato: (generador de líneas, content type, extensión)
+FORMATOS = {
+    'csv': (lineas_csv, 'text/csv', 'csv'),
+    'jsonl': (lineas_jsonl, 'application/x-ndjson', 'jsonl'),
+}
+
+
+def resumen_ingresos(queryset, agrupar):
+    """Reservas e ingresos cobrados por cancha, día o tipo, agrupados en SQL"""
+    campos = AGRUPACIONES[agrupar]
+    return queryset.filter(estado__in=ESTADOS_COBRADOS).values(*campos).annotate(
+        reservas=Count('id'), ingresos=Sum('total'),
+    ).order_by(*campos)
+
+
+def combinar_resumenes(agrupar, *resumenes):
+    """Sumar los resúmenes de varias tablas (p. ej. reservas y archivadas) por grupo"""
+    campos = AGRUPACIONES[agrupar]
+    total = {}
+    for fila in chain(*resumenes):
+        clave = tuple(fila[campo] for campo in campos)
+        if clave in total:
+            total[clave]['reservas'] += fila['reservas']
+            total[clave]['ingresos'] += fila['ingresos']
+        else:
+            total[clave] = dict(fila)
+    return [total[clave] for clave in sorted(total)]
+
+
+def lineas_resumen_csv(agrupar, resumen):
+    escritor = csv.writer(_Eco())
+    campos = AGRUPACIONES[agrupar]
+    yield escritor.writerow([*(campo.split('__')[-1] for campo in campos), 'reservas', 'ingresos'])
+    for fila in resumen:
+        # SQLite suma los decimales como REAL: se redondea al centavo
+        ingresos = Decimal(fila['ingresos']).quantize(CENTAVO)
+        yield escritor.writerow([*(fila[campo] for campo in campos), fila['reservas'], ingresos])
@@ -0,0 +1,156 @@
+"""
+Variantes redimensionadas de las imágenes de canchas.
+
+Al subir una imagen, la señal de ``Cancha`` encola ``procesar_cancha`` en un
+pool de hilos del proceso (tras el commit), que genera con Pillow una copia
+WebP y otra JPEG por cada ancho de ``IMAGENES_ANCHOS`` y las guarda en
+``Cancha.imagen_variantes``. Las plantillas las sirven con ``srcset`` (ver
+``templatetags/imagenes.py``) y, mientras no existan, usan el original.
+
+Los nombres llevan un hash del contenido original, así que la URL de una
+variante nunca cambia de contenido y se puede cachear indefinidamente.
+``generar`` solo trabaja con el storage, sin tocar la base de datos, para que
+el comando ``generar_variantes`` lo reparta en un pool de procesos.
+
+Si el proceso termina con trabajos en la cola se pierden; ``generar_variantes``
+completa las canchas que hayan quedado sin variantes.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Cancha
+
+logger = logging.getLogger('Booking.imagenes')
+
+ANCHOS = getattr(settings, 'IMAGENES_ANCHOS', (320, 640, 1280))
+CALIDAD = getattr(settings, 'IMAGENES_CALIDAD', 80)
+DIRECTORIO = 'canchas/variantes'
+
+# formato: (formato de Pillow, modos que admite sin convertir)
+FORMATOS = {
+    'webp': ('WEBP', {'RGB', 'RGBA'}),
+    'jpeg': ('JPEG', {'RGB', 'L'}),
+}
+
+_pool = None
+_candado_pool = threading.Lock()
+
+
+def _anchos(ancho_original):
+    """Anchos a generar: los configurados que no agrandan la imagen (al menos uno)"""
+    anchos = [ancho for ancho in ANCHOS if ancho < ancho_original]
+    if len(anchos) < len(ANCHOS):
+        anchos.append(ancho_original)
+    return anchos
+
+
+def _codificar(imagen, formato):
+    formato_pillow, modos = FORMATOS[formato]
+    if imagen.mode not in modos:
+        imagen = imagen.convert('RGBA' if 'RGBA' in modos and 'A' in imagen.getbands() else 'RGB')
+    salida = BytesIO()
+    imagen.save(salida, formato_pillow, quality=CALIDAD, optimize=formato == 'jpeg')
+    return salida.getvalue()
+
+
+def generar(nombre, storage=default_storage):
+    """
+    Generar las variantes de la imagen ``nombre`` del storage.
+
+    Devuelve ``{'origen': nombre, 'ancho': ..., 'alto': ..., 'variantes':
+    {formato: [[ancho, nombre], ...]}}``. Las variantes que ya existen (mismo
+    contenido original) no se vuelven a codificar.
+    """
+    with storage.open(nombre, 'rb') as archivo:
+        contenido = archivo.read()
+    huella = hashlib.sha256(contenido).hexdigest()[:16]
+
+    with Image.open(BytesIO(contenido)) as original:
+        imagen = ImageOps.exif_transpose(original)
+        imagen.load()
+    ancho_original, alto_original = imagen.size
+
+    variantes = {formato: [] for formato in FORMATOS}
+    for ancho in _anchos(ancho_original):
+        redimensionada = None
+        for formato in FORMATOS:
+            destino = f'{DIRECTORIO}/{huella}-{ancho}.{formato}'
+            if not storage.exists(destino):
+                if redimensionada is None:
+                    alto = max(1, round(alto_original * ancho / ancho_original))
+                    redimensionada = imagen.resize((ancho, alto), Image.Resampling.LANCZOS)
+                destino = storage.save(destino, ContentFile(_codificar(redimensionada, formato)))
+            variantes[formato].append([ancho, destino])
+
+    return {'origen': nombre, 'ancho': ancho_original, 'alto': alto_original, 'variantes': variantes}
+
+
+def guardar(cancha_id, variantes):
+    """Asociar las variantes a la cancha si su imagen sigue siendo la misma"""
+    # update() no dispara las señales de Cancha ni vuelve a encolar la imagen;
+    # `actualizado` se toca a mano porque la tarjeta del listado se cachea por él
+    return bool(Cancha.objects.filter(id=cancha_id, imagen=variantes['origen']).update(
+        imagen_variantes=variantes, actualizado=timezone.now(),
+    ))
+
+
+def procesar_cancha(cancha_id):
+    """Generar y guardar las variantes de la imagen actual de una cancha"""
+    nombre = Cancha.objects.filter(id=cancha_id).values_list('imagen', flat=True).first()
+    if not nombre:
+        return False
+    return guardar(cancha_id, generar(nombre))
+
+
+def _procesar_en_segundo_plano(cancha_id):
+    try:
+        procesar_cancha(cancha_id)
+    except Exception:
+        logger.exception('No se pudieron generar las variantes de la cancha %s', cancha_id)
+    finally:
+        # Cada hilo del pool abre su propia conexión
+        connection.close()
+
+
+def encolar(cancha_id):
+    """Procesar la imagen de una cancha en el pool de hilos del proceso"""
+    global _pool
+    with _candado_pool:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGENES_HILOS', 2), thread_name_prefix='imagenes',
+            )
+    return _pool.submit(_procesar_en_segundo_plano, cancha_id)
+
+
+def vigentes(cancha):
+    """Variantes de la imagen actual de la cancha, o None si faltan o son de otra imagen"""
+    variantes = cancha.imagen_variantes
+    if not cancha.imagen or not variantes or variantes.get('origen') != cancha.imagen.name:
+        return None
+    return variantes
+
+
+def srcset(variantes, formato, storage=default_storage):
+    """Valor del atributo ``srcset`` para un formato de las variantes"""
+    return ', '.join(f'{storage.url(nombre)} {ancho}w' for ancho, nombre in variantes['variantes'][formato])
+
+
+def pendientes(todas=False):
+    """(id, imagen) de las canchas con imagen cuyas variantes faltan o son de otra imagen"""
+    canchas = Cancha.objects.exclude(imagen='').exclude(imagen__isnull=True).order_by('id')
+    return [
+        (cancha_id, imagen)
+        for cancha_id, imagen, variantes in canchas.values_list('id', 'imagen', 'imagen_variantes')
+        if todas or not variantes or variantes.get('origen') != imagen
+    ]
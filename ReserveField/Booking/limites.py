@@ -0,0 +1,192 @@
+"""
+Límites de tasa con token bucket por IP y por usuario.
+
+``limitar_tasa(ambito)`` decora una vista: cada solicitud consume una ficha
+del balde de su IP y, si hay sesión iniciada, del balde de su usuario (más
+una clave propia de la vista, como el correo con el que se intenta entrar).
+Los baldes se reponen a ``por_minuto`` fichas por minuto hasta ``rafaga``;
+sin fichas la vista responde 429 con ``Retry-After``. Con
+``LIMITES_TASA_ACTIVOS = False`` no se limita nada (pruebas de carga).
+
+El decorador va por fuera de ``login_required`` y de las cachés, así que el
+tráfico rechazado no llega a consultar la base de datos (salvo la sesión,
+para el balde del usuario) ni a calcular hashes de contraseñas.
+
+El almacén se elige con ``LIMITES_TASA_ALMACEN`` (ver settings.py):
+
+- ``AlmacenLocal``: diccionario en memoria del proceso, sin E/S. Cada worker
+  lleva sus propios baldes.
+- ``AlmacenCache``: la caché ``default`` (p. ej. Redis), compartida entre
+  workers. La lectura y escritura del balde no son atómicas, así que con
+  mucha concurrencia puede dejar pasar alguna solicitud de más.
+"""
+import hashlib
+import math
+import threading
+import time as reloj
+from collections import OrderedDict
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.utils.module_loading import import_string
+
+_almacen = None
+_candado_almacen = threading.Lock()
+
+
+def _reponer(balde, rafaga, por_segundo, ahora):
+    """Fichas disponibles tras reponer el balde ``(fichas, instante)``"""
+    if balde is None:
+        return rafaga
+    fichas, instante = balde
+    return min(rafaga, fichas + (ahora - instante) * por_segundo)
+
+
+def _consumir(balde, rafaga, por_segundo, ahora):
+    """Devuelve (nuevo balde, segundos de espera); espera 0 si se permitió"""
+    fichas = _reponer(balde, rafaga, por_segundo, ahora)
+    if fichas >= 1:
+        return (fichas - 1, ahora), 0
+    return (fichas, ahora), (1 - fichas) / por_segundo
+
+
+class AlmacenLocal:
+    """Baldes en memoria del proceso; descarta los más antiguos al llegar a ``maximo``"""
+
+    def __init__(self, maximo=100_000):
+        self._baldes = OrderedDict()
+        self._maximo = maximo
+        self._candado = threading.Lock()
+
+    def consumir(self, clave, rafaga, por_segundo):
+        with self._candado:
+            balde, espera = _consumir(self._baldes.get(clave), rafaga, por_segundo, reloj.monotonic())
+            self._baldes[clave] = balde
+            self._baldes.move_to_end(clave)
+            if len(self._baldes) > self._maximo:
+                self._baldes.popitem(last=False)
+        return espera
+
+    async def aconsumir(self, clave, rafaga, por_segundo):
+        # Sin E/S: se puede llamar directamente desde el loop
+        return self.consumir(clave, rafaga, por_segundo)
+
+    def reiniciar(self):
+        with self._candado:
+            self._baldes.clear()
+
+
+class AlmacenCache:
+    """Baldes en la caché ``default``, compartidos entre procesos"""
+
+    def _clave(self, clave):
+        return f'limite:{clave}'
+
+    def _timeout(self, rafaga, por_segundo):
+        # Pasado este tiempo el balde estaría lleno: no hace falta guardarlo
+        return math.ceil(rafaga / por_segundo) + 1
+
+    def consumir(self, clave, rafaga, por_segundo):
+        balde, espera = _consumir(cache.get(self._clave(clave)), rafaga, por_segundo, reloj.time())
+        cache.set(self._clave(clave), balde, self._timeout(rafaga, por_segundo))
+        return espera
+
+    async def aconsumir(self, clave, rafaga, por_segundo):
+        balde, espera = _consumir(await cache.aget(self._clave(clave)), rafaga, por_segundo, reloj.time())
+        await cache.aset(self._clave(clave), balde, self._timeout(rafaga, por_segundo))
+        return espera
+
+
+def obtener_almacen():
+    """Almacén configurado en ``LIMITES_TASA_ALMACEN``, creado una sola vez por proceso"""
+    global _almacen
+    with _candado_almacen:
+        if _almacen is None:
+            _almacen = import_string(settings.LIMITES_TASA_ALMACEN)()
+        return _almacen
+
+
+def ip_cliente(request):
+    return request.META.get(getattr(settings, 'LIMITES_TASA_CABECERA_IP', None) or 'REMOTE_ADDR', '')
+
+
+def _claves(request, ambito, clave):
+    """Baldes que no necesitan la sesión: la IP y la clave propia de la vista"""
+    claves = [f'{ambito}:ip:{ip_cliente(request)}']
+    if clave is not None:
+        extra = clave(request)
+        if extra:
+            # Resumida: puede traer caracteres que algunos backends de caché no aceptan
+            claves.append(f'{ambito}:clave:{hashlib.sha256(extra.encode()).hexdigest()[:32]}')
+    return claves
+
+
+def _rechazo(espera, json):
+    mensaje = 'Demasiadas solicitudes. Intenta de nuevo en unos segundos.'
+    if json:
+        respuesta = JsonResponse({'success': False, 'message': mensaje}, status=429)
+    else:
+        respuesta = HttpResponse(mensaje, status=429, content_type='text/plain; charset=utf-8')
+    respuesta['Retry-After'] = str(math.ceil(espera))
+    return respuesta
+
+
+def limitar_tasa(ambito, metodos=('GET', 'POST'), json=False, clave=None):
+    """
+    Limitar una vista con los baldes de ``LIMITES_TASA[ambito]``.
+
+    Solo cuentan las solicitudes con un método de ``metodos``. ``clave``
+    (opcional) recibe el request y devuelve otro identificador a limitar,
+    p. ej. el correo de un intento de login. Sirve para vistas síncronas y
+    asíncronas.
+    """
+    def configuracion():
+        rafaga, por_minuto = settings.LIMITES_TASA[ambito]
+        return rafaga, por_minuto / 60
+
+    def decorador(vista):
+        # En ambas versiones el balde del usuario va al final: leer la sesión
+        # ya es una consulta y el tráfico rechazado por IP no llega a hacerla
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                if request.method in metodos and settings.LIMITES_TASA_ACTIVOS:
+                    almacen = obtener_almacen()
+                    rafaga, por_segundo = configuracion()
+                    for clave_balde in _claves(request, ambito, clave):
+                        espera = await almacen.aconsumir(clave_balde, rafaga, por_segundo)
+                        if espera:
+                            return _rechazo(espera, json)
+                    usuario_id = await request.session.aget(SESSION_KEY)
+                    if usuario_id is not None:
+                        espera = await almacen.aconsumir(
+                            f'{ambito}:usuario:{usuario_id}', rafaga, por_segundo
+                        )
+                        if espera:
+                            return _rechazo(espera, json)
+                return await vista(request, *args, **kwargs)
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method in metodos and settings.LIMITES_TASA_ACTIVOS:
+                almacen = obtener_almacen()
+                rafaga, por_segundo = configuracion()
+                for clave_balde in _claves(request, ambito, clave):
+                    espera = almacen.consumir(clave_balde, rafaga, por_segundo)
+                    if espera:
+                        return _rechazo(espera, json)
+                usuario_id = request.session.get(SESSION_KEY)
+                if usuario_id is not None:
+                    espera = almacen.consumir(f'{ambito}:usuario:{usuario_id}', rafaga, por_segundo)
+                    if espera:
+                        return _rechazo(espera, json)
+            return vista(request, *args, **kwargs)
+        return envoltura
+
+    return decorador
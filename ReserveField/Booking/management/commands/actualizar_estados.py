@@ -0,0 +1,33 @@
+import time as reloj
+
+from django.core.management.base import BaseCommand
+
+from Booking import estados
+
+
+class Command(BaseCommand):
+    help = (
+        'Completa las reservas que ya terminaron y vence las pendientes, con UPDATE por lotes. '
+        'Pensado para ejecutarse cada minuto (cron, systemd timer); dos ejecuciones '
+        'solapadas no cambian dos veces la misma reserva'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Reservas por UPDATE')
+        parser.add_argument(
+            '--pausa', type=float, default=0,
+            help='Segundos entre lotes, para dejar pasar otras escrituras',
+        )
+
+    def handle(self, *args, **options):
+        for descripcion, lotes in (
+            ('completadas', estados.completar_terminadas(lote=options['lote'])),
+            ('pendientes vencidas', estados.vencer_pendientes(lote=options['lote'])),
+        ):
+            total = 0
+            for numero, cambiadas in enumerate(lotes, 1):
+                total += cambiadas
+                self.stdout.write(f'  lote {numero}: {cambiadas} {descripcion}')
+                if options['pausa']:
+                    reloj.sleep(options['pausa'])
+            self.stdout.write(self.style.SUCCESS(f'✓ {total} reservas {descripcion}'))
@@ -0,0 +1,32 @@
+import time as reloj
+
+from django.core.management.base import BaseCommand
+
+from Booking import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las reservas completadas o canceladas más antiguas que el horizonte '
+        'a la tabla de reservas archivadas, por lotes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizonte', type=int, default=archivo.HORIZONTE,
+            help='Días de antigüedad a partir de los cuales se archiva',
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Reservas por transacción')
+        parser.add_argument(
+            '--pausa', type=float, default=0,
+            help='Segundos entre lotes, para dejar pasar otras escrituras',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for numero, movidas in enumerate(archivo.archivar(options['horizonte'], options['lote']), 1):
+            total += movidas
+            self.stdout.write(f'  lote {numero}: {movidas} reservas archivadas')
+            if options['pausa']:
+                reloj.sleep(options['pausa'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {total} reservas archivadas'))
@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from Booking import busqueda, paginacion
+from Booking.models import Cancha
+
+PALABRAS = [
+    'club', 'centro', 'complejo', 'deportivo', 'pádel', 'fútbol', 'tenis',
+    'básquetbol', 'voleibol', 'playa', 'parque', 'norte', 'sur', 'oeste',
+    'estadio', 'cancha', 'techada', 'césped', 'sintético', 'iluminación',
+    'profesional', 'vestuarios', 'estacionamiento', 'cafetería', 'escuela',
+]
+BARRIOS = [
+    'Palermo, CABA', 'Belgrano, CABA', 'Núñez, CABA', 'Caballito, CABA',
+    'Flores, CABA', 'La Vara, Puerto Montt', 'Providencia, Santiago',
+    'Ñuñoa, Santiago', 'Valparaíso', 'Concepción',
+]
+# Canchas por página, como el listado
+TAMANO_PAGINA = 12
+CONSULTAS = ['padel', 'futbol palermo', 'cesped sintetico', 'nunoa', 'estadio norte']
+
+
+class Command(BaseCommand):
+    help = 'Compara la búsqueda de texto completo con el filtro icontains en una base temporal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', nargs='+', type=int, default=[10_000, 100_000])
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['semilla'])
+        nombre_original = connection.settings_dict['NAME']
+        # Base de datos desechable: nunca se tocan los datos reales
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for tamano in options['tamanos']:
+                self._poblar(tamano)
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{tamano} canchas'))
+                self.stdout.write(
+                    f'{"consulta":<20}{"icontains (ms)":>16}{"fts (ms)":>12}{"x":>8}'
+                    f'{"total icontains":>18}{"total fts":>12}'
+                )
+                for consulta in CONSULTAS:
+                    lento = self._medir(
+                        lambda: paginacion.paginar(
+                            Cancha.objects.filter(busqueda.filtro_icontains(consulta)), None, TAMANO_PAGINA
+                        ),
+                        options['repeticiones'],
+                    )
+                    rapido = self._medir(
+                        lambda: busqueda.buscar(consulta, Cancha.objects.all(), None, TAMANO_PAGINA),
+                        options['repeticiones'],
+                    )
+                    # Coincidencias totales: icontains no encuentra las palabras acentuadas
+                    total_lento = Cancha.objects.filter(busqueda.filtro_icontains(consulta)).count()
+                    total_rapido = len(busqueda.buscar(consulta, Cancha.objects.all(), None, tamano).elementos)
+                    self.stdout.write(
+                        f'{consulta:<20}{lento * 1000:>16.2f}{rapido * 1000:>12.2f}'
+                        f'{lento / rapido:>8.1f}{total_lento:>18}{total_rapido:>12}'
+                    )
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+    def _poblar(self, tamano):
+        faltantes = tamano - Cancha.objects.count()
+        lote = []
+        for _ in range(faltantes):
+            lote.append(Cancha(
+                nombre=' '.join(random.sample(PALABRAS, 3)).title(),
+                descripcion=' '.join(random.choices(PALABRAS, k=25)),
+                tipo=random.choice(Cancha.TIPOS_CANCHA)[0],
+                ubicacion=random.choice(BARRIOS),
+                precio_por_hora=random.randint(5, 40),
+            ))
+        Cancha.objects.bulk_create(lote, batch_size=2_000)
+
+    def _medir(self, funcion, repeticiones):
+        funcion()  # calentamiento
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return statistics.median(tiempos)
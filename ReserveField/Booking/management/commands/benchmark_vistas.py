@@ -0,0 +1,175 @@
+import json
+import statistics
+import subprocess
+import time as reloj
+import tracemalloc
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from Booking.models import Cancha
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))
+    return ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia, consultas SQL y memoria de cada vista de Booking sobre un '
+        'conjunto de datos generado, en una base temporal, y guarda el resultado en JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--canchas', type=int, default=500)
+        parser.add_argument('--usuarios', type=int, default=2_000)
+        parser.add_argument('--reservas', type=int, default=200_000)
+        parser.add_argument('--resenas', type=int, default=20_000)
+        parser.add_argument('--iteraciones', type=int, default=50)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', default='benchmark_vistas.json')
+        parser.add_argument('--comparar', help='Resultado JSON anterior con el que comparar')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        nombre_original = connection.settings_dict['NAME']
+        # Base de datos desechable: nunca se tocan los datos reales
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command(
+                'generar_datos',
+                canchas=options['canchas'], usuarios=options['usuarios'],
+                reservas=options['reservas'], resenas=options['resenas'],
+                semilla=options['semilla'], stdout=self.stdout,
+            )
+            # Un solo cliente desde una sola IP: los límites de tasa lo frenarían enseguida
+            with override_settings(LIMITES_TASA_ACTIVOS=False):
+                vistas = self._medir_vistas(options['iteraciones'])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        resultado = {
+            'commit': self._commit(),
+            'fecha': timezone.now().isoformat(),
+            'parametros': {
+                clave: options[clave]
+                for clave in ('canchas', 'usuarios', 'reservas', 'resenas', 'iteraciones', 'semilla')
+            },
+            'vistas': vistas,
+        }
+        with open(options['salida'], 'w') as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                anterior = json.load(archivo)['vistas']
+        self._imprimir(vistas, anterior)
+        self.stdout.write(self.style.SUCCESS(f'\nResultados guardados en {options["salida"]}'))
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _medir_vistas(self, iteraciones):
+        usuario = User.objects.annotate(total=Count('reservas')).order_by('-total').first()
+        cancha = Cancha.objects.order_by('-total_resenas').first()
+        cliente = Client()
+        cliente.force_login(usuario)
+        manana = date.today() + timedelta(days=1)
+
+        def reserva(n):
+            # Cada iteración pide un horario distinto para no repetir conflictos
+            fecha = manana + timedelta(days=n // 12)
+            hora = 9 + n % 12
+            return {
+                'fecha': fecha.isoformat(),
+                'hora_inicio': f'{hora:02d}:00',
+                'hora_fin': f'{hora + 1:02d}:00',
+            }
+
+        casos = {
+            'home': lambda n: cliente.get(reverse('booking_home')),
+            'detalle_cancha': lambda n: cliente.get(reverse('detalle_cancha', args=[cancha.id])),
+            'crear_reserva': lambda n: cliente.post(
+                reverse('crear_reserva', args=[cancha.id]), reserva(n)
+            ),
+            'mis_reservas': lambda n: cliente.get(reverse('mis_reservas')),
+            'mis_reservas_historial': lambda n: cliente.get(
+                reverse('mis_reservas'), {'tab': 'historial'}
+            ),
+            'obtener_horarios_disponibles': lambda n: cliente.get(
+                reverse('api_horarios', args=[cancha.id]),
+                {'fecha': (manana + timedelta(days=n % 30)).isoformat()},
+            ),
+            'crear_resena': lambda n: cliente.post(
+                reverse('crear_resena', args=[cancha.id]),
+                {'calificacion': n % 5 + 1, 'comentario': f'Reseña de prueba {n}'},
+            ),
+        }
+
+        resultados = {}
+        for nombre, caso in casos.items():
+            for alias in caches:
+                caches[alias].clear()
+            caso(-1)  # calentamiento
+
+            tiempos, consultas, memoria = [], [], []
+            for n in range(iteraciones):
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = reloj.perf_counter()
+                    respuesta = caso(n)
+                    tiempos.append((reloj.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas))
+                # Medir errores (429, 500...) daría números que no representan la vista
+                if not 200 <= respuesta.status_code < 400:
+                    raise CommandError(
+                        f'{nombre} respondió {respuesta.status_code} en la iteración {n}'
+                    )
+
+            # tracemalloc ralentiza todo: la memoria se mide en una pasada aparte
+            for n in range(iteraciones, iteraciones + max(1, iteraciones // 5)):
+                tracemalloc.start()
+                caso(n)
+                memoria.append(tracemalloc.get_traced_memory()[1] / 1024)
+                tracemalloc.stop()
+
+            resultados[nombre] = {
+                'estado_http': respuesta.status_code,
+                'p50_ms': round(percentil(tiempos, 50), 2),
+                'p90_ms': round(percentil(tiempos, 90), 2),
+                'p99_ms': round(percentil(tiempos, 99), 2),
+                'media_ms': round(statistics.mean(tiempos), 2),
+                'consultas': round(statistics.mean(consultas), 1),
+                'memoria_pico_kb': round(statistics.mean(memoria), 1),
+            }
+        return resultados
+
+    def _imprimir(self, vistas, anterior=None):
+        self.stdout.write(self.style.MIGRATE_HEADING('\nVista'.ljust(31) + 'p50 ms   p90 ms   p99 ms  SQL   KB'))
+        for nombre, datos in vistas.items():
+            linea = (
+                f'{nombre:<30}{datos["p50_ms"]:>7.1f}{datos["p90_ms"]:>9.1f}{datos["p99_ms"]:>9.1f}'
+                f'{datos["consultas"]:>5.0f}{datos["memoria_pico_kb"]:>7.0f}'
+            )
+            if anterior and nombre in anterior:
+                base = anterior[nombre]['p50_ms'] or 1e-9
+                cambio = (datos['p50_ms'] - base) / base * 100
+                linea += f'   p50 {cambio:+.0f}%  SQL {datos["consultas"] - anterior[nombre]["consultas"]:+.0f}'
+            self.stdout.write(linea)
@@ -0,0 +1,71 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Booking import exportacion
+from Booking.models import Reserva, ReservaArchivada
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta reservas con los datos de cancha y usuario en CSV o JSON Lines, fila a fila, '
+        'o un resumen de ingresos agrupado en SQL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar)')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primera fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Última fecha (AAAA-MM-DD)')
+        parser.add_argument('--estado', action='append', choices=[estado for estado, _ in Reserva.ESTADOS])
+        parser.add_argument('--cancha', type=int, action='append', help='Id de cancha (repetible)')
+        parser.add_argument(
+            '--archivadas', action='store_true',
+            help='Incluir también las reservas de la tabla de archivo',
+        )
+        parser.add_argument(
+            '--resumen', choices=sorted(exportacion.AGRUPACIONES),
+            help='En lugar de las reservas, exportar los ingresos agrupados (siempre CSV)',
+        )
+
+    def handle(self, *args, **options):
+        querysets = [self._filtrar(Reserva.objects.all(), options)]
+        if options['archivadas']:
+            querysets.append(self._filtrar(ReservaArchivada.objects.all(), options))
+
+        if options['resumen']:
+            agrupar = options['resumen']
+            resumen = exportacion.combinar_resumenes(agrupar, *(
+                exportacion.resumen_ingresos(queryset, agrupar) for queryset in querysets
+            ))
+            lineas = exportacion.lineas_resumen_csv(agrupar, resumen)
+        else:
+            lineas = exportacion.FORMATOS[options['formato']][0](*querysets)
+
+        if not options['salida']:
+            # Cada línea ya termina en salto de línea
+            self._escribir(lineas, self.stdout)
+            return
+        with open(options['salida'], 'w', newline='', encoding='utf-8') as archivo:
+            escritas = self._escribir(lineas, archivo)
+        self.stderr.write(self.style.SUCCESS(f'✓ {escritas} líneas escritas en {options["salida"]}'))
+
+    def _filtrar(self, queryset, options):
+        if options['desde'] and options['hasta'] and options['hasta'] < options['desde']:
+            raise CommandError('--hasta no puede ser anterior a --desde')
+        if options['desde']:
+            queryset = queryset.filter(fecha__gte=options['desde'])
+        if options['hasta']:
+            queryset = queryset.filter(fecha__lte=options['hasta'])
+        if options['estado']:
+            queryset = queryset.filter(estado__in=options['estado'])
+        if options['cancha']:
+            queryset = queryset.filter(cancha_id__in=options['cancha'])
+        return queryset
+
+    def _escribir(self, lineas, archivo):
+        escritas = 0
+        for linea in lineas:
+            archivo.write(linea)
+            escritas += 1
+        return escritas
@@ -0,0 +1,211 @@
+import random
+import time as reloj
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from Booking.calificaciones import recalcular_todas
+from Booking.models import Cancha, Horario, Reserva, Resena
+
+PREFIJOS = ['Club', 'Complejo', 'Centro', 'Estadio', 'Parque', 'Polideportivo']
+NOMBRES = ['Norte', 'Sur', 'Oeste', 'Río', 'Los Andes', 'Pacífico', 'Las Lomas', 'Del Lago']
+BARRIOS = [
+    'Palermo, CABA', 'Belgrano, CABA', 'Núñez, CABA', 'Caballito, CABA',
+    'Flores, CABA', 'La Vara, Puerto Montt', 'Providencia, Santiago',
+    'Ñuñoa, Santiago', 'Valparaíso', 'Concepción',
+]
+COMENTARIOS = [
+    'Excelente cancha', 'Buena iluminación', 'Los vestuarios podrían mejorar',
+    'Muy buena atención', 'El césped está gastado', 'Volveremos pronto', '',
+]
+APERTURA, CIERRE = 9, 22
+
+
+class Command(BaseCommand):
+    help = 'Genera un conjunto de datos sintético (canchas, usuarios, reservas y reseñas) con bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--canchas', type=int, default=100)
+        parser.add_argument('--usuarios', type=int, default=1_000)
+        parser.add_argument('--reservas', type=int, default=100_000)
+        parser.add_argument('--resenas', type=int, default=5_000)
+        parser.add_argument('--dias', type=int, default=365, help='Días cubiertos por las reservas')
+        parser.add_argument('--lote', type=int, default=5_000, help='Filas por bulk_create')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self._validar(options)
+        self.azar = random.Random(options['semilla'])
+        self.lote = options['lote']
+        inicio = reloj.perf_counter()
+
+        canchas = self._medir('canchas', self._crear_canchas, options['canchas'])
+        self._medir('horarios', self._crear_horarios, canchas)
+        usuarios = self._medir('usuarios', self._crear_usuarios, options['usuarios'])
+        self._medir(
+            'reservas', self._crear_reservas, canchas, usuarios,
+            options['reservas'], options['dias'],
+        )
+        self._medir('reseñas', self._crear_resenas, canchas, usuarios, options['resenas'])
+
+        # bulk_create no dispara señales: los agregados se calculan al final
+        recalcular_todas()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n¡Datos generados en {reloj.perf_counter() - inicio:.1f}s!'
+        ))
+
+    def _medir(self, nombre, funcion, *args):
+        inicio = reloj.perf_counter()
+        resultado = funcion(*args)
+        filas = resultado if isinstance(resultado, int) else len(resultado)
+        duracion = max(reloj.perf_counter() - inicio, 1e-9)
+        self.stdout.write(
+            f'✓ {filas:>10} {nombre:<10} en {duracion:7.2f}s ({filas / duracion:,.0f} filas/s)'
+        )
+        return resultado
+
+    def _insertar(self, modelo, filas):
+        """Insertar un iterable de instancias en lotes; devuelve cuántas se crearon"""
+        total = 0
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) >= self.lote:
+                total += self._volcar(modelo, lote)
+                lote = []
+        if lote:
+            total += self._volcar(modelo, lote)
+        return total
+
+    def _volcar(self, modelo, lote):
+        with transaction.atomic():
+            modelo.objects.bulk_create(lote, batch_size=self.lote)
+        return len(lote)
+
+    def _crear_canchas(self, cantidad):
+        canchas = [
+            Cancha(
+                nombre=f'{self.azar.choice(PREFIJOS)} {self.azar.choice(NOMBRES)} {n + 1}',
+                descripcion=f'Cancha generada para pruebas de carga número {n + 1}',
+                tipo=self.azar.choice(Cancha.TIPOS_CANCHA)[0],
+                ubicacion=self.azar.choice(BARRIOS),
+                precio_por_hora=Decimal(self.azar.randrange(800, 4000, 50)) / 100,
+                capacidad=self.azar.choice([4, 10, 12, 22]),
+            )
+            for n in range(cantidad)
+        ]
+        creadas = []
+        for desde in range(0, len(canchas), self.lote):
+            with transaction.atomic():
+                creadas += Cancha.objects.bulk_create(canchas[desde:desde + self.lote])
+        return [(cancha.id, cancha.precio_por_hora) for cancha in creadas]
+
+    def _crear_horarios(self, canchas):
+        return self._insertar(Horario, (
+            Horario(
+                cancha_id=cancha_id, dia_semana=dia,
+                hora_apertura=time(APERTURA), hora_cierre=time(CIERRE),
+            )
+            for cancha_id, _ in canchas
+            for dia in range(7)
+        ))
+
+    def _validar(self, options):
+        """Rechazar cantidades que no caben, en vez de generar menos en silencio"""
+        # Una reserva por cancha y bloque de una hora; una reseña por cancha y usuario
+        bloques = options['canchas'] * options['dias'] * (CIERRE - APERTURA)
+        if options['reservas'] > bloques:
+            raise CommandError(
+                f'{options["canchas"]} canchas × {options["dias"]} días × {CIERRE - APERTURA} horas '
+                f'admiten como máximo {bloques} reservas (se pidieron {options["reservas"]}): '
+                'aumenta --canchas o --dias'
+            )
+        pares = options['canchas'] * options['usuarios']
+        if options['resenas'] > pares:
+            raise CommandError(
+                f'{options["canchas"]} canchas × {options["usuarios"]} usuarios admiten como máximo '
+                f'{pares} reseñas (se pidieron {options["resenas"]}): aumenta --canchas o --usuarios'
+            )
+
+    def _crear_usuarios(self, cantidad):
+        # Un único hash compartido: calcular PBKDF2 por usuario tomaría horas
+        clave = make_password('reservas123')
+        desde = (User.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+        usuarios = []
+        for inicio in range(0, cantidad, self.lote):
+            lote = [
+                User(
+                    username=f'carga{desde + n}',
+                    email=f'carga{desde + n}@reservacanchas.com',
+                    password=clave,
+                )
+                for n in range(inicio, min(inicio + self.lote, cantidad))
+            ]
+            with transaction.atomic():
+                usuarios += [usuario.id for usuario in User.objects.bulk_create(lote)]
+        return usuarios
+
+    def _crear_reservas(self, canchas, usuarios, cantidad, dias):
+        if not canchas or not usuarios:
+            return 0
+
+        hoy = date.today()
+        primer_dia = hoy - timedelta(days=dias * 3 // 4)
+        bloques = CIERRE - APERTURA
+        # Probabilidad de que cada bloque de una hora esté reservado (``_validar``
+        # garantiza que no pasa de 1)
+        probabilidad = cantidad / (len(canchas) * dias * bloques)
+
+        def reservas():
+            for cancha_id, precio in canchas:
+                for desplazamiento in range(dias):
+                    fecha = primer_dia + timedelta(days=desplazamiento)
+                    for hora in range(APERTURA, CIERRE):
+                        if self.azar.random() >= probabilidad:
+                            continue
+                        yield Reserva(
+                            usuario_id=self.azar.choice(usuarios),
+                            cancha_id=cancha_id,
+                            fecha=fecha,
+                            hora_inicio=time(hora),
+                            hora_fin=time(hora + 1),
+                            estado=self._estado(fecha, hoy),
+                            total=precio,
+                        )
+
+        return self._insertar(Reserva, reservas())
+
+    def _estado(self, fecha, hoy):
+        if self.azar.random() < 0.08:
+            return 'cancelada'
+        if fecha < hoy:
+            return 'completada'
+        return 'pendiente' if self.azar.random() < 0.2 else 'confirmada'
+
+    def _crear_resenas(self, canchas, usuarios, cantidad):
+        if not canchas or not usuarios:
+            return 0
+
+        por_cancha = min(len(usuarios), max(1, cantidad // len(canchas)))
+
+        def resenas():
+            creadas = 0
+            for cancha_id, _ in canchas:
+                for usuario_id in self.azar.sample(usuarios, por_cancha):
+                    if creadas >= cantidad:
+                        return
+                    creadas += 1
+                    yield Resena(
+                        cancha_id=cancha_id,
+                        usuario_id=usuario_id,
+                        calificacion=self.azar.choices([1, 2, 3, 4, 5], [1, 1, 3, 6, 5])[0],
+                        comentario=self.azar.choice(COMENTARIOS),
+                    )
+
+        return self._insertar(Resena, resenas())
@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from Booking import imagenes
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera las variantes WebP/JPEG de las imágenes de canchas que no las tienen, '
+        'repartiendo la codificación en un pool de procesos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count(),
+            help='Procesos que codifican imágenes en paralelo',
+        )
+        parser.add_argument(
+            '--todas', action='store_true',
+            help='Procesar también las canchas que ya tienen variantes',
+        )
+
+    def handle(self, *args, **options):
+        pendientes = imagenes.pendientes(todas=options['todas'])
+        if not pendientes:
+            self.stdout.write(self.style.SUCCESS('✓ Todas las imágenes tienen sus variantes'))
+            return
+
+        # Los procesos hijos solo usan el storage; la base de datos la escribe
+        # este proceso, y no debe heredar conexiones abiertas al hacer fork
+        connections.close_all()
+        guardadas = fallidas = 0
+        with ProcessPoolExecutor(max_workers=options['procesos'], initializer=django.setup) as pool:
+            futuros = {
+                pool.submit(imagenes.generar, imagen): (cancha_id, imagen) for cancha_id, imagen in pendientes
+            }
+            for futuro in as_completed(futuros):
+                cancha_id, imagen = futuros[futuro]
+                try:
+                    variantes = futuro.result()
+                except Exception as error:
+                    fallidas += 1
+                    self.stderr.write(f'  cancha {cancha_id} ({imagen}): {type(error).__name__}: {error}')
+                    continue
+                if imagenes.guardar(cancha_id, variantes):
+                    guardadas += 1
+                    self.stdout.write(f'  cancha {cancha_id}: {imagen}')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Variantes de {guardadas} imágenes ({fallidas} con error)'))
@@ -0,0 +1,49 @@
+import time as reloj
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Booking import correos
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos encolados con un pool de hilos (una conexión SMTP por lote)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4)
+        parser.add_argument('--lote', type=int, default=50, help='Correos por conexión SMTP')
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos de espera con la cola vacía')
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Vaciar los correos vencidos y terminar en lugar de quedarse escuchando',
+        )
+
+    def handle(self, *args, **options):
+        hilos, lote = options['hilos'], options['lote']
+        total = 0
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            try:
+                while True:
+                    resultados = list(pool.map(self._procesar, [lote] * hilos))
+                    reclamados = sum(reclamados for reclamados, _ in resultados)
+                    enviados = sum(enviados for _, enviados in resultados)
+                    total += enviados
+                    if reclamados:
+                        self.stdout.write(f'✓ {enviados}/{reclamados} correos enviados')
+                        continue
+                    if options['una_vez']:
+                        break
+                    reloj.sleep(options['intervalo'])
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f'¡{total} correos enviados!'))
+
+    def _procesar(self, lote):
+        # Cada hilo usa su propia conexión a la base de datos
+        close_old_connections()
+        try:
+            return correos.procesar_lote(lote)
+        finally:
+            close_old_connections()
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import statistics
+import time as reloj
+from collections import Counter
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from Booking.management.commands.benchmark_vistas import percentil
+from Booking.models import Cancha
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP contra un servidor en marcha (gunicorn/WSGI o uvicorn/ASGI): '
+        'muchos clientes concurrentes con keep-alive, sin dependencias externas. '
+        'El servidor debe correr con LIMITES_TASA_ACTIVOS=0'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--ruta', action='append',
+            help='Ruta a pedir (repetible); por defecto la API de horarios de varias canchas',
+        )
+        parser.add_argument('--concurrencia', type=int, default=200, help='Conexiones simultáneas')
+        parser.add_argument('--duracion', type=float, default=10, help='Segundos de carga')
+        parser.add_argument('--usuario', help='Usuario con el que autenticar las peticiones')
+        parser.add_argument('--etiqueta', default='servidor', help='Nombre del resultado (p. ej. wsgi, asgi)')
+        parser.add_argument('--salida', help='Guardar el resultado en JSON')
+        parser.add_argument('--comparar', help='Resultado JSON anterior con el que comparar')
+
+    def handle(self, *args, **options):
+        destino = urlsplit(options['url'])
+        if destino.scheme != 'http':
+            raise CommandError('Solo se admiten URLs http://')
+
+        rutas = options['ruta'] or self._rutas_por_defecto()
+        sesion = self._sesion(options['usuario'])
+        self.stdout.write(
+            f'{options["concurrencia"]} conexiones durante {options["duracion"]:.0f}s '
+            f'contra {options["url"]} ({len(rutas)} rutas)'
+        )
+
+        latencias, estados, errores, duracion = asyncio.run(self._cargar(
+            destino.hostname, destino.port or 80, rutas, sesion,
+            options['concurrencia'], options['duracion'],
+        ))
+        if not latencias:
+            raise CommandError(f'Ninguna petición respondió ({errores} errores)')
+
+        resultado = {
+            'etiqueta': options['etiqueta'],
+            'concurrencia': options['concurrencia'],
+            'peticiones': len(latencias),
+            'errores': errores,
+            'estados': {str(estado): total for estado, total in sorted(estados.items())},
+            'peticiones_por_segundo': round(len(latencias) / duracion, 1),
+            'p50_ms': round(percentil(latencias, 50), 2),
+            'p90_ms': round(percentil(latencias, 90), 2),
+            'p99_ms': round(percentil(latencias, 99), 2),
+            'media_ms': round(statistics.mean(latencias), 2),
+        }
+        if options['salida']:
+            with open(options['salida'], 'w') as archivo:
+                json.dump(resultado, archivo, indent=2)
+
+        anterior = None
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                anterior = json.load(archivo)
+        self._imprimir(resultado, anterior)
+
+        if estados.get(429):
+            raise CommandError(
+                f'El servidor rechazó {estados[429]} peticiones por límite de tasa: '
+                'arráncalo con LIMITES_TASA_ACTIVOS=0 para medirlo'
+            )
+
+    def _rutas_por_defecto(self):
+        manana = date.today() + timedelta(days=1)
+        canchas = list(Cancha.objects.filter(disponible=True).values_list('id', flat=True)[:20])
+        if not canchas:
+            raise CommandError('No hay canchas: genera datos con generar_datos o indica --ruta')
+        return [
+            f'{reverse("api_horarios", args=[cancha_id])}?fecha={manana + timedelta(days=dia)}'
+            for cancha_id in canchas
+            for dia in range(7)
+        ]
+
+    def _sesion(self, username):
+        usuarios = User.objects.filter(is_active=True).order_by('id')
+        usuario = usuarios.filter(username=username).first() if username else usuarios.first()
+        if usuario is None:
+            raise CommandError('No hay un usuario con el que autenticar las peticiones')
+        # La sesión queda en la base de datos que también usa el servidor
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente.cookies[settings.SESSION_COOKIE_NAME].value
+
+    async def _cargar(self, host, puerto, rutas, sesion, concurrencia, duracion):
+        latencias, estados = [], Counter()
+        errores = [0]
+        inicio = reloj.perf_counter()
+        fin = inicio + duracion
+        await asyncio.gather(*(
+            self._cliente(n, host, puerto, rutas, sesion, fin, latencias, estados, errores)
+            for n in range(concurrencia)
+        ))
+        return latencias, estados, errores[0], reloj.perf_counter() - inicio
+
+    async def _cliente(self, n, host, puerto, rutas, sesion, fin, latencias, estados, errores):
+        cabeceras = (
+            f'Host: {host}:{puerto}\r\n'
+            f'Cookie: {settings.SESSION_COOKIE_NAME}={sesion}\r\n'
+            'Accept: application/json\r\n\r\n'
+        )
+        lector = escritor = None
+        while reloj.perf_counter() < fin:
+            ruta = rutas[n % len(rutas)]
+            n += 1
+            inicio = reloj.perf_counter()
+            try:
+                if escritor is None:
+                    lector, escritor = await asyncio.open_connection(host, puerto)
+                escritor.write(f'GET {ruta} HTTP/1.1\r\n{cabeceras}'.encode())
+                await escritor.drain()
+                estado, cerrar = await self._leer_respuesta(lector)
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                errores[0] += 1
+                cerrar = True
+            else:
+                latencias.append((reloj.perf_counter() - inicio) * 1000)
+                estados[estado] += 1
+            if cerrar and escritor is not None:
+                escritor.close()
+                escritor = None
+        if escritor is not None:
+            escritor.close()
+
+    async def _leer_respuesta(self, lector):
+        """Leer una respuesta HTTP/1.1 completa; devuelve (estado, cerrar_conexión)"""
+        linea = await lector.readuntil(b'\r\n')
+        version, estado = linea.split(b' ', 2)[:2]
+        cabeceras = {}
+        while True:
+            linea = await lector.readuntil(b'\r\n')
+            if linea == b'\r\n':
+                break
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            cabeceras[nombre.strip().lower()] = valor.strip().lower()
+
+        cerrar = cabeceras.get('connection') == 'close' or version == b'HTTP/1.0'
+        if 'content-length' in cabeceras:
+            await lector.readexactly(int(cabeceras['content-length']))
+        elif cabeceras.get('transfer-encoding') == 'chunked':
+            while True:
+                tamano = int((await lector.readuntil(b'\r\n')).split(b';')[0], 16)
+                await lector.readexactly(tamano + 2)
+                if tamano == 0:
+                    break
+        else:
+            await lector.read()
+            cerrar = True
+        return int(estado), cerrar
+
+    def _imprimir(self, resultado, anterior=None):
+        filas = [anterior, resultado] if anterior else [resultado]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\n{"":<12}{"pet/s":>10}{"p50 ms":>9}{"p90 ms":>9}{"p99 ms":>9}{"errores":>9}  estados'
+        ))
+        for fila in filas:
+            self.stdout.write(
+                f'{fila["etiqueta"]:<12}{fila["peticiones_por_segundo"]:>10.1f}'
+                f'{fila["p50_ms"]:>9.1f}{fila["p90_ms"]:>9.1f}{fila["p99_ms"]:>9.1f}'
+                f'{fila["errores"]:>9}  {fila["estados"]}'
+            )
+        if anterior:
+            base = anterior['peticiones_por_segundo'] or 1e-9
+            cambio = resultado['peticiones_por_segundo'] / base
+            self.stdout.write(f'\n{resultado["etiqueta"]} / {anterior["etiqueta"]}: {cambio:.2f}x pet/s')
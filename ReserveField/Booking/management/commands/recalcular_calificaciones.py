@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Booking.calificaciones import recalcular_todas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la calificación, el total y el histograma de reseñas de todas las canchas'
+
+    def handle(self, *args, **options):
+        canchas = recalcular_todas()
+        self.stdout.write(self.style.SUCCESS(f'✓ Agregados recalculados para {canchas} canchas'))
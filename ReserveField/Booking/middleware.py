@@ -0,0 +1,53 @@
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('Booking.consultas')
+
+
+class DetectorConsultasMiddleware:
+    """
+    Middleware de depuración que cuenta las consultas SQL de cada request.
+
+    Registra un aviso si se superan ``CONSULTAS_MAXIMAS_POR_REQUEST`` o si la
+    misma consulta (misma SQL, distintos parámetros) se repite más de
+    ``CONSULTAS_REPETIDAS_MAXIMAS`` veces, el síntoma típico de un N+1. El
+    total se expone además en la cabecera ``X-Consultas-SQL``.
+    """
+
+    IGNORADAS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.maximo = getattr(settings, 'CONSULTAS_MAXIMAS_POR_REQUEST', 20)
+        self.repeticiones = getattr(settings, 'CONSULTAS_REPETIDAS_MAXIMAS', 1)
+
+    def __call__(self, request):
+        formas = Counter()
+
+        def contar(execute, sql, params, many, context):
+            if not sql.startswith(self.IGNORADAS):
+                formas[sql] += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            response = self.get_response(request)
+
+        total = sum(formas.values())
+        response['X-Consultas-SQL'] = str(total)
+
+        if total > self.maximo:
+            logger.warning(
+                '%s %s ejecutó %d consultas SQL (máximo %d)',
+                request.method, request.path, total, self.maximo,
+            )
+        for sql, veces in formas.most_common():
+            if veces <= self.repeticiones:
+                break
+            logger.warning(
+                '%s %s repitió %d veces la consulta: %s',
+                request.method, request.path, veces, sql[:300],
+            )
+        return response
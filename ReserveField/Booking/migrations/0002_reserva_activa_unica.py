@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='reserva',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='reserva',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['confirmada', 'pendiente'])), fields=('cancha', 'fecha', 'hora_inicio'), name='reserva_activa_unica'),
+        ),
+    ]
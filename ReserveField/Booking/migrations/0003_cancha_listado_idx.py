@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0002_reserva_activa_unica'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cancha',
+            index=models.Index(fields=['disponible', '-creado', '-id'], name='cancha_listado_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    from Booking import busqueda
+
+    if busqueda.instalar(schema_editor.connection):
+        busqueda.reconstruir(schema_editor.connection)
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    from Booking import busqueda
+
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {busqueda.TABLA_FTS}_{sufijo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {busqueda.TABLA_FTS}')
+        elif schema_editor.connection.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS booking_cancha_tsv_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0003_cancha_listado_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
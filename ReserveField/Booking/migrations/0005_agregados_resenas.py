@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+def poblar_agregados(apps, schema_editor):
+    from Booking.calificaciones import recalcular_todas
+
+    recalcular_todas(apps.get_model('Booking', 'Cancha'), apps.get_model('Booking', 'Resena'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0004_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cancha',
+            name='estrellas_1',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cancha',
+            name='estrellas_2',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cancha',
+            name='estrellas_3',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cancha',
+            name='estrellas_4',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cancha',
+            name='estrellas_5',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cancha',
+            name='suma_calificaciones',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0005_agregados_resenas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['cancha', 'fecha', 'estado', 'hora_inicio'], name='reserva_conflicto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['usuario', 'fecha', 'hora_inicio'], name='reserva_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['estado', 'fecha'], name='reserva_estado_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0006_indices_reserva'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resena',
+            index=models.Index(fields=['cancha', '-creado', '-id'], name='resena_pagina_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resena',
+            index=models.Index(fields=['cancha', 'calificacion', '-creado', '-id'], name='resena_estrellas_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0007_indices_resena'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Correo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('mensaje', models.TextField()),
+                ('remitente', models.CharField(blank=True, max_length=254)),
+                ('destinatarios', models.JSONField(default=list)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('reclamado_por', models.CharField(blank=True, max_length=32)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Correos',
+                'ordering': ['-creado'],
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='correo_cola_idx'), models.Index(fields=['reclamado_por'], name='correo_reclamado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0008_cola_correos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerieReserva',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.IntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('cancha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_reservas', to='Booking.cancha')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_reservas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Series de reservas',
+                'ordering': ['-creado'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reserva',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas', to='Booking.seriereserva'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:43
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0009_reservas_recurrentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarifa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(blank=True, max_length=100)),
+                ('dia_semana', models.IntegerField(blank=True, choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')], null=True)),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('precio_por_hora', models.DecimalField(decimal_places=2, max_digits=8, validators=[django.core.validators.MinValueValidator(0)])),
+                ('cancha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarifas', to='Booking.cancha')),
+            ],
+            options={
+                'verbose_name_plural': 'Tarifas',
+                'ordering': ['cancha', 'dia_semana', 'hora_inicio'],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0010_tarifas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha', models.DateField()),
+                ('hora_inicio', models.TimeField()),
+                ('hora_fin', models.TimeField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmada', 'Confirmada'), ('completada', 'Completada'), ('cancelada', 'Cancelada')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('creado', models.DateTimeField()),
+                ('actualizado', models.DateTimeField()),
+                ('archivado', models.DateTimeField(auto_now_add=True)),
+                ('cancha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_archivadas', to='Booking.cancha')),
+                ('serie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservas_archivadas', to='Booking.seriereserva')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_archivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Reservas archivadas',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['usuario', '-fecha'], name='archivada_usuario_fecha_idx')],
+            },
+        ),
+    ]
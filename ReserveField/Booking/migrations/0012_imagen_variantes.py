@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0011_reservas_archivadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cancha',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
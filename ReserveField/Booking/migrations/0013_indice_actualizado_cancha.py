@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Booking', '0012_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cancha',
+            index=models.Index(fields=['disponible', 'actualizado'], name='cancha_actualizado_idx'),
+        ),
+    ]
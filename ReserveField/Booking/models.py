@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 class Cancha(models.Model):
@@ -17,9 +19,18 @@ class Cancha(models.Model):
     ubicacion = models.CharField(max_length=300)
     precio_por_hora = models.DecimalField(max_digits=8, decimal_places=2, validators=[MinValueValidator(0)])
     imagen = models.ImageField(upload_to='canchas/', blank=True, null=True)
+    # Copias redimensionadas de `imagen` (ver imagenes.py)
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
     disponible = models.BooleanField(default=True)
     calificacion = models.FloatField(default=0, validators=[MinValueValidator(0), MaxValueValidator(5)])
     total_resenas = models.IntegerField(default=0)
+    # Agregados de reseñas mantenidos de forma incremental (ver calificaciones.py)
+    suma_calificaciones = models.IntegerField(default=0)
+    estrellas_1 = models.IntegerField(default=0)
+    estrellas_2 = models.IntegerField(default=0)
+    estrellas_3 = models.IntegerField(default=0)
+    estrellas_4 = models.IntegerField(default=0)
+    estrellas_5 = models.IntegerField(default=0)
     capacidad = models.IntegerField(default=10)
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
@@ -27,9 +38,19 @@ class Cancha(models.Model):
     class Meta:
         ordering = ['-creado']
         verbose_name_plural = "Canchas"
+        indexes = [
+            # Listado paginado por cursor de canchas disponibles
+            models.Index(fields=['disponible', '-creado', '-id'], name='cancha_listado_idx'),
+            # Marca del listado para el GET condicional (índice que cubre la consulta)
+            models.Index(fields=['disponible', 'actualizado'], name='cancha_actualizado_idx'),
+        ]
     
     def __str__(self):
         return self.nombre
+    
+    def histograma_estrellas(self):
+        """Cantidad de reseñas por calificación, de 5 a 1 estrellas"""
+        return {n: getattr(self, f'estrellas_{n}') for n in range(5, 0, -1)}
 
 
 class Horario(models.Model):
@@ -55,6 +76,54 @@ class Horario(models.Model):
         return f"{self.cancha.nombre} - {self.get_dia_semana_display()}"
 
 
+class Tarifa(models.Model):
+    """Precio por hora de una cancha en una franja horaria; sin día, aplica a toda la semana"""
+    cancha = models.ForeignKey(Cancha, on_delete=models.CASCADE, related_name='tarifas')
+    nombre = models.CharField(max_length=100, blank=True)
+    # Las tarifas de un día concreto tienen prioridad sobre las de toda la semana
+    dia_semana = models.IntegerField(choices=Horario.DIAS_SEMANA, null=True, blank=True)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    precio_por_hora = models.DecimalField(max_digits=8, decimal_places=2, validators=[MinValueValidator(0)])
+    
+    class Meta:
+        ordering = ['cancha', 'dia_semana', 'hora_inicio']
+        verbose_name_plural = "Tarifas"
+    
+    def __str__(self):
+        dia = self.get_dia_semana_display() if self.dia_semana is not None else 'Todos los días'
+        return f"{self.cancha.nombre} - {dia} {self.hora_inicio:%H:%M}-{self.hora_fin:%H:%M}"
+    
+    def clean(self):
+        from .precios import MINUTOS_POR_FRANJA
+        
+        if self.hora_inicio is None or self.hora_fin is None:
+            return
+        if self.hora_inicio >= self.hora_fin:
+            raise ValidationError('La hora de inicio debe ser menor a la hora de fin')
+        if self.hora_inicio.minute % MINUTOS_POR_FRANJA or self.hora_fin.minute % MINUTOS_POR_FRANJA:
+            raise ValidationError(f'Las horas deben ser múltiplos de {MINUTOS_POR_FRANJA} minutos')
+
+
+class SerieReserva(models.Model):
+    """Regla de una reserva recurrente: mismo día de la semana y horario en un rango de fechas"""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='series_reservas')
+    cancha = models.ForeignKey(Cancha, on_delete=models.CASCADE, related_name='series_reservas')
+    dia_semana = models.IntegerField(choices=Horario.DIAS_SEMANA)
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    creado = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-creado']
+        verbose_name_plural = "Series de reservas"
+    
+    def __str__(self):
+        return f"{self.cancha.nombre} - {self.get_dia_semana_display()} {self.hora_inicio:%H:%M} ({self.fecha_desde} a {self.fecha_hasta})"
+
+
 class Reserva(models.Model):
     ESTADOS = [
         ('pendiente', 'Pendiente'),
@@ -62,6 +131,7 @@ class Reserva(models.Model):
         ('completada', 'Completada'),
         ('cancelada', 'Cancelada'),
     ]
+    ESTADOS_ACTIVOS = ('confirmada', 'pendiente')
     
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas')
     cancha = models.ForeignKey(Cancha, on_delete=models.CASCADE, related_name='reservas')
@@ -70,12 +140,60 @@ class Reserva(models.Model):
     hora_fin = models.TimeField()
     estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
     total = models.DecimalField(max_digits=8, decimal_places=2)
+    serie = models.ForeignKey(SerieReserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservas')
     creado = models.DateTimeField(auto_now_add=True)
     actualizado = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-fecha']
-        unique_together = ['cancha', 'fecha', 'hora_inicio']
+        constraints = [
+            # Solo las reservas activas ocupan la hora de inicio: una reserva
+            # cancelada no debe impedir volver a reservar el mismo horario.
+            models.UniqueConstraint(
+                fields=['cancha', 'fecha', 'hora_inicio'],
+                condition=models.Q(estado__in=['confirmada', 'pendiente']),
+                name='reserva_activa_unica',
+            ),
+        ]
+        # Los índices parciales solo se usan en SQLite si la consulta repite el
+        # filtro con literales (Django lo envía con parámetros), así que el
+        # estado va como columna del índice en lugar de como condición.
+        indexes = [
+            # Comprobación de conflictos e índice de disponibilidad
+            models.Index(fields=['cancha', 'fecha', 'estado', 'hora_inicio'], name='reserva_conflicto_idx'),
+            # mis_reservas: próximas (fecha, hora_inicio) e historial (-fecha)
+            models.Index(fields=['usuario', 'fecha', 'hora_inicio'], name='reserva_usuario_fecha_idx'),
+            # Filtros del admin y tareas por estado
+            models.Index(fields=['estado', 'fecha'], name='reserva_estado_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario.username} - {self.cancha.nombre} ({self.fecha})"
+
+
+class ReservaArchivada(models.Model):
+    """Reserva terminada o cancelada que ``archivar_reservas`` sacó de la tabla de reservas"""
+    # Conserva el id original de la reserva
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas_archivadas')
+    cancha = models.ForeignKey(Cancha, on_delete=models.CASCADE, related_name='reservas_archivadas')
+    fecha = models.DateField()
+    hora_inicio = models.TimeField()
+    hora_fin = models.TimeField()
+    estado = models.CharField(max_length=20, choices=Reserva.ESTADOS)
+    total = models.DecimalField(max_digits=8, decimal_places=2)
+    serie = models.ForeignKey(SerieReserva, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservas_archivadas')
+    creado = models.DateTimeField()
+    actualizado = models.DateTimeField()
+    archivado = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name_plural = "Reservas archivadas"
+        indexes = [
+            # Historial de mis_reservas
+            models.Index(fields=['usuario', '-fecha'], name='archivada_usuario_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.cancha.nombre} ({self.fecha})"
@@ -91,6 +209,46 @@ class Resena(models.Model):
     class Meta:
         unique_together = ['cancha', 'usuario']
         ordering = ['-creado']
+        indexes = [
+            # Páginas de reseñas por cursor, con y sin filtro de calificación
+            models.Index(fields=['cancha', '-creado', '-id'], name='resena_pagina_idx'),
+            models.Index(fields=['cancha', 'calificacion', '-creado', '-id'], name='resena_estrellas_idx'),
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.cancha.nombre} ({self.calificacion}★)"
+
+
+class Correo(models.Model):
+    """Correo saliente encolado; lo envía el comando ``procesar_correos``"""
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+    
+    asunto = models.CharField(max_length=255)
+    mensaje = models.TextField()
+    remitente = models.CharField(max_length=254, blank=True)
+    destinatarios = models.JSONField(default=list)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    # Próximo envío posible: sirve para la espera entre reintentos y como
+    # plazo de reserva mientras un worker lo está enviando
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    reclamado_por = models.CharField(max_length=32, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-creado']
+        verbose_name_plural = "Correos"
+        indexes = [
+            # Cola: pendientes cuyo próximo intento ya venció
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_cola_idx'),
+            models.Index(fields=['reclamado_por'], name='correo_reclamado_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.asunto} ({self.get_estado_display()})"
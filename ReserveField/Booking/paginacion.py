@@ -0,0 +1,64 @@
+"""
+Paginación por cursor (keyset) sobre listados ordenados por ``-creado``.
+
+En lugar de OFFSET, cada página se pide a partir del último elemento de la
+anterior, así que el costo de una página no depende de cuántas filas haya
+antes de ella.
+"""
+import base64
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+
+Pagina = namedtuple('Pagina', ['elementos', 'siguiente'])
+
+
+def codificar_cursor(objeto):
+    """Cursor opaco con el ``creado`` y el ``id`` de un objeto"""
+    crudo = f'{objeto.creado.isoformat()}|{objeto.id}'
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (creado, id) del cursor o lanza ValueError si es inválido"""
+    try:
+        crudo = base64.urlsafe_b64decode(cursor.encode()).decode()
+        creado, objeto_id = crudo.split('|')
+        return datetime.fromisoformat(creado), int(objeto_id)
+    except (TypeError, UnicodeDecodeError, base64.binascii.Error) as error:
+        raise ValueError('Cursor inválido') from error
+
+
+def _consulta(queryset, cursor, tamano):
+    queryset = queryset.order_by('-creado', '-id')
+    if cursor:
+        creado, objeto_id = decodificar_cursor(cursor)
+        queryset = queryset.filter(
+            Q(creado__lt=creado) | Q(creado=creado, id__lt=objeto_id)
+        )
+    return queryset[:tamano + 1]
+
+
+def _pagina(elementos, tamano):
+    siguiente = None
+    if len(elementos) > tamano:
+        elementos = elementos[:tamano]
+        siguiente = codificar_cursor(elementos[-1])
+    return Pagina(elementos, siguiente)
+
+
+def paginar(queryset, cursor=None, tamano=12):
+    """
+    Devuelve la ``Pagina`` (elementos, siguiente) que sigue a ``cursor``.
+
+    Ejecuta una sola consulta: se piden ``tamano + 1`` filas para saber si
+    existe una página siguiente.
+    """
+    return _pagina(list(_consulta(queryset, cursor, tamano)), tamano)
+
+
+async def apaginar(queryset, cursor=None, tamano=12):
+    """Versión asíncrona de ``paginar``"""
+    elementos = [objeto async for objeto in _consulta(queryset, cursor, tamano)]
+    return _pagina(elementos, tamano)
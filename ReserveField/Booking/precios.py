@@ -0,0 +1,111 @@
+"""
+Tarifas precompiladas por cancha.
+
+El precio de una cancha se compila en una tabla de 7 días × franjas de
+``MINUTOS_POR_FRANJA`` minutos con el precio por hora de cada franja, en
+centavos. La clave de caché lleva la marca ``Cancha.actualizado``, que cambia
+al guardar la cancha y al tocar sus tarifas (ver ``signals.py``): un cambio
+hecho en cualquier proceso deja sin uso la tabla anterior, sin depender de
+invalidaciones locales. Cotizar una reserva es sumar las franjas que cubre,
+con aritmética entera y sin consultas a la base de datos.
+"""
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.cache import cache
+
+from .disponibilidad import a_minutos
+from .models import Cancha, Tarifa
+
+MINUTOS_POR_FRANJA = 30
+FRANJAS_POR_DIA = 24 * 60 // MINUTOS_POR_FRANJA
+CENTAVO = Decimal('0.01')
+# Las versiones anteriores de una tabla ya no se leen: que caduquen solas
+TIMEOUT = 24 * 3600
+
+
+def _clave(cancha_id, actualizado):
+    return f'precios:{cancha_id}:{actualizado.timestamp()}'
+
+
+def _centavos(precio):
+    return int(precio * 100)
+
+
+def compilar(precio_base, tarifas):
+    """
+    Tabla [dia][franja] de centavos por hora.
+
+    ``tarifas`` son tuplas (dia_semana, hora_inicio, hora_fin, precio_por_hora);
+    las de toda la semana (dia None) se aplican primero para que las de un día
+    concreto las sobrescriban.
+    """
+    tabla = [[_centavos(precio_base)] * FRANJAS_POR_DIA for _ in range(7)]
+    for dia, inicio, fin, precio in sorted(tarifas, key=lambda tarifa: tarifa[0] is not None):
+        desde = a_minutos(inicio) // MINUTOS_POR_FRANJA
+        hasta = -(-a_minutos(fin) // MINUTOS_POR_FRANJA)
+        for dia_tabla in range(7) if dia is None else [dia]:
+            tabla[dia_tabla][desde:hasta] = [_centavos(precio)] * (hasta - desde)
+    return tabla
+
+
+def construir_tablas(cancha_ids):
+    """Compilar y guardar las tablas de varias canchas con dos consultas"""
+    tarifas = defaultdict(list)
+    for cancha_id, *tarifa in Tarifa.objects.filter(cancha_id__in=cancha_ids).order_by(
+        'hora_inicio', 'id'
+    ).values_list('cancha_id', 'dia_semana', 'hora_inicio', 'hora_fin', 'precio_por_hora'):
+        tarifas[cancha_id].append(tarifa)
+
+    tablas, guardar = {}, {}
+    for cancha_id, precio_base, actualizado in Cancha.objects.filter(id__in=cancha_ids).values_list(
+        'id', 'precio_por_hora', 'actualizado'
+    ):
+        tablas[cancha_id] = compilar(precio_base, tarifas[cancha_id])
+        # Con la marca leída junto al precio: la clave siempre corresponde al contenido
+        guardar[_clave(cancha_id, actualizado)] = tablas[cancha_id]
+    cache.set_many(guardar, TIMEOUT)
+    return tablas
+
+
+def obtener_tablas(versiones):
+    """
+    Tablas de varias canchas: una lectura de caché y, si faltan, dos consultas.
+
+    ``versiones`` es ``{cancha_id: actualizado}``.
+    """
+    claves = {_clave(cancha_id, actualizado): cancha_id for cancha_id, actualizado in versiones.items()}
+    tablas = {claves[clave]: tabla for clave, tabla in cache.get_many(claves).items()}
+    faltantes = [cancha_id for cancha_id in versiones if cancha_id not in tablas]
+    if faltantes:
+        tablas.update(construir_tablas(faltantes))
+    return tablas
+
+
+def obtener_tabla(cancha):
+    """Tabla de precios de una cancha, compilándola si no está en caché"""
+    tabla = cache.get(_clave(cancha.id, cancha.actualizado))
+    if tabla is None:
+        tabla = construir_tablas([cancha.id])[cancha.id]
+    return tabla
+
+
+def precio_franjas(tabla, dia_semana, inicio, fin):
+    """Precio exacto de [inicio, fin) en minutos desde la medianoche"""
+    fila = tabla[dia_semana]
+    suma = 0
+    minuto = inicio
+    while minuto < fin:
+        siguiente = min(fin, (minuto // MINUTOS_POR_FRANJA + 1) * MINUTOS_POR_FRANJA)
+        suma += fila[minuto // MINUTOS_POR_FRANJA] * (siguiente - minuto)
+        minuto = siguiente
+    # centavos por hora × minutos → pesos
+    return (Decimal(suma) / 6000).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def cotizar(cancha, dia_semana, hora_inicio, hora_fin):
+    """Precio de reservar una cancha de ``hora_inicio`` a ``hora_fin`` un día de la semana"""
+    return precio_franjas(
+        obtener_tabla(cancha), dia_semana, a_minutos(hora_inicio), a_minutos(hora_fin)
+    )
+
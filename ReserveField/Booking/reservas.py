@@ -0,0 +1,210 @@
+"""
+Servicio de reservas.
+
+Crea reservas de forma atómica: dentro de una transacción se toma un bloqueo
+sobre la franja (cancha, fecha), se comprueba el solapamiento y se inserta.
+Así dos usuarios que piden el mismo horario a la vez no pueden pasar ambos
+la comprobación. Si la base de datos está ocupada se reintenta con espera
+exponencial y, en cualquier caso, el resultado es un ``ResultadoReserva``
+en lugar de una excepción.
+
+Las series semanales (``reservar_serie``) siguen el mismo esquema para todas
+sus fechas a la vez: un bloqueo, una consulta de conflictos y un
+``bulk_create``, todo o nada.
+"""
+import random
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Q
+
+from . import cache_catalogo, disponibilidad, eventos
+from .models import Cancha, Reserva, SerieReserva
+
+MAX_INTENTOS = 8
+ESPERA_BASE = 0.01  # segundos
+ESPERA_MAXIMA = 0.5
+# Diez años de una reserva semanal
+MAX_OCURRENCIAS = 520
+MENSAJE_OCUPADO = 'El sistema está ocupado, inténtalo de nuevo en unos segundos'
+
+ResultadoReserva = namedtuple('ResultadoReserva', ['exito', 'reserva', 'mensaje'])
+ResultadoSerie = namedtuple('ResultadoSerie', ['exito', 'serie', 'reservas', 'mensaje', 'conflictos'])
+
+
+def bloquear_franja(cancha_id, fecha):
+    """Bloqueo exclusivo de la franja (cancha, fecha) hasta el fin de la transacción"""
+    bloquear_franjas(cancha_id, [fecha])
+
+
+def bloquear_franjas(cancha_id, fechas):
+    """Bloquear varias fechas de una cancha con una sola sentencia"""
+    if connection.vendor == 'postgresql':
+        # Siempre en el mismo orden para que dos series no se bloqueen mutuamente
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, dia) FROM unnest(%s::integer[]) AS dia ORDER BY dia',
+                [cancha_id, sorted(fecha.toordinal() for fecha in fechas)],
+            )
+    elif connection.vendor == 'sqlite':
+        # SQLite no tiene bloqueos de fila: una escritura vacía toma el bloqueo
+        # de escritura de la base de datos y serializa las transacciones.
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE "{Cancha._meta.db_table}" SET id = id WHERE 0')
+    else:
+        list(Cancha.objects.select_for_update().filter(id=cancha_id).values_list('id'))
+
+
+def hay_conflicto(cancha_id, fecha, hora_inicio, hora_fin):
+    """Indica si alguna reserva activa se solapa con el intervalo pedido"""
+    return Reserva.objects.filter(
+        cancha_id=cancha_id,
+        fecha=fecha,
+        estado__in=Reserva.ESTADOS_ACTIVOS,
+    ).filter(
+        Q(hora_inicio__lt=hora_fin) & Q(hora_fin__gt=hora_inicio)
+    ).exists()
+
+
+def _esperar(intento):
+    espera = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** intento)
+    time.sleep(random.uniform(0, espera))
+
+
+def _con_reintentos(operacion):
+    """Ejecutar ``operacion`` y reintentar con espera si la base de datos está ocupada"""
+    for intento in range(MAX_INTENTOS):
+        try:
+            return operacion()
+        except OperationalError:
+            # Base de datos bloqueada o serialización fallida: reintentar
+            if transaction.get_connection().in_atomic_block:
+                raise
+            _esperar(intento)
+    return None
+
+
+def reservar(usuario, cancha, fecha, hora_inicio, hora_fin, total, estado='confirmada'):
+    """Crear una reserva si la franja está libre, sin carreras entre usuarios"""
+    def operacion():
+        with transaction.atomic():
+            bloquear_franja(cancha.id, fecha)
+
+            if hay_conflicto(cancha.id, fecha, hora_inicio, hora_fin):
+                return ResultadoReserva(False, None, 'Este horario ya está reservado')
+
+            reserva = Reserva.objects.create(
+                usuario=usuario,
+                cancha=cancha,
+                fecha=fecha,
+                hora_inicio=hora_inicio,
+                hora_fin=hora_fin,
+                total=total,
+                estado=estado,
+            )
+        return ResultadoReserva(True, reserva, '')
+
+    try:
+        resultado = _con_reintentos(operacion)
+    except IntegrityError:
+        # Otra transacción insertó la misma hora de inicio
+        return ResultadoReserva(False, None, 'Este horario ya está reservado')
+    return resultado or ResultadoReserva(False, None, MENSAJE_OCUPADO)
+
+
+def fechas_serie(dia_semana, desde, hasta):
+    """Fechas entre ``desde`` y ``hasta`` (incluidas) que caen en ``dia_semana``"""
+    primera = desde + timedelta(days=(dia_semana - desde.weekday()) % 7)
+    return [
+        primera + timedelta(weeks=semana)
+        for semana in range((hasta - primera).days // 7 + 1)
+    ] if primera <= hasta else []
+
+
+def conflictos_serie(cancha_id, dia_semana, desde, hasta, hora_inicio, hora_fin):
+    """Fechas de la serie ya ocupadas, con una sola consulta para todas las ocurrencias"""
+    return sorted(set(Reserva.objects.filter(
+        cancha_id=cancha_id,
+        fecha__range=(desde, hasta),
+        fecha__iso_week_day=dia_semana + 1,
+        estado__in=Reserva.ESTADOS_ACTIVOS,
+        hora_inicio__lt=hora_fin,
+        hora_fin__gt=hora_inicio,
+    ).order_by().values_list('fecha', flat=True)))
+
+
+def reservar_serie(usuario, cancha, dia_semana, hora_inicio, hora_fin, desde, hasta, total,
+                   estado='confirmada'):
+    """
+    Reservar todas las ocurrencias de una serie semanal, todas o ninguna.
+
+    Bloquea las fechas, busca conflictos con una consulta y crea las reservas
+    con ``bulk_create`` en la misma transacción. ``bulk_create`` no dispara
+    señales, así que el índice de disponibilidad, la caché y los eventos en
+    vivo se actualizan aquí.
+    """
+    fechas = fechas_serie(dia_semana, desde, hasta)
+    if not fechas:
+        return ResultadoSerie(False, None, [], 'El rango no incluye ese día de la semana', [])
+    if len(fechas) > MAX_OCURRENCIAS:
+        return ResultadoSerie(
+            False, None, [], f'Una serie no puede superar las {MAX_OCURRENCIAS} reservas', []
+        )
+
+    def operacion():
+        with transaction.atomic():
+            bloquear_franjas(cancha.id, fechas)
+
+            conflictos = conflictos_serie(
+                cancha.id, dia_semana, fechas[0], fechas[-1], hora_inicio, hora_fin
+            )
+            if conflictos:
+                return ResultadoSerie(False, None, [], 'Algunas fechas ya están reservadas', conflictos)
+
+            serie = SerieReserva.objects.create(
+                usuario=usuario,
+                cancha=cancha,
+                dia_semana=dia_semana,
+                hora_inicio=hora_inicio,
+                hora_fin=hora_fin,
+                fecha_desde=fechas[0],
+                fecha_hasta=fechas[-1],
+            )
+            reservas = Reserva.objects.bulk_create([
+                Reserva(
+                    usuario=usuario,
+                    cancha=cancha,
+                    serie=serie,
+                    fecha=fecha,
+                    hora_inicio=hora_inicio,
+                    hora_fin=hora_fin,
+                    total=total,
+                    estado=estado,
+                )
+                for fecha in fechas
+            ])
+            # bulk_create no dispara las señales: se replica aquí lo que hacen
+            # para una reserva, con una sola invalidación por cancha y también
+            # tras el commit, primero el índice y luego el JSON que se arma con él
+            def tras_commit():
+                disponibilidad.invalidar_cancha(cancha.id)
+                cache_catalogo.invalidar(cancha.id, 'disponibilidad')
+                _publicar_serie(cancha.id, reservas)
+            transaction.on_commit(tras_commit)
+        return ResultadoSerie(True, serie, reservas, '', [])
+
+    try:
+        resultado = _con_reintentos(operacion)
+    except IntegrityError:
+        return ResultadoSerie(False, None, [], 'Algunas fechas ya están reservadas', [])
+    return resultado or ResultadoSerie(False, None, [], MENSAJE_OCUPADO, [])
+
+
+def _publicar_serie(cancha_id, reservas):
+    for reserva in reservas:
+        eventos.publicar_franja(
+            'ocupado', reserva.id,
+            (cancha_id, reserva.fecha, reserva.hora_inicio, reserva.hora_fin),
+        )
@@ -0,0 +1,179 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import busqueda, cache_catalogo, calificaciones, disponibilidad, eventos, imagenes
+from .models import Cancha, Horario, Reserva, Resena, Tarifa
+
+
+@receiver(post_init, sender=Reserva)
+def recordar_franja_reserva(sender, instance, **kwargs):
+    """Guardar cancha y fecha originales para detectar cambios al guardar"""
+    # Se lee de __dict__ para no disparar consultas con campos diferidos
+    instance._franja_original = (
+        instance.__dict__.get('cancha_id'),
+        instance.__dict__.get('fecha'),
+    )
+
+
+@receiver(post_save, sender=Reserva)
+def actualizar_disponibilidad_reserva(sender, instance, **kwargs):
+    """Invalidar el índice de disponibilidad al crear o modificar una reserva"""
+    franjas = {getattr(instance, '_franja_original', (None, None)), (instance.cancha_id, instance.fecha)}
+    franjas.discard((None, None))
+    instance._franja_original = (instance.cancha_id, instance.fecha)
+
+    # Solo tras el commit: una escritura revertida no toca el índice y nadie
+    # puede reconstruirlo antes de que la reserva sea visible
+    def invalidar():
+        for cancha_id, fecha in franjas:
+            disponibilidad.invalidar(cancha_id, fecha)
+        # El JSON cacheado se arma desde el índice: su versión va después
+        for cancha_id in {cancha_id for cancha_id, _ in franjas}:
+            cache_catalogo.invalidar(cancha_id, 'disponibilidad')
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_delete, sender=Reserva)
+def quitar_disponibilidad_reserva(sender, instance, **kwargs):
+    cancha_id, fecha = instance.cancha_id, instance.fecha
+
+    def invalidar():
+        disponibilidad.invalidar(cancha_id, fecha)
+        cache_catalogo.invalidar(cancha_id, 'disponibilidad')
+    transaction.on_commit(invalidar)
+
+
+def _ocupacion(reserva):
+    """Franja (cancha_id, fecha, inicio, fin) que ocupa la reserva, o None si no está activa"""
+    datos = reserva.__dict__
+    if datos.get('estado') not in Reserva.ESTADOS_ACTIVOS:
+        return None
+    return (datos.get('cancha_id'), datos.get('fecha'), datos.get('hora_inicio'), datos.get('hora_fin'))
+
+
+@receiver(post_init, sender=Reserva)
+def recordar_ocupacion_reserva(sender, instance, **kwargs):
+    instance._ocupacion_original = _ocupacion(instance)
+
+
+@receiver(post_save, sender=Reserva)
+def publicar_cambio_reserva(sender, instance, created, **kwargs):
+    """Avisar a los clientes en vivo qué franjas se ocuparon o liberaron"""
+    # post_init también corre al construir una reserva nueva, antes de guardarla
+    anterior = None if created else instance._ocupacion_original
+    actual = _ocupacion(instance)
+    instance._ocupacion_original = actual
+    if anterior == actual:
+        return
+    # Solo tras el commit: una reserva revertida nunca ocupó la franja
+    if anterior is not None:
+        transaction.on_commit(lambda: eventos.publicar_franja('liberado', instance.id, anterior))
+    if actual is not None:
+        transaction.on_commit(lambda: eventos.publicar_franja('ocupado', instance.id, actual))
+
+
+@receiver(post_delete, sender=Reserva)
+def publicar_borrado_reserva(sender, instance, **kwargs):
+    franja = _ocupacion(instance)
+    if franja is not None:
+        reserva_id = instance.id
+        transaction.on_commit(lambda: eventos.publicar_franja('liberado', reserva_id, franja))
+
+
+@receiver(post_save, sender=Horario)
+@receiver(post_delete, sender=Horario)
+def invalidar_disponibilidad_horario(sender, instance, **kwargs):
+    # Tras el commit: antes, otro proceso podría reconstruir con el horario viejo
+    cancha_id = instance.cancha_id
+
+    def invalidar():
+        disponibilidad.invalidar_cancha(cancha_id)
+        cache_catalogo.invalidar(cancha_id, 'disponibilidad')
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_save, sender=Horario)
+@receiver(post_delete, sender=Horario)
+@receiver(post_save, sender=Tarifa)
+@receiver(post_delete, sender=Tarifa)
+def tocar_cancha(sender, instance, **kwargs):
+    """Horarios y tarifas son parte de la cancha: su marca `actualizado` debe cambiar (ver condicional.py y precios.py)"""
+    Cancha.objects.filter(id=instance.cancha_id).update(actualizado=timezone.now())
+
+
+@receiver(post_delete, sender=Cancha)
+def invalidar_disponibilidad_cancha(sender, instance, **kwargs):
+    disponibilidad.invalidar_cancha(instance.id)
+
+
+def _nombre_imagen(cancha):
+    # Se lee de __dict__ para no disparar consultas con campos diferidos
+    imagen = cancha.__dict__.get('imagen')
+    return getattr(imagen, 'name', imagen) or ''
+
+
+@receiver(post_init, sender=Cancha)
+def recordar_imagen_cancha(sender, instance, **kwargs):
+    instance._imagen_original = _nombre_imagen(instance)
+
+
+@receiver(post_save, sender=Cancha)
+def generar_variantes_imagen(sender, instance, created, **kwargs):
+    """Generar en segundo plano las variantes de una imagen nueva, tras el commit"""
+    imagen = _nombre_imagen(instance)
+    anterior = '' if created else instance._imagen_original
+    instance._imagen_original = imagen
+    if imagen and imagen != anterior:
+        cancha_id = instance.id
+        transaction.on_commit(lambda: imagenes.encolar(cancha_id))
+
+
+def instalar_busqueda(sender, using, **kwargs):
+    """Restaurar los triggers de búsqueda tras cada migrate"""
+    busqueda.instalar(connections[using])
+
+
+@receiver(post_init, sender=Resena)
+def recordar_calificacion_resena(sender, instance, **kwargs):
+    """Guardar cancha y calificación originales para ajustar los agregados"""
+    instance._calificacion_original = (
+        instance.__dict__.get('cancha_id'),
+        instance.__dict__.get('calificacion'),
+    )
+
+
+@receiver(post_save, sender=Resena)
+def actualizar_agregados_resena(sender, instance, created, **kwargs):
+    cancha_id, calificacion = instance._calificacion_original
+    if created or cancha_id is None:
+        calificaciones.aplicar_cambio(instance.cancha_id, nueva=instance.calificacion)
+    elif cancha_id != instance.cancha_id:
+        calificaciones.aplicar_cambio(cancha_id, anterior=calificacion)
+        calificaciones.aplicar_cambio(instance.cancha_id, nueva=instance.calificacion)
+    else:
+        calificaciones.aplicar_cambio(cancha_id, calificacion, instance.calificacion)
+    instance._calificacion_original = (instance.cancha_id, instance.calificacion)
+
+
+@receiver(post_delete, sender=Resena)
+def descontar_agregados_resena(sender, instance, **kwargs):
+    cancha_id, calificacion = instance._calificacion_original
+    calificaciones.aplicar_cambio(cancha_id, anterior=calificacion)
+
+
+@receiver(post_save, sender=Cancha)
+@receiver(post_delete, sender=Cancha)
+def invalidar_cache_cancha(sender, instance, **kwargs):
+    # Tras el commit: si la versión cambiara antes, una petición en medio
+    # guardaría los datos viejos bajo la versión nueva
+    cancha_id = instance.id
+    transaction.on_commit(lambda: cache_catalogo.invalidar(cancha_id, 'resenas', 'disponibilidad'))
+
+
+@receiver(post_save, sender=Resena)
+@receiver(post_delete, sender=Resena)
+def invalidar_cache_resenas(sender, instance, **kwargs):
+    cancha_id = instance.cancha_id
+    transaction.on_commit(lambda: cache_catalogo.invalidar(cancha_id, 'resenas'))
@@ -0,0 +1,27 @@
+from django import template
+
+from Booking import imagenes
+
+register = template.Library()
+
+
+@register.inclusion_tag('booking/imagen_cancha.html')
+def imagen_cancha(cancha, sizes='100vw', clase='', carga='lazy'):
+    """
+    Imagen de una cancha con sus variantes WebP/JPEG en ``srcset``.
+
+    ``sizes`` es el ancho con que se muestra la imagen, para que el navegador
+    elija la variante más chica que alcance; ``carga`` es el atributo
+    ``loading`` ('eager' para la imagen principal de la página). Sin variantes
+    se usa el original.
+    """
+    variantes = imagenes.vigentes(cancha)
+    contexto = {'cancha': cancha, 'sizes': sizes, 'clase': clase, 'variantes': variantes, 'carga': carga}
+    if variantes:
+        ancho, nombre = variantes['variantes']['jpeg'][-1]
+        contexto.update(
+            srcset_webp=imagenes.srcset(variantes, 'webp'),
+            srcset_jpeg=imagenes.srcset(variantes, 'jpeg'),
+            src=cancha.imagen.storage.url(nombre),
+        )
+    return contexto
@@ -1,3 +1,1837 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+import time as reloj
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .calificaciones import recalcular_todas
+from .middleware import DetectorConsultasMiddleware
+from .models import Cancha, Correo, Horario, Reserva, ReservaArchivada, Resena, Tarifa
+from . import (
+    archivo, cache_catalogo, correos, disponibilidad, estaticos, estados, eventos, exportacion, imagenes,
+    limites, precios, reservas, views,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def crear_cancha(nombre='Cancha Test', **kwargs):
+    datos = {
+        'descripcion': 'Cancha de prueba',
+        'tipo': 'futbol',
+        'ubicacion': 'Puerto Montt',
+        'precio_por_hora': 10,
+    }
+    datos.update(kwargs)
+    cancha = Cancha.objects.create(nombre=nombre, **datos)
+    for dia in range(7):
+        Horario.objects.create(
+            cancha=cancha, dia_semana=dia,
+            hora_apertura=time(9), hora_cierre=time(22),
+        )
+    return cancha
+
+
+class ReservarTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.fecha = date.today() + timedelta(days=7)
+
+    def test_conflicto_devuelve_resultado_limpio(self):
+        primero = reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+        segundo = reservas.reservar(self.usuario, self.cancha, self.fecha, time(10, 30), time(11, 30), 10)
+
+        self.assertTrue(primero.exito)
+        self.assertFalse(segundo.exito)
+        self.assertEqual(Reserva.objects.count(), 1)
+
+    def test_reserva_cancelada_libera_el_horario(self):
+        primero = reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+        primero.reserva.estado = 'cancelada'
+        primero.reserva.save()
+
+        segundo = reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+
+        self.assertTrue(segundo.exito)
+
+
+class IndiceDisponibilidadTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.fecha = date.today() + timedelta(days=7)
+        self.otra_fecha = self.fecha + timedelta(days=1)
+        for fecha in (self.fecha, self.otra_fecha):
+            disponibilidad.construir(self.cancha.id, fecha)
+
+    def reservar(self, fecha=None, desde=10, hasta=11):
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = reservas.reservar(
+                self.usuario, self.cancha, fecha or self.fecha, time(desde), time(hasta), 10
+            )
+        return resultado.reserva
+
+    def indice(self, fecha=None):
+        return disponibilidad.obtener(self.cancha.id, fecha or self.fecha)
+
+    def libres(self, fecha=None):
+        return disponibilidad.bloques_libres(self.indice(fecha)['libres'])
+
+    def test_reserva_nueva_invalida_solo_su_fecha(self):
+        reserva = self.reservar()
+
+        self.assertIsNone(disponibilidad.consultar(self.cancha.id, self.fecha))
+        self.assertIsNotNone(disponibilidad.consultar(self.cancha.id, self.otra_fecha))
+        self.assertEqual(self.indice()['reservas'], {reserva.id: (600, 660)})
+        self.assertNotIn('10:00', self.libres())
+        self.assertNotIn('10:30', self.libres())
+        self.assertIn('11:00', self.libres())
+
+    def test_mover_reserva_de_fecha(self):
+        reserva = self.reservar()
+        self.indice()
+
+        reserva.fecha = self.otra_fecha
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.save()
+
+        self.assertEqual(self.indice()['reservas'], {})
+        self.assertIn('10:00', self.libres())
+        self.assertEqual(list(self.indice(self.otra_fecha)['reservas']), [reserva.id])
+        self.assertNotIn('10:00', self.libres(self.otra_fecha))
+
+    def test_cancelar_libera_el_horario(self):
+        reserva = self.reservar()
+        self.indice()
+
+        reserva.estado = 'cancelada'
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.save()
+
+        self.assertEqual(self.indice()['reservas'], {})
+        self.assertIn('10:00', self.libres())
+
+    def test_borrar_reserva(self):
+        reserva = self.reservar()
+        self.indice()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.delete()
+
+        self.assertEqual(self.indice()['reservas'], {})
+
+    def test_escritura_revertida_no_deja_reservas_fantasma(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+                raise RuntimeError
+
+        self.assertEqual(callbacks, [])
+        self.assertEqual(disponibilidad.consultar(self.cancha.id, self.fecha)['reservas'], {})
+
+    def test_cambio_de_horario_invalida_la_cancha(self):
+        horario = Horario.objects.get(cancha=self.cancha, dia_semana=self.fecha.weekday())
+        horario.hora_cierre = time(20)
+        with self.captureOnCommitCallbacks(execute=True):
+            horario.save()
+
+        self.assertIsNone(disponibilidad.consultar(self.cancha.id, self.fecha))
+        self.assertIsNone(disponibilidad.consultar(self.cancha.id, self.otra_fecha))
+        self.assertEqual(self.indice()['cierre'], 20 * 60)
+
+    def test_consulta_en_cache_sin_sql(self):
+        self.reservar()
+        self.indice()
+        with self.assertNumQueries(0):
+            entrada = disponibilidad.obtener(self.cancha.id, self.fecha)
+        self.assertEqual(len(entrada['reservas']), 1)
+
+    def test_reserva_confirmada_mientras_se_construye(self):
+        primera = self.reservar()
+        leer_reservas = disponibilidad._reservas_activas
+
+        def leer_y_reservar_en_medio(cancha_id, fecha):
+            # El lector ya fijó su clave y leyó la base; recién entonces se
+            # confirma otra reserva e invalida la fecha
+            leidas = list(leer_reservas(cancha_id, fecha))
+            self.reservar(desde=15, hasta=16)
+            return leidas
+
+        with mock.patch.object(disponibilidad, '_reservas_activas', leer_y_reservar_en_medio):
+            vieja = disponibilidad.construir(self.cancha.id, self.fecha)
+        self.assertEqual(list(vieja['reservas']), [primera.id])
+
+        # La entrada vieja quedó con una versión que ya nadie lee
+        self.assertEqual(len(self.indice()['reservas']), 2)
+        self.assertNotIn('15:00', self.libres())
+
+    def test_invalidaciones_simultaneas_no_se_pierden(self):
+        clave = disponibilidad._clave_version(self.cancha.id, self.fecha)
+        inicial = caches['default'].get(clave)
+        barrera = threading.Barrier(20)
+
+        def invalidar():
+            barrera.wait()
+            for _ in range(10):
+                disponibilidad.invalidar(self.cancha.id, self.fecha)
+
+        hilos = [threading.Thread(target=invalidar) for _ in range(20)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(caches['default'].get(clave), inicial + 200)
+
+
+class BuscarDisponibilidadTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.url = reverse('api_disponibilidad')
+        self.cancha = crear_cancha('Cancha Centro')
+        self.fecha = date.today() + timedelta(days=7)
+
+    def buscar(self, **parametros):
+        parametros.setdefault('desde', self.fecha.isoformat())
+        parametros.setdefault('hasta', self.fecha.isoformat())
+        return self.client.get(self.url, parametros).json()
+
+    def test_ventanas_libres_y_precios(self):
+        reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+
+        datos = self.buscar()
+
+        self.assertTrue(datos['success'])
+        [cancha] = datos['canchas']
+        self.assertEqual(cancha['id'], self.cancha.id)
+        self.assertEqual(cancha['dias'], [{
+            'fecha': self.fecha.isoformat(),
+            'ventanas': [['09:00', '10:00'], ['11:00', '22:00']],
+            'precios': ['10.00', '10.00'],
+        }])
+
+    def test_duracion_descarta_ventanas_cortas(self):
+        reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+
+        [cancha] = self.buscar(duracion=90)['canchas']
+
+        self.assertEqual(cancha['dias'][0]['ventanas'], [['11:00', '22:00']])
+        self.assertEqual(cancha['dias'][0]['precios'], ['15.00'])
+
+    def test_dias_sin_ventanas_no_aparecen(self):
+        reservas.reservar(self.usuario, self.cancha, self.fecha, time(9), time(22), 10)
+        hasta = self.fecha + timedelta(days=1)
+
+        [cancha] = self.buscar(hasta=hasta.isoformat())['canchas']
+
+        self.assertEqual([dia['fecha'] for dia in cancha['dias']], [hasta.isoformat()])
+
+    def test_filtros_por_tipo_y_ubicacion(self):
+        tenis = crear_cancha('Tenis Norte', tipo='tenis', ubicacion='Palermo, CABA')
+        crear_cancha('Cerrada', tipo='tenis', ubicacion='Palermo, CABA', disponible=False)
+
+        def ids(**filtros):
+            return [cancha['id'] for cancha in self.buscar(**filtros)['canchas']]
+
+        self.assertEqual(ids(), [self.cancha.id, tenis.id])
+        self.assertEqual(ids(tipo='tenis'), [tenis.id])
+        self.assertEqual(ids(ubicacion='palermo'), [tenis.id])
+        self.assertEqual(ids(tipo='futbol', ubicacion='palermo'), [])
+
+    def test_rango_maximo(self):
+        ultimo = self.fecha + timedelta(days=views.MAX_DIAS_BUSQUEDA - 1)
+        datos = self.buscar(hasta=ultimo.isoformat())
+        self.assertTrue(datos['success'])
+        self.assertEqual(len(datos['canchas'][0]['dias']), views.MAX_DIAS_BUSQUEDA)
+
+        datos = self.buscar(hasta=(ultimo + timedelta(days=1)).isoformat())
+        self.assertFalse(datos['success'])
+        self.assertIn(str(views.MAX_DIAS_BUSQUEDA), datos['message'])
+
+    def test_parametros_invalidos(self):
+        manana = (self.fecha + timedelta(days=1)).isoformat()
+        casos = [
+            {'desde': ''},
+            {'desde': '2025-02-30'},
+            {'hasta': 'mañana'},
+            {'desde': manana},
+            {'duracion': 'una hora'},
+            {'duracion': 0},
+            {'duracion': -30},
+        ]
+        for parametros in casos:
+            with self.subTest(**parametros):
+                datos = self.buscar(**parametros)
+                self.assertFalse(datos['success'])
+                self.assertEqual(datos['message'], 'Parámetros inválidos')
+
+    def test_consultas_constantes(self):
+        def contar(canchas, dias):
+            caches['default'].clear()
+            hasta = self.fecha + timedelta(days=dias - 1)
+            with CaptureQueriesContext(connection) as consultas:
+                datos = self.buscar(hasta=hasta.isoformat())
+            self.assertEqual(len(datos['canchas']), canchas)
+            return len(consultas)
+
+        pocas = contar(1, 1)
+        for n in range(5):
+            cancha = crear_cancha(f'Cancha {n}')
+            reservas.reservar(self.usuario, cancha, self.fecha, time(10), time(11), 10)
+        # sesión + usuario + horarios + reservas + tarifas y precios base
+        self.assertEqual(pocas, 6)
+        self.assertEqual(contar(6, 14), pocas)
+
+
+class ReservasRecurrentesTests(TestCase):
+    def setUp(self):
+        for alias in ('default', 'catalogo'):
+            caches[alias].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        # Primer martes a partir de mañana
+        manana = date.today() + timedelta(days=1)
+        self.martes = manana + timedelta(days=(1 - manana.weekday()) % 7)
+
+    def reservar_semanas(self, semanas):
+        return reservas.reservar_serie(
+            self.usuario, self.cancha, 1, time(19), time(20),
+            self.martes, self.martes + timedelta(weeks=semanas - 1, days=6), Decimal('10.00'),
+        )
+
+    def test_fechas_serie(self):
+        lunes = date(2030, 1, 7)
+        self.assertEqual(
+            reservas.fechas_serie(1, lunes, date(2030, 1, 22)),
+            [date(2030, 1, 8), date(2030, 1, 15), date(2030, 1, 22)],
+        )
+        self.assertEqual(reservas.fechas_serie(6, lunes, date(2030, 1, 11)), [])
+
+    def test_consultas_no_dependen_de_las_ocurrencias(self):
+        # bloqueo + conflictos + serie + bulk_create, más el savepoint del atomic
+        with self.assertNumQueries(6):
+            corta = self.reservar_semanas(4)
+        Reserva.objects.all().delete()
+        with self.assertNumQueries(6):
+            larga = self.reservar_semanas(52)
+
+        self.assertTrue(corta.exito and larga.exito)
+        self.assertEqual(len(larga.reservas), 52)
+        self.assertEqual(larga.serie.reservas.count(), 52)
+
+    def test_conflicto_no_crea_ninguna_reserva(self):
+        ocupada = self.martes + timedelta(weeks=3)
+        Reserva.objects.create(
+            usuario=self.usuario, cancha=self.cancha, fecha=ocupada,
+            hora_inicio=time(19, 30), hora_fin=time(20, 30), total=10, estado='pendiente',
+        )
+
+        resultado = self.reservar_semanas(10)
+
+        self.assertFalse(resultado.exito)
+        self.assertEqual(resultado.conflictos, [ocupada])
+        self.assertEqual(Reserva.objects.count(), 1)
+
+    def test_api_actualiza_disponibilidad_y_encola_un_correo(self):
+        self.client.force_login(self.usuario)
+        url_horarios = reverse('api_horarios', args=[self.cancha.id])
+        fecha = (self.martes + timedelta(weeks=2)).isoformat()
+        self.assertEqual(self.client.get(url_horarios, {'fecha': fecha}).json()['reservas_existentes'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            datos = self.client.post(reverse('api_reserva_recurrente', args=[self.cancha.id]), {
+                'dia_semana': 1, 'hora_inicio': '19:00', 'hora_fin': '20:30',
+                'fecha_desde': self.martes.isoformat(),
+                'fecha_hasta': (self.martes + timedelta(weeks=11)).isoformat(),
+            }).json()
+            # Antes del commit la caché no cambia: otra conexión aún no vería la serie
+            self.assertEqual(
+                self.client.get(url_horarios, {'fecha': fecha}).json()['reservas_existentes'], []
+            )
+
+        self.assertTrue(datos['success'])
+        self.assertEqual(datos['reservas'], 12)
+        self.assertEqual(datos['total'], '180.00')
+        self.assertEqual(
+            self.client.get(url_horarios, {'fecha': fecha}).json()['reservas_existentes'],
+            [['19:00:00', '20:30:00']],
+        )
+        self.assertEqual(Correo.objects.count(), 1)
+
+
+class PreciosTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha(precio_por_hora=Decimal('15000.00'))
+        Tarifa.objects.create(
+            cancha=self.cancha, nombre='Hora punta',
+            hora_inicio=time(18), hora_fin=time(22), precio_por_hora=Decimal('20000.00'),
+        )
+        Tarifa.objects.create(
+            cancha=self.cancha, nombre='Fin de semana', dia_semana=5,
+            hora_inicio=time(9), hora_fin=time(22), precio_por_hora=Decimal('25000.00'),
+        )
+
+    def cotizar(self, *args):
+        # Como en las vistas: la cancha recién leída trae su marca `actualizado`
+        self.cancha.refresh_from_db()
+        return precios.cotizar(self.cancha, *args)
+
+    def test_cotizacion_exacta_por_franjas(self):
+        # Lunes 17:00-19:15: una hora base y 1h15 de hora punta
+        self.assertEqual(self.cotizar(0, time(17), time(19, 15)), Decimal('40000.00'))
+        # El sábado la tarifa del día reemplaza a la de toda la semana
+        self.assertEqual(self.cotizar(5, time(17), time(19, 15)), Decimal('56250.00'))
+        # Un tercio de hora a 10 por hora se redondea al centavo
+        otra = crear_cancha(precio_por_hora=10)
+        self.assertEqual(precios.cotizar(otra, 0, time(10), time(10, 20)), Decimal('3.33'))
+
+    def test_tabla_en_cache_sin_consultas(self):
+        self.cancha.refresh_from_db()
+        precios.obtener_tabla(self.cancha)
+        with self.assertNumQueries(0):
+            for minuto in range(0, 1000):
+                precios.cotizar(self.cancha, minuto % 7, time(9), time(10, 30))
+
+    def test_cambio_de_tarifa_invalida_la_tabla(self):
+        self.assertEqual(self.cotizar(1, time(20), time(21)), Decimal('20000.00'))
+
+        Tarifa.objects.filter(nombre='Hora punta').get().delete()
+        self.assertEqual(self.cotizar(1, time(20), time(21)), Decimal('15000.00'))
+
+        self.cancha.precio_por_hora = Decimal('12000.00')
+        self.cancha.save()
+        self.assertEqual(self.cotizar(1, time(20), time(21)), Decimal('12000.00'))
+
+    def test_cambio_en_otro_proceso_no_usa_la_tabla_vieja(self):
+        self.assertEqual(self.cotizar(1, time(20), time(21)), Decimal('20000.00'))
+
+        # Otro worker cambia la tarifa: aquí no corre ninguna señal, solo
+        # cambia la marca de la cancha (lo que hace su `tocar_cancha`)
+        Tarifa.objects.filter(nombre='Hora punta').update(precio_por_hora=Decimal('30000.00'))
+        Cancha.objects.filter(id=self.cancha.id).update(actualizado=timezone.now())
+
+        self.assertEqual(self.cotizar(1, time(20), time(21)), Decimal('30000.00'))
+
+    def test_crear_reserva_usa_las_tarifas(self):
+        self.client.force_login(self.usuario)
+        fecha = date.today() + timedelta(days=1)
+        fecha += timedelta(days=(5 - fecha.weekday()) % 7)
+
+        self.client.post(reverse('crear_reserva', args=[self.cancha.id]), {
+            'fecha': fecha.isoformat(), 'hora_inicio': '10:00', 'hora_fin': '11:30',
+        })
+
+        self.assertEqual(Reserva.objects.get().total, Decimal('37500.00'))
+
+    def test_busqueda_incluye_precios(self):
+        self.client.force_login(self.usuario)
+        lunes = date.today() + timedelta(days=1)
+        lunes += timedelta(days=-lunes.weekday() % 7)
+
+        datos = self.client.get(reverse('api_disponibilidad'), {
+            'desde': lunes.isoformat(), 'hasta': lunes.isoformat(), 'duracion': 60,
+        }).json()
+
+        dia = datos['canchas'][0]['dias'][0]
+        self.assertEqual(dia['ventanas'], [['09:00', '22:00']])
+        self.assertEqual(dia['precios'], ['15000.00'])
+
+    def test_tarifa_debe_alinearse_a_franjas(self):
+        tarifa = Tarifa(cancha=self.cancha, hora_inicio=time(18, 15), hora_fin=time(20), precio_por_hora=1)
+        with self.assertRaises(ValidationError):
+            tarifa.full_clean()
+
+
+class EstadosReservaTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.ahora = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+        self.hoy = self.ahora.date()
+
+    def reservar(self, fecha, inicio, fin, estado):
+        return Reserva.objects.create(
+            usuario=self.usuario, cancha=self.cancha, fecha=fecha,
+            hora_inicio=time(inicio), hora_fin=time(fin), total=10, estado=estado,
+        )
+
+    def test_completa_solo_las_terminadas(self):
+        ayer = self.reservar(self.hoy - timedelta(days=1), 20, 21, 'confirmada')
+        esta_manana = self.reservar(self.hoy, 10, 11, 'confirmada')
+        en_curso = self.reservar(self.hoy, 11, 13, 'confirmada')
+        cancelada = self.reservar(self.hoy - timedelta(days=1), 10, 11, 'cancelada')
+
+        self.assertEqual(list(estados.completar_terminadas(self.ahora)), [2])
+
+        estados_finales = dict(Reserva.objects.values_list('id', 'estado'))
+        self.assertEqual(estados_finales[ayer.id], 'completada')
+        self.assertEqual(estados_finales[esta_manana.id], 'completada')
+        self.assertEqual(estados_finales[en_curso.id], 'confirmada')
+        self.assertEqual(estados_finales[cancelada.id], 'cancelada')
+
+    def test_lotes_acotados(self):
+        for dias in range(1, 6):
+            self.reservar(self.hoy - timedelta(days=dias), 10, 11, 'confirmada')
+
+        self.assertEqual(list(estados.completar_terminadas(self.ahora, lote=2)), [2, 2, 1])
+        self.assertEqual(list(estados.completar_terminadas(self.ahora, lote=2)), [])
+
+    def test_vence_pendientes_y_libera_el_horario(self):
+        manana = date.today() + timedelta(days=1)
+        vieja = self.reservar(manana, 10, 11, 'pendiente')
+        reciente = self.reservar(manana, 12, 13, 'pendiente')
+        ahora = timezone.localtime()
+        Reserva.objects.filter(id=vieja.id).update(creado=ahora - timedelta(hours=1))
+        entrada = disponibilidad.construir(self.cancha.id, manana)
+        self.assertEqual(len(entrada['reservas']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(list(estados.vencer_pendientes(ahora)), [1])
+            # El índice, la caché y los eventos esperan al commit
+            self.assertEqual(len(disponibilidad.obtener(self.cancha.id, manana)['reservas']), 2)
+
+        self.assertEqual(Reserva.objects.get(id=vieja.id).estado, 'cancelada')
+        self.assertEqual(Reserva.objects.get(id=reciente.id).estado, 'pendiente')
+        self.assertEqual(list(disponibilidad.obtener(self.cancha.id, manana)['reservas']), [reciente.id])
+
+    def test_comando_informa_cada_lote(self):
+        for dias in range(1, 4):
+            self.reservar(self.hoy - timedelta(days=dias), 10, 11, 'confirmada')
+        salida = StringIO()
+
+        call_command('actualizar_estados', lote=2, stdout=salida)
+
+        self.assertIn('lote 1: 2 completadas', salida.getvalue())
+        self.assertIn('lote 2: 1 completadas', salida.getvalue())
+        self.assertIn('✓ 3 reservas completadas', salida.getvalue())
+
+
+class GenerarDatosTests(TestCase):
+    def test_cantidades_que_no_caben_dan_error(self):
+        # 2 canchas × 10 días × 13 horas = 260 reservas como máximo
+        with self.assertRaisesMessage(CommandError, 'como máximo 260 reservas'):
+            call_command('generar_datos', canchas=2, usuarios=5, reservas=261, dias=10, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'como máximo 10 reseñas'):
+            call_command('generar_datos', canchas=2, usuarios=5, reservas=10, resenas=11, stdout=StringIO())
+        self.assertFalse(Cancha.objects.exists())
+
+    def test_genera_lo_pedido(self):
+        call_command(
+            'generar_datos', canchas=2, usuarios=5, reservas=260, resenas=10, dias=10, stdout=StringIO(),
+        )
+
+        self.assertEqual(Reserva.objects.count(), 260)
+        self.assertEqual(Resena.objects.count(), 10)
+
+
+class ArchivoReservasTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.hoy = date.today()
+
+    def reservar(self, dias, estado):
+        return Reserva.objects.create(
+            usuario=self.usuario, cancha=self.cancha, fecha=self.hoy + timedelta(days=dias),
+            hora_inicio=time(10), hora_fin=time(11), total=10, estado=estado,
+        )
+
+    def test_archiva_solo_las_antiguas_en_estado_final(self):
+        antiguas = [self.reservar(-400 - n, 'completada') for n in range(5)]
+        cancelada = self.reservar(-500, 'cancelada')
+        reciente = self.reservar(-10, 'completada')
+        futura = self.reservar(10, 'confirmada')
+
+        self.assertEqual(list(archivo.archivar(horizonte=365, lote=4)), [4, 2])
+
+        self.assertEqual(set(Reserva.objects.values_list('id', flat=True)), {reciente.id, futura.id})
+        archivada = ReservaArchivada.objects.get(id=antiguas[0].id)
+        self.assertEqual(
+            (archivada.usuario_id, archivada.fecha, archivada.estado, archivada.total, archivada.creado),
+            (self.usuario.id, antiguas[0].fecha, 'completada', 10, antiguas[0].creado),
+        )
+        self.assertEqual(ReservaArchivada.objects.filter(id=cancelada.id).count(), 1)
+
+    def test_historial_lee_ambas_tablas(self):
+        self.reservar(-800, 'completada')
+        self.reservar(-30, 'cancelada')
+        self.reservar(-600, 'cancelada')
+        for _ in archivo.archivar(horizonte=365):
+            pass
+        self.reservar(-400, 'completada')
+        self.client.force_login(self.usuario)
+
+        respuesta = self.client.get(reverse('mis_reservas'), {'tab': 'historial'})
+
+        fechas = [reserva.fecha for reserva in respuesta.context['reservas_historial']]
+        self.assertEqual(fechas, [self.hoy + timedelta(days=dias) for dias in (-30, -400, -600, -800)])
+        self.assertEqual(ReservaArchivada.objects.count(), 2)
+
+    def test_reserva_cambiada_durante_el_lote_no_se_archiva(self):
+        reserva = self.reservar(-400, 'cancelada')
+        copiar = ReservaArchivada.objects.bulk_create
+
+        def reactivar(filas):
+            # Otro proceso la reactiva entre la lectura y el borrado
+            Reserva.objects.filter(id=reserva.id).update(estado='confirmada')
+            return copiar(filas)
+
+        with mock.patch.object(ReservaArchivada.objects, 'bulk_create', side_effect=reactivar):
+            self.assertEqual(list(archivo.archivar(horizonte=365)), [0])
+
+        self.assertEqual(Reserva.objects.get(id=reserva.id).estado, 'confirmada')
+        self.assertFalse(ReservaArchivada.objects.exists())
+
+    def test_comando(self):
+        self.reservar(-400, 'completada')
+        salida = StringIO()
+
+        call_command('archivar_reservas', stdout=salida)
+
+        self.assertIn('✓ 1 reservas archivadas', salida.getvalue())
+        self.assertFalse(Reserva.objects.exists())
+
+
+class ExportacionTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@test.com', 'clave-segura')
+        self.futbol = crear_cancha('Fútbol 5, Centro', tipo='futbol')
+        self.tenis = crear_cancha('Tenis', tipo='tenis')
+        hoy = date.today()
+        for cancha, dias, estado, total in (
+            (self.futbol, 1, 'confirmada', '10.50'),
+            (self.futbol, 1, 'completada', '20.25'),
+            (self.futbol, 2, 'cancelada', '99.00'),
+            (self.tenis, 2, 'completada', '5.00'),
+        ):
+            Reserva.objects.create(
+                usuario=self.admin, cancha=cancha, fecha=hoy - timedelta(days=dias),
+                hora_inicio=time(10 + len(total)), hora_fin=time(12 + len(total)),
+                total=Decimal(total), estado=estado,
+            )
+
+    def test_accion_admin_exporta_csv_en_streaming(self):
+        self.client.force_login(self.admin)
+
+        respuesta = self.client.post(reverse('admin:Booking_reserva_changelist'), {
+            'action': 'exportar_csv',
+            '_selected_action': list(Reserva.objects.values_list('id', flat=True)),
+        })
+
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('attachment; filename="reservas-', respuesta['Content-Disposition'])
+        lineas = list(csv.reader(StringIO(b''.join(respuesta.streaming_content).decode())))
+        self.assertEqual(lineas[0], exportacion.ENCABEZADOS)
+        self.assertEqual(len(lineas), 5)
+        self.assertIn(['Fútbol 5, Centro', 'futbol', '10.50'], [[fila[7], fila[8], fila[5]] for fila in lineas])
+
+    def test_jsonl_una_reserva_por_linea(self):
+        lineas = list(exportacion.lineas_jsonl(Reserva.objects.filter(cancha=self.tenis)))
+
+        self.assertEqual(len(lineas), 1)
+        fila = json.loads(lineas[0])
+        self.assertEqual((fila['cancha'], fila['usuario'], fila['total']), ('Tenis', 'admin', '5.00'))
+
+    def test_resumen_por_tipo_en_sql(self):
+        with self.assertNumQueries(1):
+            resumen = list(exportacion.resumen_ingresos(Reserva.objects.all(), 'tipo'))
+
+        self.assertEqual(
+            [(fila['cancha__tipo'], fila['reservas'], fila['ingresos']) for fila in resumen],
+            [('futbol', 2, Decimal('30.75')), ('tenis', 1, Decimal('5.00'))],
+        )
+
+    def test_comando_combina_reservas_archivadas(self):
+        Reserva.objects.filter(cancha=self.tenis).update(fecha=date.today() - timedelta(days=400))
+        for _ in archivo.archivar(horizonte=365):
+            pass
+        salida = StringIO()
+
+        call_command('exportar_reservas', resumen='cancha', archivadas=True, stdout=salida)
+
+        self.assertEqual(salida.getvalue().splitlines(), [
+            'cancha_id,nombre,tipo,reservas,ingresos',
+            f'{self.futbol.id},"Fútbol 5, Centro",futbol,2,30.75',
+            f'{self.tenis.id},Tenis,tenis,1,5.00',
+        ])
+
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    HILOS = 200
+    # Dos grupos de intervalos de una hora que empiezan cada 15 minutos: dentro
+    # de un grupo todos se solapan pero no comparten hora de inicio, así que
+    # solo el bloqueo de la franja (no la restricción única) evita el choque
+    GRUPOS = (17, 20)
+    DESFASES = (0, 15, 30, 45)
+
+    def intervalo(self, n):
+        grupo = self.GRUPOS[n % len(self.GRUPOS)]
+        minutos = self.DESFASES[n // len(self.GRUPOS) % len(self.DESFASES)]
+        inicio = time(grupo, minutos)
+        return inicio, time(grupo + 1, minutos)
+
+    def test_una_sola_reserva_gana_por_grupo_solapado(self):
+        cancha = crear_cancha()
+        fecha = date.today() + timedelta(days=7)
+        usuarios = [
+            User(username=f'usuario{n}', email=f'usuario{n}@test.com')
+            for n in range(self.HILOS)
+        ]
+        User.objects.bulk_create(usuarios)
+        usuarios = list(User.objects.order_by('id'))
+
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        errores = []
+
+        def intentar(n, usuario):
+            try:
+                barrera.wait()
+                inicio, fin = self.intervalo(n)
+                resultados.append(reservas.reservar(usuario, cancha, fecha, inicio, fin, 10))
+            except Exception as error:  # pragma: no cover - solo para el reporte
+                errores.append(error)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=intentar, args=(n, u)) for n, u in enumerate(usuarios)]
+        inicio = reloj.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = reloj.perf_counter() - inicio
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(resultados), self.HILOS)
+        self.assertEqual(sum(1 for r in resultados if r.exito), len(self.GRUPOS))
+
+        creadas = list(
+            Reserva.objects.filter(cancha=cancha, fecha=fecha)
+            .order_by('hora_inicio').values_list('hora_inicio', 'hora_fin')
+        )
+        self.assertEqual(len(creadas), len(self.GRUPOS))
+        # Una por grupo y sin solaparse entre sí
+        self.assertEqual([inicio.hour for inicio, _ in creadas], list(self.GRUPOS))
+        for (_, fin_anterior), (inicio_siguiente, _) in zip(creadas, creadas[1:]):
+            self.assertLessEqual(fin_anterior, inicio_siguiente)
+        logger.info(
+            '%s reservas concurrentes en %.2fs (%.0f intentos/s)',
+            self.HILOS, duracion, self.HILOS / duracion,
+        )
+
+
+class ListadoCanchasTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        Cancha.objects.bulk_create([
+            Cancha(
+                nombre=f'Cancha {n}', descripcion='x' * 1000, tipo='futbol',
+                ubicacion='Puerto Montt', precio_por_hora=10,
+            )
+            for n in range(30)
+        ])
+
+    def test_paginas_recorren_todo_el_catalogo(self):
+        vistos = []
+        cursor = None
+        while True:
+            parametros = {'cursor': cursor} if cursor else {}
+            # sesión + usuario + una consulta por página
+            with self.assertNumQueries(3):
+                datos = self.client.get(reverse('api_canchas'), parametros).json()
+            vistos.extend(cancha['id'] for cancha in datos['canchas'])
+            cursor = datos['siguiente']
+            if not cursor:
+                break
+
+        self.assertEqual(len(vistos), 30)
+        self.assertEqual(len(set(vistos)), 30)
+
+    def test_home_no_carga_descripcion_completa(self):
+        respuesta = self.client.get(reverse('booking_home'))
+
+        self.assertEqual(len(respuesta.context['canchas']), 12)
+        self.assertNotContains(respuesta, 'x' * 200)
+        self.assertContains(respuesta, 'Cargar más canchas')
+
+
+class VistasAsincronasTests(TestCase):
+    def setUp(self):
+        for alias in ('default', 'catalogo'):
+            caches[alias].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.cancha = crear_cancha()
+        self.manana = date.today() + timedelta(days=1)
+        Reserva.objects.create(
+            usuario=self.usuario, cancha=self.cancha, fecha=self.manana,
+            hora_inicio=time(10), hora_fin=time(11), total=10,
+        )
+
+    def test_horarios_igual_que_la_vista_sincrona(self):
+        parametros = {'fecha': self.manana.isoformat()}
+        sincrona = self.client.get(reverse('api_horarios', args=[self.cancha.id]), parametros)
+        caches['catalogo'].clear()
+        asincrona = self.client.get(reverse('api_horarios_async', args=[self.cancha.id]), parametros)
+
+        self.assertEqual(asincrona.json(), sincrona.json())
+        self.assertEqual(asincrona.json()['reservas_existentes'], [['10:00:00', '11:00:00']])
+        # Segunda petición: respuesta cacheada, sin SQL más allá de sesión,
+        # usuario y la marca de la cancha para el ETag
+        with self.assertNumQueries(3):
+            self.client.get(reverse('api_horarios_async', args=[self.cancha.id]), parametros)
+
+    def test_horarios_de_cancha_inexistente(self):
+        respuesta = self.client.get(reverse('api_horarios_async', args=[0]), {'fecha': '2030-01-01'})
+        self.assertEqual(respuesta.status_code, 404)
+
+    def test_catalogo_igual_que_la_vista_sincrona(self):
+        for n in range(15):
+            crear_cancha(f'Cancha {n}')
+        sincrona = self.client.get(reverse('api_canchas')).json()
+        asincrona = self.client.get(reverse('api_canchas_async')).json()
+
+        self.assertEqual(asincrona, sincrona)
+        siguiente = self.client.get(reverse('api_canchas_async'), {'cursor': asincrona['siguiente']}).json()
+        self.assertEqual(len(asincrona['canchas']) + len(siguiente['canchas']), 16)
+
+
+class BrokerDePrueba:
+    """Broker que solo registra lo publicado"""
+
+    def __init__(self, location=None):
+        self.publicados = []
+
+    def publicar(self, canal, evento):
+        self.publicados.append((canal, evento['tipo'], evento['hora_inicio']))
+
+
+class EventosDisponibilidadTests(TestCase):
+    def setUp(self):
+        for alias in ('default', 'catalogo'):
+            caches[alias].clear()
+        eventos._broker = None
+        self.addCleanup(setattr, eventos, '_broker', None)
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.manana = date.today() + timedelta(days=1)
+        self.canal = eventos.canal_disponibilidad(self.cancha.id, self.manana)
+
+    @override_settings(EVENTOS_BROKER={'BACKEND': 'Booking.tests.BrokerDePrueba'})
+    def test_senales_publican_ocupado_y_liberado_tras_el_commit(self):
+        broker = eventos.obtener_broker()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva = Reserva.objects.create(
+                usuario=self.usuario, cancha=self.cancha, fecha=self.manana,
+                hora_inicio=time(10), hora_fin=time(11), total=10,
+            )
+            self.assertEqual(broker.publicados, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.hora_inicio, reserva.hora_fin = time(12), time(13)
+            reserva.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            reserva.total = 20
+            reserva.save()
+            reserva = Reserva.objects.get(id=reserva.id)
+            reserva.estado = 'cancelada'
+            reserva.save()
+            reserva.delete()
+
+        self.assertEqual(broker.publicados, [
+            (self.canal, 'ocupado', '10:00'),
+            (self.canal, 'liberado', '10:00'),
+            (self.canal, 'ocupado', '12:00'),
+            (self.canal, 'liberado', '12:00'),
+        ])
+
+    async def test_broker_local_entrega_desde_otro_hilo(self):
+        broker = eventos.BrokerLocal()
+        async with broker.suscribir('canal') as suscripcion:
+            await asyncio.to_thread(broker.publicar, 'canal', {'tipo': 'ocupado'})
+            self.assertEqual(await suscripcion.recibir(timeout=1), {'tipo': 'ocupado'})
+            self.assertIsNone(await suscripcion.recibir(timeout=0.01))
+        self.assertEqual(broker.suscriptores('canal'), 0)
+
+    @override_settings(APIS_ASINCRONAS=True)
+    async def test_stream_envia_estado_y_cambios(self):
+        await self.async_client.aforce_login(self.usuario)
+        respuesta = await self.async_client.get(
+            reverse('api_eventos_disponibilidad', args=[self.cancha.id]),
+            {'fecha': self.manana.isoformat()},
+        )
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = aiter(respuesta.streaming_content)
+
+        self.assertEqual(await anext(flujo), b'retry: 3000\n')
+        estado = (await anext(flujo)).decode()
+        self.assertTrue(estado.startswith('event: estado\n'))
+        self.assertIn('"10:00"', estado)
+
+        eventos.publicar_franja('ocupado', 1, (self.cancha.id, self.manana, time(10), time(11)))
+        cambio = (await anext(flujo)).decode()
+        self.assertTrue(cambio.startswith('event: ocupado\n'))
+        self.assertIn('"hora_inicio": "10:00"', cambio)
+        await flujo.aclose()
+
+    def test_stream_requiere_asgi(self):
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(
+            reverse('api_eventos_disponibilidad', args=[self.cancha.id]),
+            {'fecha': self.manana.isoformat()},
+        )
+        self.assertEqual(respuesta.status_code, 503)
+
+
+class ResenasPaginadasTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.cancha = crear_cancha()
+        for n in range(25):
+            otro = User.objects.create_user(f'usuario{n}', f'usuario{n}@test.com', 'clave-segura')
+            Resena.objects.create(cancha=self.cancha, usuario=otro, calificacion=5 if n % 5 else 2)
+        self.url = reverse('api_resenas', args=[self.cancha.id])
+
+    def recorrer(self, **parametros):
+        vistos = []
+        cursor = None
+        while True:
+            if cursor:
+                parametros['cursor'] = cursor
+            datos = self.client.get(self.url, parametros).json()
+            vistos.extend(resena['usuario'] for resena in datos['resenas'])
+            cursor = datos['siguiente']
+            if not cursor:
+                return datos['total'], vistos
+
+    def test_paginas_recorren_todas_las_resenas(self):
+        total, vistos = self.recorrer()
+
+        self.assertEqual(total, 25)
+        self.assertEqual(len(set(vistos)), 25)
+        self.assertEqual(vistos[0], 'usuario24')
+
+    def test_filtro_por_calificacion(self):
+        total, vistos = self.recorrer(calificacion=2)
+
+        self.assertEqual(total, 5)
+        self.assertEqual(vistos, [f'usuario{n}' for n in (20, 15, 10, 5, 0)])
+
+    def test_calificacion_sin_resenas_no_consulta_resenas(self):
+        # sesión + usuario + cancha
+        with self.assertNumQueries(3):
+            datos = self.client.get(self.url, {'calificacion': 1}).json()
+        self.assertEqual(datos['resenas'], [])
+
+    def test_detalle_muestra_primera_pagina(self):
+        respuesta = self.client.get(reverse('detalle_cancha', args=[self.cancha.id]))
+
+        self.assertContains(respuesta, 'usuario24')
+        self.assertNotContains(respuesta, 'usuario19<')
+        self.assertContains(respuesta, 'Ver más reseñas')
+
+
+class BusquedaCanchasTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.padel = crear_cancha('Pádel Center Belgrano', tipo='padel', ubicacion='Belgrano, CABA')
+        self.tenis = crear_cancha('Tenis Club Palermo', tipo='tenis', ubicacion='Palermo, CABA')
+
+    def buscar(self, texto):
+        respuesta = self.client.get(reverse('booking_home'), {'busqueda': texto})
+        return [cancha.id for cancha in respuesta.context['canchas']]
+
+    def test_busqueda_ignora_acentos(self):
+        self.assertEqual(self.buscar('padel'), [self.padel.id])
+        self.assertEqual(self.buscar('PÁDEL belgrano'), [self.padel.id])
+
+    def test_busqueda_por_prefijo(self):
+        self.assertEqual(self.buscar('Paler'), [self.tenis.id])
+
+    def test_indice_sigue_los_cambios(self):
+        self.tenis.nombre = 'Club Norte'
+        self.tenis.save()
+        self.padel.delete()
+
+        self.assertEqual(self.buscar('tenis'), [])
+        self.assertEqual(self.buscar('padel'), [])
+        self.assertEqual(self.buscar('norte'), [self.tenis.id])
+
+    def test_texto_con_operadores_no_rompe_la_consulta(self):
+        self.assertEqual(self.buscar('"padel" (belgrano*'), [self.padel.id])
+
+    def crear_muchas_padel(self, cantidad):
+        Cancha.objects.bulk_create([
+            Cancha(nombre=f'Padel {n}', descripcion='Cancha de pádel', tipo='padel',
+                   ubicacion='Palermo, CABA', precio_por_hora=10)
+            for n in range(cantidad)
+        ])
+
+    def recorrer(self, url, **parametros):
+        ids, cursor = [], None
+        while True:
+            if cursor:
+                parametros['cursor'] = cursor
+            datos = self.client.get(url, parametros).json()
+            ids += [cancha['id'] for cancha in datos['canchas']]
+            cursor = datos['siguiente']
+            if not cursor:
+                return ids
+
+    def test_filtros_se_aplican_antes_del_limite(self):
+        self.crear_muchas_padel(70)
+        futbol = crear_cancha('Complejo Sur', descripcion='También alquilamos paletas de padel')
+
+        respuesta = self.client.get(reverse('booking_home'), {'busqueda': 'padel', 'tipo': 'futbol'})
+
+        self.assertEqual([cancha.id for cancha in respuesta.context['canchas']], [futbol.id])
+
+    def test_paginacion_recorre_todas_las_coincidencias(self):
+        self.crear_muchas_padel(70)
+        esperados = set(Cancha.objects.filter(tipo='padel').values_list('id', flat=True))
+
+        for url in (reverse('api_canchas'), reverse('api_canchas_async')):
+            with self.subTest(url=url):
+                ids = self.recorrer(url, busqueda='padel')
+                self.assertEqual(len(ids), len(esperados))
+                self.assertEqual(set(ids), esperados)
+
+    def test_cursor_invalido_vuelve_a_la_primera_pagina(self):
+        datos = self.client.get(reverse('api_canchas'), {'busqueda': 'padel', 'cursor': 'no-es-un-cursor'}).json()
+
+        self.assertEqual([cancha['id'] for cancha in datos['canchas']], [self.padel.id])
+
+
+class AgregadosResenasTests(TestCase):
+    def setUp(self):
+        self.cancha = crear_cancha()
+        self.usuarios = [
+            User.objects.create_user(f'usuario{n}', f'usuario{n}@test.com', 'clave-segura')
+            for n in range(3)
+        ]
+
+    def assertAgregados(self, total, suma, calificacion, histograma):
+        self.cancha.refresh_from_db()
+        self.assertEqual(self.cancha.total_resenas, total)
+        self.assertEqual(self.cancha.suma_calificaciones, suma)
+        self.assertEqual(self.cancha.calificacion, calificacion)
+        self.assertEqual(self.cancha.histograma_estrellas(), histograma)
+
+    def test_alta_edicion_y_baja(self):
+        primera = Resena.objects.create(cancha=self.cancha, usuario=self.usuarios[0], calificacion=5)
+        Resena.objects.create(cancha=self.cancha, usuario=self.usuarios[1], calificacion=4)
+        Resena.objects.create(cancha=self.cancha, usuario=self.usuarios[2], calificacion=4)
+        self.assertAgregados(3, 13, 4.3, {5: 1, 4: 2, 3: 0, 2: 0, 1: 0})
+
+        primera.calificacion = 1
+        primera.save()
+        self.assertAgregados(3, 9, 3.0, {5: 0, 4: 2, 3: 0, 2: 0, 1: 1})
+
+        Resena.objects.filter(cancha=self.cancha).delete()
+        self.assertAgregados(0, 0, 0.0, {5: 0, 4: 0, 3: 0, 2: 0, 1: 0})
+
+    def test_recalcular_repara_agregados(self):
+        Resena.objects.create(cancha=self.cancha, usuario=self.usuarios[0], calificacion=2)
+        Resena.objects.create(cancha=self.cancha, usuario=self.usuarios[1], calificacion=5)
+        antes = timezone.now() - timedelta(days=1)
+        Cancha.objects.update(
+            total_resenas=0, suma_calificaciones=0, calificacion=0, estrellas_5=9, actualizado=antes,
+        )
+
+        with self.assertNumQueries(1):
+            recalcular_todas()
+
+        self.assertAgregados(2, 7, 3.5, {5: 1, 4: 0, 3: 0, 2: 1, 1: 0})
+        # La marca nueva invalida las tarjetas cacheadas y el ETag del detalle
+        self.assertGreater(self.cancha.actualizado, antes)
+
+
+class CacheCatalogoTests(TestCase):
+    def setUp(self):
+        for alias in ('default', 'catalogo'):
+            caches[alias].clear()
+        cache_catalogo.reiniciar_estadisticas()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.cancha = crear_cancha()
+        self.fecha = date.today() + timedelta(days=7)
+        self.url = reverse('api_horarios', args=[self.cancha.id])
+
+    def test_json_de_disponibilidad_se_invalida_al_reservar(self):
+        primera = self.client.get(self.url, {'fecha': self.fecha}).json()
+        segunda = self.client.get(self.url, {'fecha': self.fecha}).json()
+        self.assertEqual(primera, segunda)
+
+        # El índice de disponibilidad se actualiza tras el commit
+        with self.captureOnCommitCallbacks(execute=True):
+            reservas.reservar(self.usuario, self.cancha, self.fecha, time(10), time(11), 10)
+        tercera = self.client.get(self.url, {'fecha': self.fecha}).json()
+
+        self.assertEqual(tercera['reservas_existentes'], [['10:00:00', '11:00:00']])
+        estadisticas = cache_catalogo.estadisticas()['vista.obtener_horarios_disponibles']
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos']), (1, 2))
+
+    def test_tarjeta_cambia_al_editar_la_cancha(self):
+        self.client.get(reverse('booking_home'))
+        self.cancha.nombre = 'Cancha Renovada'
+        self.cancha.save()
+
+        self.assertContains(self.client.get(reverse('booking_home')), 'Cancha Renovada')
+
+    def test_bloque_de_resenas_cambia_al_editar_comentario(self):
+        url = reverse('detalle_cancha', args=[self.cancha.id])
+        resena = Resena.objects.create(
+            cancha=self.cancha, usuario=self.usuario, calificacion=4, comentario='Muy buena'
+        )
+        self.assertContains(self.client.get(url), 'Muy buena')
+
+        resena.comentario = 'Excelente'
+        with self.captureOnCommitCallbacks(execute=True):
+            resena.save()
+
+        self.assertContains(self.client.get(url), 'Excelente', count=2)
+
+
+class CacheCatalogoTransaccionTests(TransactionTestCase):
+    """Lecturas que llegan entre el guardado y el commit de una reserva"""
+
+    def setUp(self):
+        for alias in ('default', 'catalogo'):
+            caches[alias].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.fecha = date.today() + timedelta(days=7)
+        self.url = reverse('api_horarios', args=[self.cancha.id])
+        # La sesión se crea aquí: el lector en medio de la transacción solo lee
+        self.client.force_login(self.usuario)
+
+    def pedir(self):
+        return self.client.get(self.url, {'fecha': self.fecha})
+
+    def pedir_desde_otra_conexion(self):
+        respuestas = []
+
+        def pedir():
+            try:
+                respuestas.append(self.pedir())
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=pedir)
+        hilo.start()
+        hilo.join()
+        return respuestas[0]
+
+    def test_lectura_antes_del_commit_no_queda_cacheada(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # La base en memoria compartida bloquea la tabla ante otra conexión
+            self.skipTest('Requiere una base que admita lecturas durante una escritura')
+        self.assertEqual(self.pedir().json()['reservas_existentes'], [])
+
+        with transaction.atomic():
+            Reserva.objects.create(
+                usuario=self.usuario, cancha=self.cancha, fecha=self.fecha,
+                hora_inicio=time(9), hora_fin=time(10), total=10, estado='confirmada',
+            )
+            # Otra conexión todavía no ve la reserva
+            en_medio = self.pedir_desde_otra_conexion()
+            self.assertEqual(en_medio.json()['reservas_existentes'], [])
+
+        despues = self.pedir()
+        self.assertEqual(despues.json()['reservas_existentes'], [['09:00:00', '10:00:00']])
+        self.assertNotIn('09:00', despues.json()['bloques_disponibles'])
+        # Ni el ETag de la lectura intermedia sirve para el cuerpo nuevo
+        self.assertNotEqual(despues['ETag'], en_medio['ETag'])
+
+    def test_lectura_entre_las_senales_y_el_commit(self):
+        # Lo mismo en una sola conexión: las señales corren como al guardar,
+        # pero la fila aún no está en la base, como la ve otra conexión antes
+        # del commit; bulk_create la inserta después sin volver a dispararlas
+        self.assertEqual(self.pedir().json()['reservas_existentes'], [])
+
+        with transaction.atomic():
+            reserva = Reserva(
+                id=1000, usuario=self.usuario, cancha=self.cancha, fecha=self.fecha,
+                hora_inicio=time(9), hora_fin=time(10), total=10, estado='confirmada',
+            )
+            post_save.send(Reserva, instance=reserva, created=True)
+            en_medio = self.pedir()
+            self.assertEqual(en_medio.json()['reservas_existentes'], [])
+            Reserva.objects.bulk_create([reserva])
+
+        despues = self.pedir()
+        self.assertEqual(despues.json()['reservas_existentes'], [['09:00:00', '10:00:00']])
+        self.assertNotEqual(despues['ETag'], en_medio['ETag'])
+        # Los sondeos con el ETag de la lectura intermedia reciben el cuerpo nuevo
+        self.assertEqual(self.client.get(
+            self.url, {'fecha': self.fecha}, HTTP_IF_NONE_MATCH=en_medio['ETag']
+        ).status_code, 200)
+
+
+class IndicesReservaTests(TestCase):
+    """Las consultas frecuentes sobre Reserva deben resolverse con un índice"""
+
+    def setUp(self):
+        self.hoy = date.today()
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsaIndice(self, queryset, *indices):
+        plan = queryset.explain()
+        tabla = Reserva._meta.db_table
+        if connection.vendor == 'sqlite':
+            self.assertNotRegex(plan, rf'SCAN {tabla}(?! USING)', plan)
+        elif connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on "{tabla}"', plan, plan)
+        self.assertTrue(any(indice in plan for indice in indices), plan)
+
+    def test_conflicto_de_horario(self):
+        self.assertUsaIndice(
+            Reserva.objects.filter(
+                cancha_id=1, fecha=self.hoy, estado__in=Reserva.ESTADOS_ACTIVOS,
+            ).filter(hora_inicio__lt=time(11), hora_fin__gt=time(10)),
+            'reserva_conflicto_idx',
+        )
+
+    def test_disponibilidad_de_varias_canchas(self):
+        self.assertUsaIndice(
+            Reserva.objects.filter(
+                cancha__in=[1, 2], fecha__range=(self.hoy, self.hoy + timedelta(days=7)),
+                estado__in=Reserva.ESTADOS_ACTIVOS,
+            ).order_by(),
+            'reserva_conflicto_idx', 'reserva_estado_fecha_idx',
+        )
+
+    def test_mis_reservas_proximas(self):
+        self.assertUsaIndice(
+            Reserva.objects.filter(
+                usuario_id=1, fecha__gte=self.hoy, estado__in=Reserva.ESTADOS_ACTIVOS,
+            ).order_by('fecha', 'hora_inicio'),
+            'reserva_usuario_fecha_idx',
+        )
+
+    def test_mis_reservas_historial(self):
+        self.assertUsaIndice(
+            Reserva.objects.filter(
+                usuario_id=1, estado__in=['completada', 'cancelada'],
+            ).order_by('-fecha'),
+            'reserva_usuario_fecha_idx',
+        )
+
+    def test_filtro_admin_por_estado_y_fecha(self):
+        self.assertUsaIndice(
+            Reserva.objects.filter(estado='confirmada', fecha__gte=self.hoy),
+            'reserva_estado_fecha_idx',
+        )
+
+
+class PresupuestoConsultasTests(TestCase):
+    """El número de consultas no debe crecer con la cantidad de filas"""
+
+    def setUp(self):
+        for alias in ('default', 'catalogo'):
+            caches[alias].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.cancha = crear_cancha()
+
+    def test_mis_reservas(self):
+        hoy = date.today()
+        for n in range(20):
+            cancha = crear_cancha(f'Cancha {n}')
+            Reserva.objects.create(
+                usuario=self.usuario, cancha=cancha, fecha=hoy + timedelta(days=n - 10),
+                hora_inicio=time(10), hora_fin=time(11), total=10, estado='confirmada',
+            )
+        for _ in estados.completar_terminadas():
+            pass
+
+        # sesión + usuario + reservas (el historial también lee las archivadas)
+        for tab, esperada, consultas in (('proximas', 'Cancha 15', 3), ('historial', 'Cancha 5', 4)):
+            with self.assertNumQueries(consultas):
+                respuesta = self.client.get(reverse('mis_reservas'), {'tab': tab})
+            self.assertContains(respuesta, esperada)
+
+    def test_detalle_cancha(self):
+        for n in range(10):
+            otro = User.objects.create_user(f'usuario{n}', f'usuario{n}@test.com', 'clave-segura')
+            Resena.objects.create(cancha=self.cancha, usuario=otro, calificacion=4)
+        Resena.objects.create(cancha=self.cancha, usuario=self.usuario, calificacion=5, comentario='Mía')
+        url = reverse('detalle_cancha', args=[self.cancha.id])
+
+        # sesión + usuario + marca de la cancha para el ETag + cancha (con la
+        # reseña propia) + horarios + reseñas + tarifas y precio base para
+        # compilar la tabla de precios
+        with self.assertNumQueries(8):
+            respuesta = self.client.get(url)
+        self.assertContains(respuesta, 'usuario9')
+        self.assertContains(respuesta, 'Tu reseña')
+
+        # Con el bloque de reseñas en caché ya no se consultan
+        with self.assertNumQueries(5):
+            self.client.get(url)
+
+    @override_settings(CONSULTAS_MAXIMAS_POR_REQUEST=2)
+    def test_middleware_avisa_de_consultas_repetidas(self):
+        def vista(request):
+            for cancha_id in range(3):
+                Cancha.objects.filter(id=cancha_id).exists()
+            return HttpResponse()
+
+        with self.assertLogs('Booking.consultas', 'WARNING') as registro:
+            respuesta = DetectorConsultasMiddleware(vista)(RequestFactory().get('/'))
+
+        self.assertEqual(respuesta['X-Consultas-SQL'], '3')
+        self.assertEqual(len(registro.output), 2)
+
+
+class BackendQueFalla(EmailBackend):
+    """Rechaza los correos dirigidos a @rechazado.com"""
+
+    def send_messages(self, messages):
+        if any(to.endswith('@rechazado.com') for message in messages for to in message.to):
+            raise smtplib.SMTPRecipientsRefused({})
+        return super().send_messages(messages)
+
+
+class ColaCorreosTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+
+    def test_contacto_encola_sin_enviar(self):
+        self.client.post(reverse('contacto'), {
+            'nombre': 'Ana', 'email': 'ana@test.com', 'mensaje': 'Hola',
+        })
+
+        self.assertEqual(len(mail.outbox), 0)
+        correo = Correo.objects.get()
+        self.assertEqual(correo.destinatarios, ['soporte@reservacanchas.com'])
+        self.assertEqual(correos.procesar_lote(), (1, 1))
+        self.assertEqual(mail.outbox[0].from_email, 'ana@test.com')
+        correo.refresh_from_db()
+        self.assertEqual(correo.estado, 'enviado')
+
+    def test_contacto_sin_mensaje(self):
+        respuesta = self.client.post(reverse('contacto'), {'nombre': 'Ana', 'email': 'ana@test.com'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(Correo.objects.get().mensaje, '')
+
+    def test_un_correo_invalido_no_frena_el_lote(self):
+        self.client.post(reverse('contacto'), {
+            'nombre': 'Ana\nBcc: otro@test.com', 'email': 'ana@test.com', 'mensaje': 'Hola',
+        })
+        malo = Correo.objects.get()
+        for n in range(2):
+            correos.encolar('Aviso', 'x', [f'u{n}@test.com'])
+
+        self.assertEqual(correos.procesar_lote(), (3, 2))
+        self.assertEqual(len(mail.outbox), 2)
+        malo.refresh_from_db()
+        self.assertEqual((malo.estado, malo.intentos, malo.reclamado_por), ('pendiente', 1, ''))
+        self.assertIn('BadHeaderError', malo.ultimo_error)
+        self.assertEqual(Correo.objects.filter(estado='enviado', reclamado_por='').count(), 2)
+
+    def test_reserva_y_cancelacion_encolan_avisos(self):
+        cancha = crear_cancha()
+        manana = date.today() + timedelta(days=1)
+        self.client.post(reverse('crear_reserva', args=[cancha.id]), {
+            'fecha': manana.isoformat(), 'hora_inicio': '10:00', 'hora_fin': '11:00',
+        })
+        reserva = Reserva.objects.get()
+        self.client.post(reverse('cancelar_reserva', args=[reserva.id]))
+
+        correos.procesar_lote()
+        self.assertEqual(
+            [correo.subject for correo in mail.outbox],
+            ['Reserva confirmada: Cancha Test', 'Reserva cancelada: Cancha Test'],
+        )
+        self.assertIn('10:00 - 11:00', mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].to, ['ana@test.com'])
+
+    def test_lote_reclamado_no_se_vuelve_a_tomar(self):
+        for n in range(5):
+            correos.encolar('Aviso', 'x', [f'u{n}@test.com'])
+
+        primero = correos.tomar_lote(3)
+        segundo = correos.tomar_lote(3)
+
+        self.assertEqual(len(primero), 3)
+        self.assertEqual(len(segundo), 2)
+        self.assertFalse({c.id for c in primero} & {c.id for c in segundo})
+        self.assertEqual(correos.tomar_lote(3), [])
+
+    @override_settings(EMAIL_BACKEND='Booking.tests.BackendQueFalla')
+    def test_fallos_se_reintentan_con_espera(self):
+        correos.encolar('Aviso', 'x', ['bien@test.com'])
+        fallido = correos.encolar('Aviso', 'x', ['alguien@rechazado.com'])
+
+        self.assertEqual(correos.procesar_lote(), (2, 1))
+        fallido.refresh_from_db()
+        self.assertEqual(fallido.estado, 'pendiente')
+        self.assertEqual(fallido.intentos, 1)
+        self.assertGreater(fallido.proximo_intento, timezone.now())
+        # Hasta que vence la espera no se vuelve a tomar
+        self.assertEqual(correos.procesar_lote(), (0, 0))
+
+        for _ in range(correos.MAX_INTENTOS - 1):
+            Correo.objects.filter(id=fallido.id).update(proximo_intento=timezone.now())
+            correos.procesar_lote()
+        fallido.refresh_from_db()
+        self.assertEqual(fallido.estado, 'fallido')
+        self.assertIn('SMTPRecipientsRefused', fallido.ultimo_error)
+
+
+@override_settings(LIMITES_TASA={'login': (2, 1), 'reserva': (2, 1), 'horarios': (3, 6)})
+class LimitesTasaTests(TestCase):
+    def setUp(self):
+        limites.obtener_almacen().reiniciar()
+        caches['catalogo'].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.cancha = crear_cancha()
+        self.parametros = {'fecha': (date.today() + timedelta(days=1)).isoformat()}
+
+    def tearDown(self):
+        limites.obtener_almacen().reiniciar()
+
+    def test_balde_se_vacia_y_se_repone(self):
+        almacen = limites.AlmacenLocal()
+        with mock.patch.object(limites.reloj, 'monotonic', return_value=100.0) as monotonic:
+            self.assertEqual(almacen.consumir('x', 2, 1), 0)
+            self.assertEqual(almacen.consumir('x', 2, 1), 0)
+            self.assertEqual(almacen.consumir('x', 2, 1), 1)
+            monotonic.return_value = 100.5
+            self.assertEqual(almacen.consumir('x', 2, 1), 0.5)
+            monotonic.return_value = 101.5
+            self.assertEqual(almacen.consumir('x', 2, 1), 0)
+            # Otra clave tiene su propio balde
+            self.assertEqual(almacen.consumir('y', 2, 1), 0)
+
+    def test_almacen_local_descarta_los_baldes_mas_antiguos(self):
+        almacen = limites.AlmacenLocal(maximo=2)
+        for clave in 'abc':
+            almacen.consumir(clave, 1, 1)
+        self.assertEqual(list(almacen._baldes), ['b', 'c'])
+
+    def test_almacen_cache_comparte_los_baldes(self):
+        caches['default'].clear()
+        primero, segundo = limites.AlmacenCache(), limites.AlmacenCache()
+        self.assertEqual(primero.consumir('x', 1, 1), 0)
+        self.assertGreater(segundo.consumir('x', 1, 1), 0)
+
+    def test_horarios_responde_429_sin_consultar_la_base(self):
+        self.client.force_login(self.usuario)
+        url = reverse('api_horarios', args=[self.cancha.id])
+        for _ in range(3):
+            self.assertEqual(self.client.get(url, self.parametros).status_code, 200)
+
+        # Sin fichas en la IP se rechaza antes de leer la sesión o la cancha
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(url, self.parametros)
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertFalse(respuesta.json()['success'])
+        self.assertEqual(respuesta['Retry-After'], '10')
+
+    def test_limites_desactivados(self):
+        self.client.force_login(self.usuario)
+        url = reverse('api_horarios', args=[self.cancha.id])
+        with self.settings(LIMITES_TASA_ACTIVOS=False):
+            for _ in range(5):
+                self.assertEqual(self.client.get(url, self.parametros).status_code, 200)
+
+    def test_balde_por_usuario_aunque_cambie_la_ip(self):
+        self.client.force_login(self.usuario)
+        url = reverse('api_horarios', args=[self.cancha.id])
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.assertEqual(self.client.get(url, self.parametros, REMOTE_ADDR=ip).status_code, 200)
+        self.assertEqual(self.client.get(url, self.parametros, REMOTE_ADDR='10.0.0.4').status_code, 429)
+
+        otro = User.objects.create_user('beto', 'beto@test.com', 'clave-segura')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(url, self.parametros, REMOTE_ADDR='10.0.0.5').status_code, 200)
+
+    def test_vista_asincrona(self):
+        self.client.force_login(self.usuario)
+        url = reverse('api_horarios_async', args=[self.cancha.id])
+        codigos = [self.client.get(url, self.parametros).status_code for _ in range(4)]
+        self.assertEqual(codigos, [200, 200, 200, 429])
+
+    def test_crear_reserva(self):
+        self.client.force_login(self.usuario)
+        url = reverse('crear_reserva', args=[self.cancha.id])
+        datos = {'fecha': self.parametros['fecha'], 'hora_inicio': '10:00', 'hora_fin': '11:00'}
+        self.client.post(url, datos)
+        self.client.post(url, datos)
+        self.assertEqual(self.client.post(url, datos).status_code, 429)
+        self.assertEqual(Reserva.objects.count(), 1)
+
+    def test_login_limitado_por_correo_antes_de_calcular_hashes(self):
+        url = reverse('autenticacion')
+        # Solo cuentan los POST
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        datos = {'action': 'login', 'email': 'ana@test.com', 'password': 'otra-clave'}
+        for ip, email in (('10.0.0.1', 'ana@test.com'), ('10.0.0.2', ' ANA@test.com')):
+            respuesta = self.client.post(url, {**datos, 'email': email}, REMOTE_ADDR=ip)
+            self.assertContains(respuesta, 'Contraseña incorrecta')
+
+        with mock.patch('Autenticacion.views.authenticate') as authenticate, self.assertNumQueries(0):
+            respuesta = self.client.post(url, datos, REMOTE_ADDR='10.0.0.3')
+        self.assertEqual(respuesta.status_code, 429)
+        authenticate.assert_not_called()
+        # Otro correo desde otra IP sigue pudiendo entrar
+        datos = {'action': 'login', 'email': 'beto@test.com', 'password': 'x'}
+        self.assertEqual(self.client.post(url, datos, REMOTE_ADDR='10.0.0.4').status_code, 200)
+
+
+def imagen_subida(nombre='foto.jpg', tamano=(1600, 900), color='green', formato='JPEG'):
+    contenido = BytesIO()
+    Image.new('RGB', tamano, color).save(contenido, formato)
+    return SimpleUploadedFile(nombre, contenido.getvalue())
+
+
+class ImagenesCanchaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.cancha = crear_cancha()
+
+    def subir(self, cancha, **kwargs):
+        with mock.patch.object(imagenes, 'encolar') as encolar, self.captureOnCommitCallbacks(execute=True):
+            cancha.imagen = imagen_subida(**kwargs)
+            cancha.save()
+        return encolar
+
+    def test_subir_imagen_encola_las_variantes_tras_el_commit(self):
+        self.subir(self.cancha).assert_called_once_with(self.cancha.id)
+
+        # Guardar sin cambiar la imagen no vuelve a procesarla
+        cancha = Cancha.objects.get(id=self.cancha.id)
+        with mock.patch.object(imagenes, 'encolar') as encolar, self.captureOnCommitCallbacks(execute=True):
+            cancha.nombre = 'Otro nombre'
+            cancha.save()
+        encolar.assert_not_called()
+
+    def test_variantes_con_nombre_por_contenido_sin_agrandar(self):
+        self.subir(self.cancha, tamano=(800, 450))
+        variantes = imagenes.generar(self.cancha.imagen.name)
+
+        self.assertEqual((variantes['ancho'], variantes['alto']), (800, 450))
+        self.assertEqual([ancho for ancho, _ in variantes['variantes']['webp']], [320, 640, 800])
+        for formato, extension in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            for ancho, nombre in variantes['variantes'][formato]:
+                with Image.open(f'{self.media}/{nombre}') as imagen:
+                    self.assertEqual(imagen.format, extension)
+                    self.assertEqual(imagen.size[0], ancho)
+
+        # La misma imagen subida de nuevo reutiliza los archivos ya generados
+        otra = crear_cancha('Otra')
+        self.subir(otra, tamano=(800, 450))
+        with mock.patch.object(imagenes, '_codificar') as codificar:
+            self.assertEqual(imagenes.generar(otra.imagen.name)['variantes'], variantes['variantes'])
+        codificar.assert_not_called()
+
+    def test_procesar_cancha_y_srcset_en_la_plantilla(self):
+        self.subir(self.cancha)
+        plantilla = Template("{% load imagenes %}{% imagen_cancha cancha '50vw' 'foto' %}")
+        cancha = Cancha.objects.get(id=self.cancha.id)
+        self.assertInHTML(
+            f'<img src="{cancha.imagen.url}" alt="Cancha Test" class="foto" loading="lazy">',
+            plantilla.render(Context({'cancha': cancha})),
+        )
+
+        self.assertTrue(imagenes.procesar_cancha(self.cancha.id))
+        cancha = Cancha.objects.get(id=self.cancha.id)
+        self.assertGreater(cancha.actualizado, self.cancha.actualizado)
+        html = plantilla.render(Context({'cancha': cancha}))
+        self.assertIn('<source type="image/webp" srcset="/media/canchas/variantes/', html)
+        self.assertRegex(html, r'srcset="[^"]*-320\.jpeg 320w, [^"]*-640\.jpeg 640w, [^"]*-1280\.jpeg 1280w"')
+
+        # Las variantes de una imagen anterior no se usan
+        self.subir(cancha, color='red')
+        self.assertIsNone(imagenes.vigentes(cancha))
+
+    def test_guardar_descarta_variantes_de_otra_imagen(self):
+        self.subir(self.cancha)
+        variantes = imagenes.generar(self.cancha.imagen.name)
+        self.subir(self.cancha, color='red')
+
+        self.assertFalse(imagenes.guardar(self.cancha.id, variantes))
+        self.assertEqual(Cancha.objects.get(id=self.cancha.id).imagen_variantes, {})
+
+    def test_comando_genera_las_pendientes_en_paralelo(self):
+        self.subir(self.cancha)
+        otra = crear_cancha('Otra')
+        self.subir(otra, nombre='roto.jpg')
+        with open(f'{self.media}/{otra.imagen.name}', 'wb') as archivo:
+            archivo.write(b'no es una imagen')
+
+        salida, errores = StringIO(), StringIO()
+        call_command('generar_variantes', procesos=2, stdout=salida, stderr=errores)
+
+        self.assertIn('Variantes de 1 imágenes (1 con error)', salida.getvalue())
+        self.assertIn(f'cancha {otra.id}', errores.getvalue())
+        self.assertEqual(imagenes.pendientes(), [(otra.id, otra.imagen.name)])
+
+
+class EstaticosProduccionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static = tempfile.mkdtemp()
+        cls.media = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.static)
+        cls.addClassCleanup(shutil.rmtree, cls.media)
+        ajustes = override_settings(
+            STATIC_ROOT=cls.static, MEDIA_ROOT=cls.media,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'Booking.estaticos.AlmacenComprimido'},
+            },
+        )
+        ajustes.enable()
+        cls.addClassCleanup(ajustes.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        os.makedirs(f'{cls.media}/canchas/variantes')
+        for nombre in ('canchas/foto.jpg', 'canchas/variantes/abc-320.webp'):
+            with open(f'{cls.media}/{nombre}', 'wb') as archivo:
+                archivo.write(bytes(range(256)) * 4)
+
+    def setUp(self):
+        self.django = mock.Mock(return_value=[b'django'])
+        self.servidor = estaticos.ServidorEstaticos(self.django)
+
+    def pedir(self, ruta, metodo='GET', **cabeceras):
+        respuesta = {}
+
+        def start_response(estado, encabezados):
+            respuesta['estado'] = int(estado.split()[0])
+            respuesta['cabeceras'] = dict(encabezados)
+
+        cuerpo = self.servidor({'REQUEST_METHOD': metodo, 'PATH_INFO': ruta, **cabeceras}, start_response)
+        respuesta['cuerpo'] = b''.join(cuerpo)
+        getattr(cuerpo, 'close', lambda: None)()
+        return respuesta
+
+    def test_collectstatic_deja_copias_gzip_con_hash(self):
+        hasheado = estaticos.staticfiles_storage.stored_name('admin/css/base.css')
+        self.assertRegex(hasheado, r'^admin/css/base\.[0-9a-f]{12}\.css$')
+        with open(f'{self.static}/{hasheado}', 'rb') as original, open(f'{self.static}/{hasheado}.gz', 'rb') as copia:
+            contenido = original.read()
+            self.assertEqual(gzip.decompress(copia.read()), contenido)
+
+        respuesta = self.pedir(f'/static/{hasheado}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(respuesta['cabeceras']['Content-Encoding'], 'gzip')
+        self.assertEqual(respuesta['cabeceras']['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(respuesta['cuerpo']), contenido)
+
+        # El original sin hash se cachea poco
+        respuesta = self.pedir('/static/admin/css/base.css', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', respuesta['cabeceras'])
+        self.assertEqual(respuesta['cabeceras']['Cache-Control'], 'public, max-age=60')
+        with open(f'{self.static}/admin/css/base.css', 'rb') as original:
+            self.assertEqual(respuesta['cuerpo'], original.read())
+        self.django.assert_not_called()
+
+    def test_etag_y_if_modified_since(self):
+        respuesta = self.pedir('/static/admin/css/base.css')
+        etag, modificado = respuesta['cabeceras']['ETag'], respuesta['cabeceras']['Last-Modified']
+
+        for cabeceras in ({'HTTP_IF_NONE_MATCH': f'"otro", W/{etag}'}, {'HTTP_IF_MODIFIED_SINCE': modificado}):
+            respuesta = self.pedir('/static/admin/css/base.css', **cabeceras)
+            self.assertEqual(respuesta['estado'], 304)
+            self.assertEqual(respuesta['cuerpo'], b'')
+        self.assertEqual(self.pedir('/static/admin/css/base.css', HTTP_IF_NONE_MATCH='"otro"')['estado'], 200)
+
+    def test_rangos(self):
+        contenido = bytes(range(256)) * 4
+        for rango, estado, cuerpo in (
+            ('bytes=10-19', 206, contenido[10:20]),
+            ('bytes=1000-', 206, contenido[1000:]),
+            ('bytes=-5', 206, contenido[-5:]),
+            ('bytes=5000-', 416, b''),
+            ('items=1-2', 200, contenido),
+        ):
+            with self.subTest(rango=rango):
+                respuesta = self.pedir('/media/canchas/foto.jpg', HTTP_RANGE=rango)
+                self.assertEqual((respuesta['estado'], respuesta['cuerpo']), (estado, cuerpo))
+        self.assertEqual(
+            self.pedir('/media/canchas/foto.jpg', HTTP_RANGE='bytes=10-19')['cabeceras']['Content-Range'],
+            'bytes 10-19/1024',
+        )
+        # If-Range con otro ETag: el archivo cambió, se responde completo
+        respuesta = self.pedir('/media/canchas/foto.jpg', HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"viejo"')
+        self.assertEqual(respuesta['estado'], 200)
+
+    def test_usa_file_wrapper_para_sendfile(self):
+        envuelto = []
+
+        def file_wrapper(archivo, bloque):
+            envuelto.append(archivo)
+            return iter(lambda: archivo.read(bloque), b'')
+
+        cuerpo = self.servidor({
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': '/media/canchas/foto.jpg', 'HTTP_RANGE': 'bytes=100-199',
+            'wsgi.file_wrapper': file_wrapper,
+        }, lambda estado, cabeceras: None)
+
+        self.assertEqual(b''.join(cuerpo), (bytes(range(256)) * 4)[100:200])
+        self.assertIsInstance(envuelto[0].fileno(), int)
+        envuelto[0].close()
+
+    def test_media_y_rutas_que_no_son_archivos_pasan_a_django(self):
+        self.assertEqual(
+            self.pedir('/media/canchas/variantes/abc-320.webp')['cabeceras']['Cache-Control'],
+            'public, max-age=31536000, immutable',
+        )
+        for ruta, metodo in (
+            ('/media/../db.sqlite3', 'GET'),
+            ('/media/canchas/', 'GET'),
+            ('/static/no-existe.css', 'GET'),
+            ('/media/canchas/foto.jpg', 'POST'),
+            ('/home/', 'GET'),
+        ):
+            with self.subTest(ruta=ruta, metodo=metodo):
+                self.assertEqual(self.pedir(ruta, metodo)['cuerpo'], b'django')
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        caches['catalogo'].clear()
+        self.usuario = User.objects.create_user('ana', 'ana@test.com', 'clave-segura')
+        self.client.force_login(self.usuario)
+        self.cancha = crear_cancha()
+        self.manana = date.today() + timedelta(days=1)
+        self.parametros = {'fecha': self.manana.isoformat()}
+
+    def reservar(self, **kwargs):
+        datos = {
+            'usuario': self.usuario, 'cancha': self.cancha, 'fecha': self.manana,
+            'hora_inicio': time(10), 'hora_fin': time(11), 'total': 10,
+        }
+        datos.update(kwargs)
+        return Reserva.objects.create(**datos)
+
+    def assertNoModificado(self, url, etag, parametros=None, consultas=3):
+        # sesión + usuario + la consulta de marcas
+        with self.assertNumQueries(consultas):
+            respuesta = self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+
+    def test_horarios_responde_304_hasta_que_cambian_las_reservas_del_dia(self):
+        url = reverse('api_horarios', args=[self.cancha.id])
+        reserva = self.reservar()
+        respuesta = self.client.get(url, self.parametros)
+        etag = respuesta['ETag']
+        self.assertIn('Last-Modified', respuesta)
+        self.assertEqual(self.client.get(reverse('api_horarios_async', args=[self.cancha.id]), self.parametros)['ETag'], etag)
+
+        with mock.patch.object(disponibilidad, 'consultar') as consultar:
+            self.assertNoModificado(url, etag, self.parametros)
+        consultar.assert_not_called()
+
+        # Reservas de otro día no cambian el ETag
+        self.reservar(fecha=self.manana + timedelta(days=1))
+        self.assertNoModificado(url, etag, self.parametros)
+
+        horario = Horario.objects.filter(cancha=self.cancha).first()
+        for cambio in (
+            lambda: self.reservar(hora_inicio=time(12), hora_fin=time(13)),
+            reserva.delete,
+            # Los horarios tocan `Cancha.actualizado`
+            horario.save,
+        ):
+            cambio()
+            respuesta = self.client.get(url, self.parametros, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotEqual(respuesta['ETag'], etag)
+            etag = respuesta['ETag']
+
+    def test_horarios_asincrona(self):
+        url = reverse('api_horarios_async', args=[self.cancha.id])
+        etag = self.client.get(url, self.parametros)['ETag']
+        self.assertNoModificado(url, etag, self.parametros)
+        self.assertEqual(self.client.get(url, {'fecha': 'x'}).json()['message'], 'Fecha inválida')
+
+    def test_detalle_depende_de_resenas_y_del_usuario(self):
+        url = reverse('detalle_cancha', args=[self.cancha.id])
+        # La primera visita además crea la cookie CSRF, que forma parte del ETag
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertNoModificado(url, etag)
+
+        resena = Resena.objects.create(cancha=self.cancha, usuario=self.usuario, calificacion=4)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(respuesta, 'Tu reseña')
+        etag = respuesta['ETag']
+
+        # Editar solo el comentario no toca la cancha, pero sí la versión de reseñas
+        resena.comentario = 'Muy buena'
+        with self.captureOnCommitCallbacks(execute=True):
+            resena.save()
+        self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Muy buena')
+
+        otro = User.objects.create_user('beto', 'beto@test.com', 'clave-segura')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_home_responde_304_y_muestra_los_mensajes_pendientes(self):
+        url = reverse('booking_home')
+        respuesta = self.client.get(url)
+        etag, modificado = respuesta['ETag'], respuesta['Last-Modified']
+        self.assertNoModificado(url, etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=modificado).status_code, 304)
+
+        # Un mensaje por mostrar (p. ej. tras reservar) obliga a renderizar
+        self.client.post(reverse('crear_reserva', args=[self.cancha.id]), {
+            'fecha': self.parametros['fecha'], 'hora_inicio': '10:00', 'hora_fin': '11:00',
+        })
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        crear_cancha('Otra')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
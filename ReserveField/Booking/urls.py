@@ -1,13 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Bajo ASGI las APIs de lectura más consultadas usan las vistas asíncronas
+if settings.APIS_ASINCRONAS:
+    vista_horarios, vista_canchas = views.obtener_horarios_disponibles_async, views.api_canchas_async
+else:
+    vista_horarios, vista_canchas = views.obtener_horarios_disponibles, views.api_canchas
+
 urlpatterns = [
     path('', views.home, name='booking_home'),
     path('cancha/<int:cancha_id>/', views.detalle_cancha, name='detalle_cancha'),
     path('cancha/<int:cancha_id>/reservar/', views.crear_reserva, name='crear_reserva'),
+    path('api/cancha/<int:cancha_id>/reservas-recurrentes/', views.api_reserva_recurrente, name='api_reserva_recurrente'),
     path('mis-reservas/', views.mis_reservas, name='mis_reservas'),
     path('reserva/<int:reserva_id>/cancelar/', views.cancelar_reserva, name='cancelar_reserva'),
     path('cancha/<int:cancha_id>/resena/', views.crear_resena, name='crear_resena'),
-    path('api/horarios-disponibles/<int:cancha_id>/', views.obtener_horarios_disponibles, name='api_horarios'),
+    path('api/cancha/<int:cancha_id>/resenas/', views.api_resenas, name='api_resenas'),
+    path('api/horarios-disponibles/<int:cancha_id>/', vista_horarios, name='api_horarios'),
+    path('api/canchas/', vista_canchas, name='api_canchas'),
+    path('api/eventos/disponibilidad/<int:cancha_id>/', views.eventos_disponibilidad, name='api_eventos_disponibilidad'),
+    path('api/async/horarios-disponibles/<int:cancha_id>/', views.obtener_horarios_disponibles_async, name='api_horarios_async'),
+    path('api/async/canchas/', views.api_canchas_async, name='api_canchas_async'),
+    path('api/disponibilidad/', views.buscar_disponibilidad, name='api_disponibilidad'),
+    path('api/cache/estadisticas/', views.estadisticas_cache, name='api_estadisticas_cache'),
     path('contacto/', views.contacto, name='contacto'),
 ]
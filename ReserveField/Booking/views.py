@@ -1,23 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.db.models import Q
-from django.http import JsonResponse
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Substr
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from django.utils.functional import SimpleLazyObject
+from asgiref.sync import sync_to_async
 from datetime import datetime, timedelta
-from decimal import Decimal
+from .condicional import condicional, partes_pagina
+from .limites import limitar_tasa
 from .models import Cancha, Reserva, Resena, Horario
-from django.core.mail import send_mail
+from . import archivo, busqueda, cache_catalogo, correos, disponibilidad, eventos, paginacion, precios, reservas
+import heapq
 import json
+from operator import attrgetter
 
-@login_required(login_url='autenticacion')
-def home(request):
-    """Página principal con listado de canchas"""
+CANCHAS_POR_PAGINA = 12
+LARGO_DESCRIPCION_TARJETA = 160
+
+# Columnas que usa la tarjeta de cancha del listado
+CAMPOS_TARJETA = (
+    'id', 'nombre', 'tipo', 'ubicacion', 'precio_por_hora', 'imagen', 'imagen_variantes',
+    'calificacion', 'total_resenas', 'creado', 'actualizado',
+)
+
+
+def filtrar_canchas(request):
+    """Queryset de canchas disponibles filtrado por tipo y ubicación"""
     canchas = Cancha.objects.filter(disponible=True)
     
     # Filtros
     tipo = request.GET.get('tipo')
     ubicacion = request.GET.get('ubicacion')
-    busqueda = request.GET.get('busqueda')
     
     if tipo:
         canchas = canchas.filter(tipo=tipo)
@@ -25,46 +43,188 @@ def home(request):
     if ubicacion:
         canchas = canchas.filter(ubicacion__icontains=ubicacion)
     
-    if busqueda:
-        canchas = canchas.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda) |
-            Q(ubicacion__icontains=busqueda)
-        )
+    return canchas
+
+
+def consulta_canchas(request):
+    """Queryset del listado con solo las columnas de la tarjeta"""
+    return filtrar_canchas(request).only(*CAMPOS_TARJETA).annotate(
+        descripcion_corta=Substr('descripcion', 1, LARGO_DESCRIPCION_TARJETA)
+    )
+
+
+def pagina_canchas(request):
+    """Página del listado: (canchas, siguiente_cursor) en una sola consulta"""
+    canchas = consulta_canchas(request)
+    cursor = request.GET.get('cursor')
+    
+    texto = request.GET.get('busqueda')
+    if texto:
+        # Búsqueda por índice de texto completo: resultados por relevancia
+        try:
+            pagina = busqueda.buscar(texto, canchas, cursor, CANCHAS_POR_PAGINA)
+        except ValueError:
+            pagina = busqueda.buscar(texto, canchas, None, CANCHAS_POR_PAGINA)
+        if pagina is not None:
+            return pagina
+        canchas = canchas.filter(busqueda.filtro_icontains(texto))
+    
+    try:
+        return paginacion.paginar(canchas, cursor, CANCHAS_POR_PAGINA)
+    except ValueError:
+        return paginacion.paginar(canchas, None, CANCHAS_POR_PAGINA)
+
+
+async def apagina_canchas(request):
+    """Versión asíncrona de ``pagina_canchas``"""
+    canchas = consulta_canchas(request)
+    cursor = request.GET.get('cursor')
+    
+    texto = request.GET.get('busqueda')
+    if texto:
+        # Las consultas crudas no tienen API asíncrona
+        buscar = sync_to_async(busqueda.buscar)
+        try:
+            pagina = await buscar(texto, canchas, cursor, CANCHAS_POR_PAGINA)
+        except ValueError:
+            pagina = await buscar(texto, canchas, None, CANCHAS_POR_PAGINA)
+        if pagina is not None:
+            return pagina
+        canchas = canchas.filter(busqueda.filtro_icontains(texto))
+    
+    try:
+        return await paginacion.apaginar(canchas, cursor, CANCHAS_POR_PAGINA)
+    except ValueError:
+        return await paginacion.apaginar(canchas, None, CANCHAS_POR_PAGINA)
+
+
+def estado_home(request):
+    """Última modificación y cantidad de las canchas del listado, en una consulta"""
+    marcas = filtrar_canchas(request).aggregate(ultima=Max('actualizado'), canchas=Count('id'))
+    return (marcas['ultima'], marcas['canchas'], *partes_pagina(request)), marcas['ultima']
+
+
+@login_required(login_url='autenticacion')
+@condicional(estado_home)
+def home(request):
+    """Página principal con listado de canchas"""
+    canchas, siguiente_cursor = pagina_canchas(request)
     
     tipos_disponibles = Cancha.TIPOS_CANCHA
     
     context = {
         'canchas': canchas,
+        'siguiente_cursor': siguiente_cursor,
         'tipos_disponibles': tipos_disponibles,
-        'tipo_seleccionado': tipo,
-        'ubicacion_seleccionada': ubicacion,
+        'tipo_seleccionado': request.GET.get('tipo'),
+        'ubicacion_seleccionada': request.GET.get('ubicacion'),
     }
     
     return render(request, 'booking/home.html', context)
 
 
+def respuesta_canchas(canchas, siguiente_cursor):
+    """JSON de una página del listado de canchas"""
+    return JsonResponse({
+        'success': True,
+        'canchas': [
+            {
+                'id': cancha.id,
+                'nombre': cancha.nombre,
+                'tipo': cancha.tipo,
+                'tipo_display': cancha.get_tipo_display(),
+                'ubicacion': cancha.ubicacion,
+                'precio_por_hora': str(cancha.precio_por_hora),
+                'imagen': cancha.imagen.url if cancha.imagen else None,
+                'calificacion': cancha.calificacion,
+                'total_resenas': cancha.total_resenas,
+                'descripcion': cancha.descripcion_corta,
+                'url': reverse('detalle_cancha', args=[cancha.id]),
+            }
+            for cancha in canchas
+        ],
+        'siguiente': siguiente_cursor,
+    })
+
+
+@login_required(login_url='autenticacion')
+def api_canchas(request):
+    """API del listado de canchas para scroll infinito (JSON)"""
+    return respuesta_canchas(*pagina_canchas(request))
+
+
+@login_required(login_url='autenticacion')
+async def api_canchas_async(request):
+    """Versión asíncrona de api_canchas para despliegues ASGI"""
+    return respuesta_canchas(*await apagina_canchas(request))
+
+
+RESENAS_PRIMERA_PAGINA = 5
+RESENAS_POR_PAGINA = 10
+
+
+def resenas_cancha(cancha):
+    """Reseñas de una cancha con solo los datos que se muestran"""
+    return cancha.resenas.select_related('usuario').only(
+        'cancha', 'calificacion', 'comentario', 'creado', 'usuario__username'
+    )
+
+
+def estado_detalle(request, cancha_id):
+    """Marca de la cancha (la tocan reseñas, horarios y tarifas) y versión de sus reseñas"""
+    actualizado = Cancha.objects.filter(id=cancha_id).values_list('actualizado', flat=True).first()
+    if actualizado is None:
+        return None
+    # Los comentarios editados no tocan la cancha, pero sí la versión de reseñas
+    partes = (actualizado, cache_catalogo.version(cancha_id, 'resenas'), *partes_pagina(request))
+    return partes, actualizado
+
+
 @login_required(login_url='autenticacion')
+@condicional(estado_detalle)
 def detalle_cancha(request, cancha_id):
     """Detalle de una cancha específica"""
-    cancha = get_object_or_404(Cancha, id=cancha_id)
-    resenas = cancha.resenas.all()
+    # La reseña del usuario viaja en la misma consulta que la cancha
+    resena_usuario = Resena.objects.filter(
+        cancha=OuterRef('pk'), usuario=request.user
+    ).order_by()
+    cancha = get_object_or_404(
+        Cancha.objects.annotate(
+            mi_calificacion=Subquery(resena_usuario.values('calificacion')[:1]),
+            mi_comentario=Subquery(resena_usuario.values('comentario')[:1]),
+        ),
+        id=cancha_id,
+    )
+    # Primera página de reseñas; se evalúa solo si el fragmento no está en caché
+    primera_pagina_resenas = SimpleLazyObject(
+        lambda: paginacion.paginar(resenas_cancha(cancha), None, RESENAS_PRIMERA_PAGINA)
+    )
     horarios = cancha.horarios.all().order_by('dia_semana')
     
     # Verificar si el usuario ya hizo una reseña
-    resena_usuario = resenas.filter(usuario=request.user).first()
+    resena_usuario = None
+    if cancha.mi_calificacion is not None:
+        resena_usuario = {
+            'calificacion': cancha.mi_calificacion,
+            'comentario': cancha.mi_comentario,
+        }
     
     context = {
         'cancha': cancha,
-        'resenas': resenas,
+        'resenas': primera_pagina_resenas,
+        'histograma': cancha.histograma_estrellas(),
         'horarios': horarios,
+        'tabla_precios': precios.obtener_tabla(cancha),
         'resena_usuario': resena_usuario,
         'dias_semana': dict(Horario.DIAS_SEMANA),
+        'version_resenas': cache_catalogo.version(cancha.id, 'resenas'),
+        'eventos_en_vivo': settings.APIS_ASINCRONAS,
     }
     
     return render(request, 'booking/detalle_cancha.html', context)
 
 
+@limitar_tasa('reserva', metodos=('POST',))
 @login_required(login_url='autenticacion')
 def crear_reserva(request, cancha_id):
     """Crear una nueva reserva"""
@@ -102,27 +262,11 @@ def crear_reserva(request, cancha_id):
                 messages.error(request, f'El horario debe estar entre {horario.hora_apertura} y {horario.hora_cierre}')
                 return redirect('detalle_cancha', cancha_id=cancha_id)
             
-            # Verificar si hay conflicto con otras reservas
-            conflicto = Reserva.objects.filter(
-                cancha=cancha,
-                fecha=fecha_obj,
-                estado__in=['confirmada', 'pendiente']
-            ).filter(
-                Q(hora_inicio__lt=hora_fin_obj) & Q(hora_fin__gt=hora_inicio_obj)
-            ).exists()
-            
-            if conflicto:
-                messages.error(request, 'Este horario ya está reservado')
-                return redirect('detalle_cancha', cancha_id=cancha_id)
-            
-            # Calcular precio total
-            duracion_minutos = (datetime.combine(datetime.now().date(), hora_fin_obj) - 
-                              datetime.combine(datetime.now().date(), hora_inicio_obj)).total_seconds() / 60
-            duracion_horas = duracion_minutos / 60
-            total = Decimal(str(duracion_horas)) * cancha.precio_por_hora
+            # Calcular precio total según las tarifas de la cancha
+            total = precios.cotizar(cancha, dia_semana, hora_inicio_obj, hora_fin_obj)
             
-            # Crear reserva
-            reserva = Reserva.objects.create(
+            # Crear reserva (comprobación de conflicto e inserción atómicas)
+            resultado = reservas.reservar(
                 usuario=request.user,
                 cancha=cancha,
                 fecha=fecha_obj,
@@ -132,6 +276,11 @@ def crear_reserva(request, cancha_id):
                 estado='confirmada'
             )
             
+            if not resultado.exito:
+                messages.error(request, resultado.mensaje)
+                return redirect('detalle_cancha', cancha_id=cancha_id)
+            
+            correos.notificar_reserva(resultado.reserva)
             messages.success(request, f'Reserva confirmada por ${total}')
             return redirect('mis_reservas')
         
@@ -143,35 +292,106 @@ def crear_reserva(request, cancha_id):
     return render(request, 'booking/crear_reserva.html', context)
 
 
+@limitar_tasa('reserva', metodos=('POST',), json=True)
+@login_required(login_url='autenticacion')
+@require_POST
+def api_reserva_recurrente(request, cancha_id):
+    """API para reservar el mismo horario todas las semanas de un rango de fechas (JSON)"""
+    cancha = get_object_or_404(Cancha, id=cancha_id)
+    
+    try:
+        dia_semana = int(request.POST.get('dia_semana'))
+        hora_inicio = datetime.strptime(request.POST.get('hora_inicio'), '%H:%M').time()
+        hora_fin = datetime.strptime(request.POST.get('hora_fin'), '%H:%M').time()
+        desde = datetime.strptime(request.POST.get('fecha_desde'), '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.POST.get('fecha_hasta'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return JsonResponse({'success': False, 'message': 'Datos inválidos'})
+    
+    error = None
+    horario = cancha.horarios.filter(dia_semana=dia_semana).first()
+    if desde < datetime.now().date():
+        error = 'No puedes reservar en fechas pasadas'
+    elif hasta < desde:
+        error = 'La fecha final debe ser posterior a la inicial'
+    elif hora_inicio >= hora_fin:
+        error = 'La hora de inicio debe ser menor a la hora de fin'
+    elif not horario:
+        error = 'No hay horarios disponibles para este día'
+    elif hora_inicio < horario.hora_apertura or hora_fin > horario.hora_cierre:
+        error = f'El horario debe estar entre {horario.hora_apertura} y {horario.hora_cierre}'
+    if error:
+        return JsonResponse({'success': False, 'message': error})
+    
+    total = precios.cotizar(cancha, dia_semana, hora_inicio, hora_fin)
+    
+    resultado = reservas.reservar_serie(
+        usuario=request.user,
+        cancha=cancha,
+        dia_semana=dia_semana,
+        hora_inicio=hora_inicio,
+        hora_fin=hora_fin,
+        desde=desde,
+        hasta=hasta,
+        total=total,
+    )
+    if not resultado.exito:
+        return JsonResponse({
+            'success': False,
+            'message': resultado.mensaje,
+            'conflictos': [fecha.isoformat() for fecha in resultado.conflictos],
+        })
+    
+    correos.notificar_serie(resultado.serie, resultado.reservas)
+    return JsonResponse({
+        'success': True,
+        'serie': resultado.serie.id,
+        'reservas': len(resultado.reservas),
+        'fecha_desde': resultado.serie.fecha_desde.isoformat(),
+        'fecha_hasta': resultado.serie.fecha_hasta.isoformat(),
+        'total': str(total * len(resultado.reservas)),
+    })
+
+
 @login_required(login_url='autenticacion')
 def mis_reservas(request):
     """Listado de reservas del usuario"""
     tab = request.GET.get('tab', 'proximas')
     busqueda = request.GET.get('busqueda', '')
 
-    reservas_proximas = request.user.reservas.filter(
+    # Solo las columnas que muestra la tarjeta, con la cancha en el mismo JOIN
+    columnas = (
+        'usuario', 'fecha', 'hora_inicio', 'hora_fin', 'estado', 'total',
+        'cancha__nombre', 'cancha__tipo', 'cancha__ubicacion',
+    )
+    reservas_usuario = request.user.reservas.select_related('cancha').only(*columnas)
+    reservas_proximas = reservas_usuario.filter(
         fecha__gte=datetime.now().date(),
         estado__in=['confirmada', 'pendiente']
     ).order_by('fecha', 'hora_inicio')
-    reservas_historial = request.user.reservas.filter(
-        Q(fecha__lt=datetime.now().date()) |
-        Q(estado__in=['completada', 'cancelada'])
+    # Las reservas terminadas pasan a 'completada' con `actualizar_estados`
+    reservas_historial = reservas_usuario.filter(
+        estado__in=archivo.ESTADOS_FINALES
+    ).order_by('-fecha')
+    # Las más antiguas están en la tabla de archivo (ver archivo.py)
+    reservas_archivadas = request.user.reservas_archivadas.select_related('cancha').only(
+        *columnas
     ).order_by('-fecha')
 
     if busqueda:
-        reservas_proximas = reservas_proximas.filter(
-            Q(cancha__nombre__icontains=busqueda) |
-            Q(fecha__icontains=busqueda)
-        )
-        reservas_historial = reservas_historial.filter(
-            Q(cancha__nombre__icontains=busqueda) |
-            Q(fecha__icontains=busqueda)
-        )
+        coincide = Q(cancha__nombre__icontains=busqueda) | Q(fecha__icontains=busqueda)
+        reservas_proximas = reservas_proximas.filter(coincide)
+        reservas_historial = reservas_historial.filter(coincide)
+        reservas_archivadas = reservas_archivadas.filter(coincide)
 
     context = {
         'tab': tab,
         'reservas_proximas': reservas_proximas,
-        'reservas_historial': reservas_historial,
+        # Ambas consultas vienen ordenadas por fecha: basta intercalarlas, y
+        # solo si se muestra la pestaña del historial
+        'reservas_historial': SimpleLazyObject(lambda: list(heapq.merge(
+            reservas_historial, reservas_archivadas, key=attrgetter('fecha'), reverse=True,
+        ))),
     }
     return render(request, 'booking/mis_reservas.html', context)
 
@@ -179,7 +399,9 @@ def mis_reservas(request):
 @login_required(login_url='autenticacion')
 def cancelar_reserva(request, reserva_id):
     """Cancelar una reserva"""
-    reserva = get_object_or_404(Reserva, id=reserva_id, usuario=request.user)
+    reserva = get_object_or_404(
+        Reserva.objects.select_related('usuario', 'cancha'), id=reserva_id, usuario=request.user
+    )
     
     if request.method == 'POST':
         if reserva.fecha <= datetime.now().date():
@@ -187,6 +409,7 @@ def cancelar_reserva(request, reserva_id):
         else:
             reserva.estado = 'cancelada'
             reserva.save()
+            correos.notificar_cancelacion(reserva)
             messages.success(request, 'Reserva cancelada correctamente')
         
         return redirect('mis_reservas')
@@ -224,9 +447,6 @@ def crear_resena(request, cancha_id):
                 )
                 messages.success(request, 'Reseña creada')
             
-            # Actualizar calificación promedio de la cancha
-            actualizar_calificacion_cancha(cancha)
-            
             return redirect('detalle_cancha', cancha_id=cancha_id)
         
         except (ValueError, TypeError):
@@ -241,53 +461,316 @@ def crear_resena(request, cancha_id):
     return render(request, 'booking/crear_resena.html', context)
 
 
-def actualizar_calificacion_cancha(cancha):
-    """Actualizar la calificación promedio de una cancha"""
-    resenas = cancha.resenas.all()
-    if resenas.exists():
-        promedio = sum(r.calificacion for r in resenas) / resenas.count()
-        cancha.calificacion = round(promedio, 1)
-        cancha.total_resenas = resenas.count()
-        cancha.save()
+@login_required(login_url='autenticacion')
+def api_resenas(request, cancha_id):
+    """API de reseñas paginadas por cursor, con filtro opcional de calificación (JSON)"""
+    cancha = get_object_or_404(
+        Cancha.objects.only('total_resenas', *[f'estrellas_{n}' for n in range(1, 6)]),
+        id=cancha_id,
+    )
+    resenas = resenas_cancha(cancha)
+    total = cancha.total_resenas
+    
+    calificacion = request.GET.get('calificacion')
+    if calificacion:
+        try:
+            calificacion = int(calificacion)
+            total = cancha.histograma_estrellas()[calificacion]
+        except (ValueError, KeyError):
+            return JsonResponse({
+                'success': False,
+                'message': 'Calificación inválida'
+            })
+        resenas = resenas.filter(calificacion=calificacion)
+    
+    # El histograma ya dice si hay algo que buscar
+    if total == 0:
+        pagina = paginacion.Pagina([], None)
+    else:
+        try:
+            pagina = paginacion.paginar(resenas, request.GET.get('cursor'), RESENAS_POR_PAGINA)
+        except ValueError:
+            return JsonResponse({
+                'success': False,
+                'message': 'Cursor inválido'
+            })
+    
+    return JsonResponse({
+        'success': True,
+        'total': total,
+        'resenas': [
+            {
+                'usuario': resena.usuario.username,
+                'calificacion': resena.calificacion,
+                'comentario': resena.comentario,
+                'creado': resena.creado.strftime('%d/%m/%Y'),
+            }
+            for resena in pagina.elementos
+        ],
+        'siguiente': pagina.siguiente,
+    })
+
+
+def respuesta_horarios(entrada):
+    """JSON de horarios de una entrada del índice de disponibilidad"""
+    if not entrada['abierto']:
+        return JsonResponse({
+            'success': False,
+            'message': 'No hay horarios disponibles para este día'
+        })
+    
+    reservas_dia = sorted(entrada['reservas'].values())
+    
+    return JsonResponse({
+        'success': True,
+        'hora_apertura': str(disponibilidad.a_hora(entrada['apertura'])),
+        'hora_cierre': str(disponibilidad.a_hora(entrada['cierre'])),
+        'reservas_existentes': [
+            (str(disponibilidad.a_hora(inicio)), str(disponibilidad.a_hora(fin)))
+            for inicio, fin in reservas_dia
+        ],
+        'bloques_disponibles': disponibilidad.bloques_libres(entrada['libres']),
+    })
+
+
+def respuesta_fecha_invalida():
+    return JsonResponse({
+        'success': False,
+        'message': 'Fecha inválida'
+    })
 
 
+def marcas_horarios(request, cancha_id):
+    """
+    Consulta de las marcas de la cancha y de sus reservas del día pedido
+    (última modificación y cantidad, para notar también las borradas); None
+    si la fecha no es válida.
+    """
+    try:
+        fecha_obj = datetime.strptime(request.GET.get('fecha'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+    reservas_dia = Reserva.objects.filter(cancha=OuterRef('pk'), fecha=fecha_obj).order_by().values('cancha')
+    return Cancha.objects.filter(id=cancha_id).annotate(
+        ultima_reserva=Subquery(reservas_dia.annotate(ultima=Max('actualizado')).values('ultima')),
+        reservas_dia=Subquery(reservas_dia.annotate(total=Count('id')).values('total')),
+    ).values_list('actualizado', 'ultima_reserva', 'reservas_dia')
+
+
+def _estado_horarios(marcas):
+    if marcas is None:
+        return None
+    actualizado, ultima_reserva, _ = marcas
+    return marcas, max(actualizado, ultima_reserva or actualizado)
+
+
+def estado_horarios(request, cancha_id):
+    consulta = marcas_horarios(request, cancha_id)
+    return None if consulta is None else _estado_horarios(consulta.first())
+
+
+async def aestado_horarios(request, cancha_id):
+    consulta = marcas_horarios(request, cancha_id)
+    return None if consulta is None else _estado_horarios(await consulta.afirst())
+
+
+@limitar_tasa('horarios', metodos=('GET',), json=True)
 @login_required(login_url='autenticacion')
+@condicional(estado_horarios)
+@cache_catalogo.cachear_json('disponibilidad')
 def obtener_horarios_disponibles(request, cancha_id):
     """API para obtener horarios disponibles (JSON)"""
-    cancha = get_object_or_404(Cancha, id=cancha_id)
-    fecha = request.GET.get('fecha')
+    try:
+        fecha_obj = datetime.strptime(request.GET.get('fecha'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return respuesta_fecha_invalida()
+    
+    # Consultar el índice de disponibilidad (sin SQL si ya está en caché)
+    entrada = disponibilidad.consultar(cancha_id, fecha_obj)
+    if entrada is None:
+        cancha = get_object_or_404(Cancha, id=cancha_id)
+        entrada = disponibilidad.construir(cancha.id, fecha_obj)
     
+    return respuesta_horarios(entrada)
+
+
+@limitar_tasa('horarios', metodos=('GET',), json=True)
+@login_required(login_url='autenticacion')
+@condicional(aestado_horarios)
+@cache_catalogo.cachear_json('disponibilidad')
+async def obtener_horarios_disponibles_async(request, cancha_id):
+    """Versión asíncrona de obtener_horarios_disponibles para despliegues ASGI"""
     try:
-        fecha_obj = datetime.strptime(fecha, '%Y-%m-%d').date()
-        dia_semana = fecha_obj.weekday()
-        
-        # Obtener horario del día
-        horario = cancha.horarios.filter(dia_semana=dia_semana).first()
-        
-        if not horario:
-            return JsonResponse({
-                'success': False,
-                'message': 'No hay horarios disponibles para este día'
-            })
-        
-        # Obtener reservas existentes
-        reservas_dia = cancha.reservas.filter(
-            fecha=fecha_obj,
-            estado__in=['confirmada', 'pendiente']
-        ).values_list('hora_inicio', 'hora_fin')
+        fecha_obj = datetime.strptime(request.GET.get('fecha'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return respuesta_fecha_invalida()
+    
+    entrada = await disponibilidad.aconsultar(cancha_id, fecha_obj)
+    if entrada is None:
+        if not await Cancha.objects.filter(id=cancha_id).aexists():
+            raise Http404('Cancha no encontrada')
+        entrada = await disponibilidad.aconstruir(cancha_id, fecha_obj)
+    
+    return respuesta_horarios(entrada)
+
+
+# Segundos entre comentarios de keep-alive en el stream de eventos
+INTERVALO_MARCAPASOS = 15
+
+
+async def flujo_disponibilidad(cancha_id, fecha):
+    """Eventos SSE: el estado actual y luego cada franja ocupada o liberada"""
+    async with eventos.suscribir(eventos.canal_disponibilidad(cancha_id, fecha)) as suscripcion:
+        # Suscrito antes de leer el índice, no se pierde ningún cambio intermedio
+        entrada = await disponibilidad.aconsultar(cancha_id, fecha)
+        if entrada is None:
+            entrada = await disponibilidad.aconstruir(cancha_id, fecha)
+        libres = entrada['libres'] if entrada['abierto'] else 0
+        yield 'retry: 3000\n'
+        yield eventos.formatear_sse('estado', {
+            'bloques_disponibles': disponibilidad.bloques_libres(libres),
+        })
         
+        while True:
+            evento = await suscripcion.recibir(timeout=INTERVALO_MARCAPASOS)
+            if evento is None:
+                yield ': marcapasos\n\n'
+            else:
+                yield eventos.formatear_sse(evento['tipo'], evento)
+
+
+@login_required(login_url='autenticacion')
+async def eventos_disponibilidad(request, cancha_id):
+    """Stream SSE con los cambios de disponibilidad de una cancha y fecha"""
+    if not settings.APIS_ASINCRONAS:
         return JsonResponse({
-            'success': True,
-            'hora_apertura': str(horario.hora_apertura),
-            'hora_cierre': str(horario.hora_cierre),
-            'reservas_existentes': [(str(r[0]), str(r[1])) for r in reservas_dia]
-        })
+            'success': False,
+            'message': 'Los eventos en vivo requieren el despliegue ASGI'
+        }, status=503)
+    
+    try:
+        fecha_obj = datetime.strptime(request.GET.get('fecha'), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return respuesta_fecha_invalida()
+    
+    if not await Cancha.objects.filter(id=cancha_id).aexists():
+        raise Http404('Cancha no encontrada')
     
+    respuesta = StreamingHttpResponse(
+        flujo_disponibilidad(cancha_id, fecha_obj), content_type='text/event-stream'
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule el stream en su búfer
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+MAX_DIAS_BUSQUEDA = 31
+
+
+@login_required(login_url='autenticacion')
+def buscar_disponibilidad(request):
+    """API para buscar ventanas libres en varias canchas y días (JSON)"""
+    tipo = request.GET.get('tipo')
+    ubicacion = request.GET.get('ubicacion')
+    
+    try:
+        fecha_desde = datetime.strptime(request.GET.get('desde', ''), '%Y-%m-%d').date()
+        fecha_hasta = datetime.strptime(request.GET.get('hasta', ''), '%Y-%m-%d').date()
+        duracion_minima = int(request.GET.get('duracion', 60))
     except ValueError:
         return JsonResponse({
             'success': False,
-            'message': 'Fecha inválida'
+            'message': 'Parámetros inválidos'
+        })
+    
+    if fecha_hasta < fecha_desde or duracion_minima <= 0:
+        return JsonResponse({
+            'success': False,
+            'message': 'Parámetros inválidos'
         })
+    
+    if (fecha_hasta - fecha_desde).days >= MAX_DIAS_BUSQUEDA:
+        return JsonResponse({
+            'success': False,
+            'message': f'El rango no puede superar {MAX_DIAS_BUSQUEDA} días'
+        })
+    
+    canchas = Cancha.objects.filter(disponible=True)
+    if tipo:
+        canchas = canchas.filter(tipo=tipo)
+    if ubicacion:
+        canchas = canchas.filter(ubicacion__icontains=ubicacion)
+    
+    # Una consulta para los horarios (con los datos de la cancha) ...
+    horarios = Horario.objects.filter(cancha__in=canchas).values_list(
+        'cancha_id', 'cancha__nombre', 'cancha__tipo', 'cancha__ubicacion', 'cancha__actualizado',
+        'dia_semana', 'hora_apertura', 'hora_cierre',
+    ).order_by('cancha__nombre', 'cancha_id')
+    
+    # ... y otra para todas las reservas activas del rango
+    reservas = Reserva.objects.filter(
+        cancha__in=canchas,
+        fecha__range=(fecha_desde, fecha_hasta),
+        estado__in=disponibilidad.ESTADOS_ACTIVOS,
+    ).order_by().values_list('cancha_id', 'fecha', 'hora_inicio', 'hora_fin')
+    
+    ocupado = {}
+    for cancha_id, fecha, inicio, fin in reservas:
+        ocupado.setdefault((cancha_id, fecha), []).append(
+            (disponibilidad.a_minutos(inicio), disponibilidad.a_minutos(fin))
+        )
+    
+    resultado = {}
+    horarios_por_cancha = {}
+    versiones = {}
+    for cancha_id, nombre, tipo_cancha, ubicacion_cancha, actualizado, dia, apertura, cierre in horarios:
+        if cancha_id not in resultado:
+            resultado[cancha_id] = {
+                'id': cancha_id,
+                'nombre': nombre,
+                'tipo': tipo_cancha,
+                'ubicacion': ubicacion_cancha,
+                'dias': [],
+            }
+            versiones[cancha_id] = actualizado
+        horarios_por_cancha.setdefault(cancha_id, {})[dia] = (
+            disponibilidad.a_minutos(apertura), disponibilidad.a_minutos(cierre)
+        )
+    
+    # Tablas de precios precompiladas: cada cotización es una suma en memoria
+    tablas = precios.obtener_tablas(versiones)
+    
+    dias = [fecha_desde + timedelta(days=n) for n in range((fecha_hasta - fecha_desde).days + 1)]
+    for cancha_id, semana in horarios_por_cancha.items():
+        for fecha in dias:
+            if fecha.weekday() not in semana:
+                continue
+            apertura, cierre = semana[fecha.weekday()]
+            ventanas = disponibilidad.ventanas_libres(
+                apertura, cierre, ocupado.get((cancha_id, fecha), []), duracion_minima
+            )
+            if ventanas:
+                resultado[cancha_id]['dias'].append({
+                    'fecha': fecha.isoformat(),
+                    'ventanas': [
+                        (disponibilidad.a_hora(inicio).strftime('%H:%M'),
+                         disponibilidad.a_hora(fin).strftime('%H:%M'))
+                        for inicio, fin in ventanas
+                    ],
+                    # Precio de reservar la duración pedida al inicio de cada ventana
+                    'precios': [
+                        str(precios.precio_franjas(
+                            tablas[cancha_id], fecha.weekday(), inicio, inicio + duracion_minima
+                        ))
+                        for inicio, _ in ventanas
+                    ],
+                })
+    
+    return JsonResponse({
+        'success': True,
+        'canchas': [cancha for cancha in resultado.values() if cancha['dias']],
+    })
 
 
 @login_required(login_url='autenticacion')
@@ -297,16 +780,24 @@ def contacto(request):
         nombre = request.POST.get('nombre')
         email = request.POST.get('email')
         mensaje = request.POST.get('mensaje')
-        # Aquí podrías enviar el mensaje por email o guardarlo en la base de datos
-        send_mail(
-            subject=f"Contacto de {nombre}",
-            message=mensaje,
-            from_email=email,
-            recipient_list=['soporte@reservacanchas.com'],
-            fail_silently=True,
+        # Se envía en segundo plano (ver correos.py y procesar_correos)
+        correos.encolar(
+            asunto=f"Contacto de {nombre}",
+            mensaje=mensaje or '',
+            destinatarios=['soporte@reservacanchas.com'],
+            remitente=email,
         )
         mensaje_enviado = True
     context = {
         'mensaje_enviado': mensaje_enviado
     }
-    return render(request, 'booking/contacto.html', context)
\ No newline at end of file
+    return render(request, 'booking/contacto.html', context)
+
+
+@staff_member_required
+def estadisticas_cache(request):
+    """Aciertos y fallos de la caché del catálogo en este proceso (JSON)"""
+    return JsonResponse({
+        'success': True,
+        'estadisticas': cache_catalogo.estadisticas(),
+    })
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReserveField.settings')
+# Servir las APIs de lectura con las vistas asíncronas (ver APIS_ASINCRONAS)
+os.environ.setdefault('APIS_ASINCRONAS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# En desarrollo, avisar de requests con demasiadas consultas o consultas repetidas (N+1)
+if DEBUG:
+    MIDDLEWARE.append('Booking.middleware.DetectorConsultasMiddleware')
+
+CONSULTAS_MAXIMAS_POR_REQUEST = 20
+CONSULTAS_REPETIDAS_MAXIMAS = 1
+
 ROOT_URLCONF = 'ReserveField.urls'
 
 TEMPLATES = [
@@ -82,6 +90,14 @@ DATABASES = {
 }
 
 
+# Inicio de sesión con el correo (ver Autenticacion/backends.py); ModelBackend
+# sigue atendiendo el admin, que usa el nombre de usuario
+AUTHENTICATION_BACKENDS = [
+    'Autenticacion.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -123,6 +139,20 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Modo de producción de estáticos y media (ver Booking/estaticos.py):
+# collectstatic guarda los archivos con hash en el nombre y copias gzip/brotli,
+# y wsgi.py los sirve (junto con MEDIA_ROOT) sin pasar por las vistas
+ESTATICOS_PRODUCCION = os.environ.get('ESTATICOS_PRODUCCION') == '1'
+if ESTATICOS_PRODUCCION:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'Booking.estaticos.AlmacenComprimido'},
+    }
+# Segundos de caché de los archivos sin hash en el nombre
+ESTATICOS_MAX_AGE = 60
+# Media con el hash del contenido en el nombre, cacheados un año
+ESTATICOS_MEDIA_INMUTABLES = ('canchas/variantes/',)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -131,3 +161,103 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Redirect to booking home after login
 LOGIN_URL = 'autenticacion'
 LOGIN_REDIRECT_URL = 'booking_home'
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: 'locmem' (por defecto), 'file' o 'redis' (CACHE_LOCATION = URL)
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+_BACKENDS_CACHE = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'reservefield'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/0'),
+}
+_backend_cache, _location_cache = _BACKENDS_CACHE[CACHE_BACKEND]
+_location_cache = os.environ.get('CACHE_LOCATION', _location_cache)
+
+CACHES = {
+    'default': {
+        'BACKEND': _backend_cache,
+        'LOCATION': _location_cache,
+    },
+    # Fragmentos y vistas del catálogo, con contadores de aciertos
+    'catalogo': {
+        'BACKEND': 'Booking.cache_catalogo.CacheConContadores',
+        'LOCATION': _location_cache + '-catalogo' if CACHE_BACKEND == 'locmem' else _location_cache,
+        'TIMEOUT': 600,
+        'KEY_PREFIX': 'catalogo',
+        'OPTIONS': {'BACKEND': _backend_cache},
+    },
+}
+
+# Segundos que una entrada del índice de disponibilidad permanece en caché
+DISPONIBILIDAD_CACHE_TIMEOUT = 300
+
+# Pub/sub de los eventos de disponibilidad en vivo (ver Booking/eventos.py).
+# EVENTOS_BACKEND: 'local' (un solo proceso) o 'redis' (EVENTOS_LOCATION = URL)
+_BROKERS_EVENTOS = {
+    'local': 'Booking.eventos.BrokerLocal',
+    'redis': 'Booking.eventos.BrokerRedis',
+}
+EVENTOS_BROKER = {
+    'BACKEND': _BROKERS_EVENTOS[os.environ.get('EVENTOS_BACKEND', 'local')],
+    'LOCATION': os.environ.get('EVENTOS_LOCATION', 'redis://127.0.0.1:6379/1'),
+}
+
+# Las rutas api_horarios y api_canchas usan las vistas asíncronas y se habilita
+# el stream de eventos en vivo. asgi.py lo activa por defecto: bajo ASGI una
+# vista síncrona ocupa un hilo por petición y bajo WSGI un stream ocupa un hilo
+# durante toda la conexión.
+APIS_ASINCRONAS = os.environ.get('APIS_ASINCRONAS') == '1'
+
+# Email
+# https://docs.djangoproject.com/en/5.2/topics/email/
+# Los correos se encolan y los envía `python manage.py procesar_correos`.
+# Para probar en local: EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend
+# o un servidor de depuración (EMAIL_PORT=1025, ver README)
+
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 25))
+EMAIL_FILE_PATH = BASE_DIR / 'correos'
+DEFAULT_FROM_EMAIL = 'no-responder@reservacanchas.com'
+
+# Reintentos de la cola de correos: espera exponencial desde ESPERA_BASE
+# segundos hasta ESPERA_MAXIMA; PLAZO_ENVIO es lo que un worker retiene un lote
+CORREOS_MAX_INTENTOS = 5
+CORREOS_ESPERA_BASE = 30
+CORREOS_ESPERA_MAXIMA = 3600
+CORREOS_PLAZO_ENVIO = 300
+
+# Minutos que una reserva puede quedar 'pendiente' antes de que
+# `python manage.py actualizar_estados` la dé por vencida y libere el horario
+RESERVAS_PLAZO_PENDIENTE = 30
+
+# Días tras los cuales `python manage.py archivar_reservas` mueve las reservas
+# completadas o canceladas a la tabla de reservas archivadas
+RESERVAS_HORIZONTE_ARCHIVO = 365
+
+# Límites de tasa por IP y por usuario (ver Booking/limites.py):
+# ámbito -> (ráfaga, solicitudes repuestas por minuto)
+LIMITES_TASA = {
+    'login': (10, 5),
+    'reserva': (10, 20),
+    'horarios': (120, 600),
+}
+# LIMITES_TASA_ACTIVOS=0 los desactiva, p. ej. en el servidor de una prueba de carga
+LIMITES_TASA_ACTIVOS = os.environ.get('LIMITES_TASA_ACTIVOS', '1') != '0'
+# LIMITES_BACKEND: 'local' (memoria de cada proceso) o 'cache' (caché default, p. ej. Redis)
+_ALMACENES_LIMITES = {
+    'local': 'Booking.limites.AlmacenLocal',
+    'cache': 'Booking.limites.AlmacenCache',
+}
+LIMITES_TASA_ALMACEN = _ALMACENES_LIMITES[os.environ.get('LIMITES_BACKEND', 'local')]
+# Detrás de un proxy, cabecera de request.META con la IP real (p. ej. 'HTTP_X_REAL_IP')
+LIMITES_TASA_CABECERA_IP = os.environ.get('LIMITES_TASA_CABECERA_IP') or None
+
+# Variantes WebP/JPEG de las imágenes de canchas (ver Booking/imagenes.py):
+# anchos en píxeles, calidad de compresión e hilos que las generan al subirlas
+IMAGENES_ANCHOS = (320, 640, 1280)
+IMAGENES_CALIDAD = 80
+IMAGENES_HILOS = 2
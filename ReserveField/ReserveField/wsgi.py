@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ReserveField.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.ESTATICOS_PRODUCCION:
+    from Booking.estaticos import ServidorEstaticos
+
+    application = ServidorEstaticos(application)